@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+
+"""
+Scaling benchmark for panelizer.py.
+
+Panelizes synthetic boards over a sweep of grid sizes and item counts with
+the fake pcbnew stand-in (and optionally the sexpr engine), and reports time,
+peak Python memory and how run time grows with the number of copies, so
+super-linear behaviour in the duplication passes shows up.
+
+Run from the repository root:
+    ./benchmarks/bench_scaling.py --grids 2,5,10,20,30 --scales 10,100,1000
+"""
+
+import contextlib
+import io
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fake_pcbnew  # noqa: E402
+import synth  # noqa: E402
+
+sys.modules["pcbnew"] = fake_pcbnew
+
+import panelizer  # noqa: E402
+
+
+def board_params(scale):
+    """Item counts for a scale: tracks, footprints with 4 pads, and zones."""
+    return {
+        "tracks": scale,
+        "footprints": max(1, scale // 4),
+        "pads": 4,
+        "zones": max(1, scale // 250),
+    }
+
+
+def source_items(params):
+    """Number of objects in a source board, counting pads."""
+    return (
+        params["tracks"]
+        + params["footprints"] * (params["pads"] + 2 + 2 * params.get("fab", 0))
+        + params["zones"]
+        + params.get("drawings", 0)
+        + 4
+    )
+
+
+def run_once(board_file, grid, engine, extra_args, measure_memory):
+    """Panelize once, returning (seconds, peak bytes or None, profile phases)."""
+    profile_file = board_file + ".profile.json"
+    args = panelizer.parse_args(
+        [
+            board_file,
+            f"--numx={grid}",
+            f"--numy={grid}",
+            f"--engine={engine}",
+            f"--profile={profile_file}",
+            "--no-cache",
+        ]
+        + extra_args
+    )
+    args.sourceBoardFile = board_file
+    fake_pcbnew.CALLS.clear()
+
+    if measure_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        panelizer.panelize(args)
+    seconds = time.perf_counter() - start
+    peak = None
+    if measure_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    with open(profile_file, encoding="utf-8") as profile:
+        phases = json.load(profile)["phases"]
+    return seconds, peak, phases
+
+
+def growth_exponent(points):
+    """Least squares slope of log(time) against log(copies)."""
+    points = [(math.log(n), math.log(t)) for n, t in points if n > 0 and t > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    var = sum((x - mean_x) ** 2 for x, _ in points)
+    if not var:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var
+
+
+def main():
+    """Run the sweep and print the results table."""
+    parser = ArgumentParser(description="Scaling benchmark for panelizer.py.")
+    parser.add_argument("--grids", default="2,5,10,20,30", help="Grid sizes NxN")
+    parser.add_argument("--scales", default="10,100,1000", help="Tracks per board")
+    parser.add_argument("--engines", default="pcbnew", help="pcbnew and/or sexpr")
+    parser.add_argument(
+        "--outline-segments", type=int, default=1, help="Edge.Cuts segments per side"
+    )
+    parser.add_argument(
+        "--drawings", type=int, default=0, help="Documentation lines per board"
+    )
+    parser.add_argument(
+        "--fab", action="store_true", help="Give footprints fab outlines and models"
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="Best of N runs")
+    parser.add_argument(
+        "--max-items",
+        type=int,
+        default=2000000,
+        help="Skip runs that would create more objects than this",
+    )
+    parser.add_argument("--no-memory", action="store_true", help="Skip memory runs")
+    parser.add_argument(
+        "--args", default="", help="Extra panelizer.py arguments, space separated"
+    )
+    parser.add_argument("--json", help="Write the results to a JSON file")
+    args = parser.parse_args()
+
+    grids = [int(g) for g in args.grids.split(",")]
+    scales = [int(s) for s in args.scales.split(",")]
+    engines = args.engines.split(",")
+    extra_args = args.args.split()
+    results = []
+
+    print(
+        f"{'engine':<8}{'scale':>7}{'grid':>7}{'objects':>11}{'seconds':>10}"
+        f"{'us/obj':>9}{'peak MB':>9}  slowest phase"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for engine in engines:
+            for scale in scales:
+                params = board_params(scale)
+                params["outline_segments"] = args.outline_segments
+                params["drawings"] = args.drawings
+                params["fab"] = args.fab
+                board_file = synth.write(
+                    os.path.join(tmp, f"synth_{scale}.kicad_pcb"), **params
+                )
+                timings = []
+                for grid in grids:
+                    objects = source_items(params) * grid * grid
+                    if objects > args.max_items:
+                        print(f"{engine:<8}{scale:>7}{grid:>7}{objects:>11}  skipped")
+                        continue
+                    seconds, _, phases = min(
+                        run_once(board_file, grid, engine, extra_args, False)
+                        for _ in range(args.repeat)
+                    )
+                    peak = None
+                    if not args.no_memory:
+                        peak = run_once(board_file, grid, engine, extra_args, True)[1]
+                    slowest = max(phases, key=lambda phase: phase["seconds"])
+                    timings.append((grid * grid, seconds))
+                    results.append(
+                        {
+                            "engine": engine,
+                            "scale": scale,
+                            "grid": grid,
+                            "objects": objects,
+                            "seconds": seconds,
+                            "peak_bytes": peak,
+                            "phases": phases,
+                            "calls": dict(fake_pcbnew.CALLS),
+                        }
+                    )
+                    peak_mb = f"{peak / 2**20:9.1f}" if peak is not None else " " * 9
+                    print(
+                        f"{engine:<8}{scale:>7}{grid:>7}{objects:>11}{seconds:>10.3f}"
+                        f"{seconds / objects * 1e6:>9.2f}{peak_mb}"
+                        f"  {slowest['phase']} ({slowest['seconds']:.3f}s)"
+                    )
+                exponent = growth_exponent(timings)
+                if exponent is not None:
+                    flag = "  <-- super-linear" if exponent > 1.15 else ""
+                    print(f"{'':<8}{scale:>7} time ~ copies^{exponent:.2f}{flag}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1422 @@
+"""
+A lightweight in-process stand-in for the pcbnew module.
+
+Implements the subset of the KiCad 8 Python API that panelizer.py uses, with
+plain Python containers, so the duplication passes can be benchmarked without
+KiCad installed. Boards are registered by path with register_board() and
+LoadBoard() builds a fresh copy each time. BOARD.Save() writes a KiCad style
+S-expression file that the sexpr engine can read back.
+"""
+
+import itertools
+import os
+import random
+import uuid
+
+# layer ids and default names as in KiCad 8
+F_Cu = 0
+B_Cu = 31
+B_Adhes = 32
+F_Adhes = 33
+B_Paste = 34
+F_Paste = 35
+B_SilkS = 36
+F_SilkS = 37
+B_Mask = 38
+F_Mask = 39
+Dwgs_User = 40
+Cmts_User = 41
+Eco1_User = 42
+Eco2_User = 43
+Edge_Cuts = 44
+Margin = 45
+B_CrtYd = 46
+F_CrtYd = 47
+B_Fab = 48
+F_Fab = 49
+PCB_LAYER_ID_COUNT = 59
+
+_LAYER_NAMES = {
+    F_Cu: ("F.Cu", None),
+    B_Cu: ("B.Cu", None),
+    B_Adhes: ("B.Adhes", "B.Adhesive"),
+    F_Adhes: ("F.Adhes", "F.Adhesive"),
+    B_Paste: ("B.Paste", None),
+    F_Paste: ("F.Paste", None),
+    B_SilkS: ("B.SilkS", "B.Silkscreen"),
+    F_SilkS: ("F.SilkS", "F.Silkscreen"),
+    B_Mask: ("B.Mask", None),
+    F_Mask: ("F.Mask", None),
+    Dwgs_User: ("Dwgs.User", "User.Drawings"),
+    Cmts_User: ("Cmts.User", "User.Comments"),
+    Eco1_User: ("Eco1.User", "User.Eco1"),
+    Eco2_User: ("Eco2.User", "User.Eco2"),
+    Edge_Cuts: ("Edge.Cuts", None),
+    Margin: ("Margin", None),
+    B_CrtYd: ("B.CrtYd", "B.Courtyard"),
+    F_CrtYd: ("F.CrtYd", "F.Courtyard"),
+    B_Fab: ("B.Fab", None),
+    F_Fab: ("F.Fab", None),
+}
+for _i in range(1, 31):
+    _LAYER_NAMES[_i] = (f"In{_i}.Cu", None)
+for _i in range(1, 10):
+    _LAYER_NAMES[49 + _i] = (f"User.{_i}", None)
+
+GR_TEXT_H_ALIGN_LEFT = -1
+GR_TEXT_H_ALIGN_CENTER = 0
+GR_TEXT_H_ALIGN_RIGHT = 1
+
+TENTHS_OF_A_DEGREE_T = 1
+DEGREES_T = 10
+
+FP_THROUGH_HOLE = 1
+FP_SMD = 2
+FP_EXCLUDE_FROM_POS_FILES = 4
+FP_EXCLUDE_FROM_BOM = 8
+FP_BOARD_ONLY = 16
+FP_DNP = 64
+
+PAD_ATTRIB_PTH = 0
+PAD_ATTRIB_SMD = 1
+PAD_ATTRIB_NPTH = 3
+
+PAD_SHAPE_CIRCLE = 0
+PAD_SHAPE_RECT = 1
+
+ADD_MODE_INSERT = 0
+ADD_MODE_APPEND = 1
+ADD_MODE_BULK_APPEND = 2
+ADD_MODE_BULK_INSERT = 3
+
+DEFAULT_LINE_WIDTH = 100000  # 0.1mm in internal units
+EDGE_CLEARANCE = 1000000  # 1mm copper to board edge clearance of the zone filler
+
+# call counters, reset by the benchmark before each run
+CALLS = {}
+
+
+def _count(name):
+    CALLS[name] = CALLS.get(name, 0) + 1
+
+
+class VECTOR2I:
+    """Integer 2D vector."""
+
+    __slots__ = ("x", "y")
+
+    def __init__(self, x=0, y=0):
+        self.x = int(x)
+        self.y = int(y)
+
+    def __add__(self, other):
+        return VECTOR2I(self.x + other.x, self.y + other.y)
+
+    def __sub__(self, other):
+        return VECTOR2I(self.x - other.x, self.y - other.y)
+
+    def __eq__(self, other):
+        return self.x == other.x and self.y == other.y
+
+    def __repr__(self):
+        return f"VECTOR2I({self.x}, {self.y})"
+
+
+class BOX2I:
+    """Axis aligned integer box."""
+
+    def __init__(self, left=0, top=0, width=0, height=0):
+        self.left = left
+        self.top = top
+        self.width = width
+        self.height = height
+
+    @classmethod
+    def from_points(cls, points, inflate=0):
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        if not xs:
+            return cls()
+        left, top = min(xs) - inflate, min(ys) - inflate
+        return cls(left, top, max(xs) + inflate - left, max(ys) + inflate - top)
+
+    def Merge(self, other):
+        if not (self.width or self.height):
+            self.left, self.top = other.left, other.top
+            self.width, self.height = other.width, other.height
+            return
+        right = max(self.GetRight(), other.GetRight())
+        bottom = max(self.GetBottom(), other.GetBottom())
+        self.left = min(self.left, other.left)
+        self.top = min(self.top, other.top)
+        self.width = right - self.left
+        self.height = bottom - self.top
+
+    def GetWidth(self):
+        return self.width
+
+    def GetHeight(self):
+        return self.height
+
+    def GetX(self):
+        return self.left
+
+    def GetY(self):
+        return self.top
+
+    def GetLeft(self):
+        return self.left
+
+    def GetTop(self):
+        return self.top
+
+    def GetRight(self):
+        return self.left + self.width
+
+    def GetBottom(self):
+        return self.top + self.height
+
+    def GetCenter(self):
+        return VECTOR2I(self.left + self.width // 2, self.top + self.height // 2)
+
+
+class EDA_ANGLE:
+    """Angle, stored in degrees."""
+
+    def __init__(self, value=0, unit=TENTHS_OF_A_DEGREE_T):
+        self.degrees = value if unit == DEGREES_T else value / 10
+
+    def AsDegrees(self):
+        return self.degrees
+
+
+class KIID:
+    """Item unique id."""
+
+    def __init__(self, value=None):
+        self.value = value or str(uuid.uuid4())
+
+    def AsString(self):
+        _count("KIID.AsString")
+        return self.value
+
+    def Clone(self, other):
+        self.value = other.value
+
+
+class TITLE_BLOCK:
+    """Board title block."""
+
+    def __init__(self, title="", revision="", date="", company=""):
+        self.title = title
+        self.revision = revision
+        self.date = date
+        self.company = company
+
+    def GetTitle(self):
+        return self.title
+
+    def GetRevision(self):
+        return self.revision
+
+    def GetDate(self):
+        return self.date
+
+    def GetCompany(self):
+        return self.company
+
+
+class NETINFO_ITEM:
+    """A net."""
+
+    def __init__(self, board, name, code=-1):
+        self.board = board
+        self.name = name
+        self.code = code
+
+    def GetNetname(self):
+        return self.name
+
+    def GetNetCode(self):
+        return self.code
+
+
+class _Items:
+    """
+    Live view of a board's or footprint's item list, like pcbnew's SWIG deques.
+
+    It changes as items are added and removed, and can be iterated, indexed
+    and measured but not added to another sequence, so code that relies on
+    getting a copy or a list fails here as it would with KiCad.
+    """
+
+    def __init__(self, items):
+        self._items = items
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __bool__(self):
+        return bool(self._items)
+
+
+class LSET:
+    """Set of layers."""
+
+    def __init__(self, layers=()):
+        self.layers = sorted(layers)
+
+    def Seq(self):
+        return list(self.layers)
+
+
+class SHAPE_POLY_SET:
+    """Polygon point list, copyable with SHAPE_POLY_SET(other)."""
+
+    def __init__(self, source=None):
+        self.points = list(source.points) if source else []
+
+    def Move(self, vector):
+        self.points = [(x + vector.x, y + vector.y) for x, y in self.points]
+
+    def Rotate(self, angle, center):
+        turns = round(angle.AsDegrees() / 90) % 4
+        points = []
+        for x, y in self.points:
+            x, y = x - center.x, y - center.y
+            for _ in range(turns):
+                x, y = y, -x
+            points.append((center.x + x, center.y + y))
+        self.points = points
+
+    def PointCount(self):
+        return len(self.points)
+
+
+class BOARD_ITEM:
+    """Base class for items that live on a board."""
+
+    def __init__(self, parent=None, layer=F_Cu):
+        self.parent = parent
+        self.layer = layer
+        self.m_Uuid = KIID()
+
+    def _clone(self):
+        item = object.__new__(type(self))
+        item.__dict__.update(self.__dict__)
+        item.m_Uuid = KIID()
+        return item
+
+    def Duplicate(self):
+        _count("Duplicate")
+        return self._clone()
+
+    def GetClass(self):
+        _count("GetClass")
+        return type(self).__name__
+
+    def GetLayer(self):
+        _count("GetLayer")
+        return self.layer
+
+    def SetLayer(self, layer):
+        self.layer = layer
+
+    def IsOnLayer(self, layer):
+        return self.layer == layer
+
+    def GetParent(self):
+        return self.parent
+
+    def GetParentGroup(self):
+        return self.__dict__.get("group")
+
+    def DeleteStructure(self):
+        self.parent.Remove(self)
+
+    def Move(self, vector):
+        _count("Move")
+        self._move(vector.x, vector.y)
+
+    def _move(self, dx, dy):
+        raise NotImplementedError
+
+    def Rotate(self, center, angle):
+        """Rotate about center, by multiples of 90 degrees like KiCad's RotatePoint."""
+        _count("Rotate")
+        degrees = angle.AsDegrees()
+        turns = round(degrees / 90) % 4
+
+        def turn(point):
+            x, y = point[0] - center.x, point[1] - center.y
+            for _ in range(turns):
+                x, y = y, -x
+            return (center.x + x, center.y + y)
+
+        self._map(turn, degrees)
+
+    def _map(self, turn, degrees):
+        raise NotImplementedError
+
+    def Flip(self, center, flip_left_right):
+        """Flip to the other side, mirrored left to right or top to bottom."""
+        _count("Flip")
+
+        def mirror(point):
+            if flip_left_right:
+                return (2 * center.x - point[0], point[1])
+            return (point[0], 2 * center.y - point[1])
+
+        self._flip(mirror, flip_left_right)
+
+    def _flip(self, mirror, flip_left_right):
+        raise NotImplementedError
+
+
+class BOARD_CONNECTED_ITEM(BOARD_ITEM):
+    """Board item on a net."""
+
+    net = None
+
+    def SetNet(self, net):
+        self.net = net
+
+    def GetNet(self):
+        return self.net
+
+    def GetNetname(self):
+        _count("GetNetname")
+        return self.net.name if self.net else ""
+
+    def SetNetCode(self, code):
+        """Set the net by code, only net 0 (unconnected) is supported."""
+        if code != 0:
+            raise NotImplementedError
+        self.net = None
+
+
+class PCB_SHAPE(BOARD_ITEM):
+    """Graphic line segment."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent, Dwgs_User)
+        self.start = (0, 0)
+        self.end = (0, 0)
+        self.width = DEFAULT_LINE_WIDTH
+
+    def SetStart(self, point):
+        self.start = (point.x, point.y)
+
+    def SetEnd(self, point):
+        self.end = (point.x, point.y)
+
+    def GetStart(self):
+        return VECTOR2I(*self.start)
+
+    def GetPosition(self):
+        return VECTOR2I(*self.start)
+
+    def GetEnd(self):
+        return VECTOR2I(*self.end)
+
+    def SetWidth(self, width):
+        self.width = width
+
+    def GetWidth(self):
+        return self.width
+
+    def _move(self, dx, dy):
+        self.start = (self.start[0] + dx, self.start[1] + dy)
+        self.end = (self.end[0] + dx, self.end[1] + dy)
+
+    def _map(self, turn, degrees):
+        self.start = turn(self.start)
+        self.end = turn(self.end)
+
+    def _flip(self, mirror, flip_left_right):
+        self.start = mirror(self.start)
+        self.end = mirror(self.end)
+        self.layer = FlipLayer(self.layer)
+
+    def GetBoundingBox(self):
+        return BOX2I.from_points([self.start, self.end], self.width // 2)
+
+
+class PCB_TEXT(BOARD_ITEM):
+    """Graphic text."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent, F_SilkS)
+        self.text = ""
+        self.position = (0, 0)
+        self.size = (1000000, 1000000)
+        self.justify = GR_TEXT_H_ALIGN_CENTER
+        self.angle = 0
+
+    def SetText(self, text):
+        self.text = text
+
+    def GetText(self):
+        return self.text
+
+    def SetPosition(self, point):
+        self.position = (point.x, point.y)
+
+    def GetPosition(self):
+        return VECTOR2I(*self.position)
+
+    def SetTextSize(self, size):
+        self.size = (size.x, size.y)
+
+    def SetHorizJustify(self, justify):
+        self.justify = justify
+
+    def SetTextAngle(self, angle):
+        self.angle = angle.AsDegrees()
+
+    def _move(self, dx, dy):
+        self.position = (self.position[0] + dx, self.position[1] + dy)
+
+    def _map(self, turn, degrees):
+        self.position = turn(self.position)
+        self.angle = (self.angle + degrees) % 360
+
+    def _flip(self, mirror, flip_left_right):
+        self.position = mirror(self.position)
+        self.angle = -self.angle % 360
+        self.layer = FlipLayer(self.layer)
+
+    def GetBoundingBox(self):
+        return BOX2I.from_points([self.position])
+
+
+class PCB_TRACK(PCB_SHAPE, BOARD_CONNECTED_ITEM):
+    """Copper track segment."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.layer = F_Cu
+        self.width = 250000
+        self.net = None
+
+
+class PCB_VIA(PCB_TRACK):
+    """Via."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.width = 600000
+
+    def SetPosition(self, point):
+        self.start = self.end = (point.x, point.y)
+
+    def GetPosition(self):
+        return VECTOR2I(*self.start)
+
+
+class PAD(BOARD_CONNECTED_ITEM):
+    """Footprint pad, with an absolute position like KiCad's."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent, F_Cu)
+        self.position = (0, 0)
+        self.size = (800000, 950000)
+        self.drill = (0, 0)
+        self.number = ""
+        self.net = None
+        self.attribute = PAD_ATTRIB_SMD
+        self.shape = PAD_SHAPE_RECT
+        self.layer_set = LSET([F_Cu, F_Paste, F_Mask])
+
+    def SetPosition(self, point):
+        self.position = (point.x, point.y)
+
+    def GetPosition(self):
+        return VECTOR2I(*self.position)
+
+    def SetNumber(self, number):
+        self.number = number
+
+    def SetAttribute(self, attribute):
+        self.attribute = attribute
+
+    def GetAttribute(self):
+        return self.attribute
+
+    def SetShape(self, shape):
+        self.shape = shape
+
+    def SetSize(self, size):
+        self.size = (size.x, size.y)
+
+    def SetDrillSize(self, size):
+        self.drill = (size.x, size.y)
+
+    def GetDrillSize(self):
+        return VECTOR2I(*self.drill)
+
+    def SetLayerSet(self, layer_set):
+        self.layer_set = layer_set
+
+    @staticmethod
+    def UnplatedHoleMask():
+        return LSET([F_Cu, B_Cu, F_Mask, B_Mask])
+
+    def _move(self, dx, dy):
+        self.position = (self.position[0] + dx, self.position[1] + dy)
+
+    def _map(self, turn, degrees):
+        self.position = turn(self.position)
+
+    def _flip(self, mirror, flip_left_right):
+        self.position = mirror(self.position)
+        self.layer = FlipLayer(self.layer)
+
+
+class PCB_FIELD:
+    """Footprint text field, of which only the visibility is kept."""
+
+    def __init__(self, visible=True):
+        self.visible = visible
+
+    def SetVisible(self, visible):
+        self.visible = visible
+
+    def IsVisible(self):
+        return self.visible
+
+
+class LIB_ID:
+    """Footprint library id."""
+
+    def __init__(self, text):
+        self.library, _, self.name = text.rpartition(":")
+
+    def GetLibItemName(self):
+        return self.name
+
+
+class FP_3DMODEL:
+    """3D model reference of a footprint."""
+
+    def __init__(self, filename=""):
+        self.m_Filename = filename
+
+
+class FOOTPRINT(BOARD_ITEM):
+    """Footprint, copyable with FOOTPRINT(other) like the real copy constructor."""
+
+    def __init__(self, source=None):
+        if isinstance(source, FOOTPRINT):
+            _count("FOOTPRINT copy")
+            super().__init__(source.parent, source.layer)
+            self.position = source.position
+            self.orientation = source.orientation
+            self.reference = source.reference
+            self.value = source.value
+            self.fpid = source.fpid
+            self.attributes = source.attributes
+            self.reference_field = PCB_FIELD(source.reference_field.visible)
+            self.value_field = PCB_FIELD(source.value_field.visible)
+            self.pads = [pad._clone() for pad in source.pads]
+            self.graphics = [item._clone() for item in source.graphics]
+            self.models = [FP_3DMODEL(model.m_Filename) for model in source.models]
+            for child in itertools.chain(self.pads, self.graphics):
+                child.parent = self
+        else:
+            super().__init__(source, F_Cu)
+            self.position = (0, 0)
+            self.orientation = 0
+            self.reference = ""
+            self.value = ""
+            self.fpid = "Synthetic:Footprint"
+            self.attributes = FP_SMD
+            self.reference_field = PCB_FIELD()
+            self.value_field = PCB_FIELD()
+            self.pads = []
+            self.graphics = []
+            self.models = []
+
+    def Duplicate(self):
+        _count("Duplicate")
+        return FOOTPRINT(self)
+
+    def GetPosition(self):
+        _count("GetPosition")
+        return VECTOR2I(*self.position)
+
+    def SetPosition(self, point):
+        self._move(point.x - self.position[0], point.y - self.position[1])
+
+    def _move(self, dx, dy):
+        self.position = (self.position[0] + dx, self.position[1] + dy)
+        for child in itertools.chain(self.pads, self.graphics):
+            child._move(dx, dy)
+
+    def _map(self, turn, degrees):
+        self.position = turn(self.position)
+        self.orientation = (self.orientation + degrees) % 360
+        for child in itertools.chain(self.pads, self.graphics):
+            child._map(turn, degrees)
+
+    def _flip(self, mirror, flip_left_right):
+        # KiCad mirrors top to bottom and turns the footprint 180 degrees for
+        # a left to right flip, so the orientation goes from o to 180 - o
+        self.position = mirror(self.position)
+        self.orientation = ((180 if flip_left_right else 0) - self.orientation) % 360
+        self.layer = FlipLayer(self.layer)
+        for child in itertools.chain(self.pads, self.graphics):
+            child._flip(mirror, flip_left_right)
+
+    def GetOrientationDegrees(self):
+        return self.orientation
+
+    def GetFPID(self):
+        return LIB_ID(self.fpid)
+
+    def GetAttributes(self):
+        return self.attributes
+
+    def SetAttributes(self, attributes):
+        self.attributes = attributes
+
+    def Reference(self):
+        return self.reference_field
+
+    def Value(self):
+        return self.value_field
+
+    def GetReference(self):
+        return self.reference
+
+    def SetReference(self, reference):
+        self.reference = reference
+
+    def GetValue(self):
+        return self.value
+
+    def SetValue(self, value):
+        self.value = value
+
+    def Pads(self):
+        return _Items(self.pads)
+
+    def GraphicalItems(self):
+        return _Items(self.graphics)
+
+    def GetFields(self):
+        return []
+
+    def Zones(self):
+        return _Items([])
+
+    def Models(self):
+        return self.models
+
+    def Add(self, item):
+        item.parent = self
+        (self.pads if isinstance(item, PAD) else self.graphics).append(item)
+
+    def Remove(self, item):
+        (self.pads if isinstance(item, PAD) else self.graphics).remove(item)
+
+    def IsFlipped(self):
+        return self.layer == B_Cu
+
+
+class ZONE(BOARD_CONNECTED_ITEM):
+    """Copper zone with an outline and a filled polygon per layer."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent, F_Cu)
+        self.outline = []
+        self.fills = {}
+        self.filled = False
+        self.need_refill = False
+        self.net = None
+
+    def _clone(self):
+        zone = super()._clone()
+        zone.outline = list(self.outline)
+        zone.fills = {layer: list(poly) for layer, poly in self.fills.items()}
+        return zone
+
+    def GetLayerSet(self):
+        return LSET([self.layer])
+
+    def GetFilledPolysList(self, layer):
+        fill = SHAPE_POLY_SET()
+        fill.points = self.fills.get(layer, [])
+        return fill
+
+    def SetFilledPolysList(self, layer, fill):
+        _count("SetFilledPolysList")
+        self.fills[layer] = fill.points
+
+    def SetNeedRefill(self, need_refill):
+        self.need_refill = need_refill
+
+    def IsFilled(self):
+        return self.filled
+
+    def SetIsFilled(self, filled):
+        self.filled = filled
+
+    def _move(self, dx, dy):
+        self.outline = [(x + dx, y + dy) for x, y in self.outline]
+        self.fills = {
+            layer: [(x + dx, y + dy) for x, y in poly]
+            for layer, poly in self.fills.items()
+        }
+
+    def _map(self, turn, degrees):
+        self.outline = [turn(point) for point in self.outline]
+        self.fills = {
+            layer: [turn(point) for point in poly] for layer, poly in self.fills.items()
+        }
+
+    def _flip(self, mirror, flip_left_right):
+        # changing layers drops the fill, as in KiCad
+        self.outline = [mirror(point) for point in self.outline]
+        self.layer = FlipLayer(self.layer)
+        self.fills = {}
+        self.filled = False
+
+    def GetPosition(self):
+        return VECTOR2I(*self.outline[0])
+
+    def GetBoundingBox(self):
+        return BOX2I.from_points(self.outline)
+
+
+class PCB_GROUP(BOARD_ITEM):
+    """Group of board items, duplicated and moved as a whole natively."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent, F_Cu)
+        self.items = []
+        self.name = ""
+
+    def AddItem(self, item):
+        _count("PCB_GROUP.AddItem")
+        item.group = self
+        self.items.append(item)
+        return True
+
+    def RemoveAll(self):
+        for item in self.items:
+            item.group = None
+        self.items = []
+
+    def GetItems(self):
+        return list(self.items)
+
+    def GetPosition(self):
+        positions = [item.GetPosition() for item in self.items]
+        return VECTOR2I(min(p.x for p in positions), min(p.y for p in positions))
+
+    def SetName(self, name):
+        self.name = name
+
+    def GetName(self):
+        return self.name
+
+    def DeepDuplicate(self):
+        _count("DeepDuplicate")
+        return self._deep_duplicate(False)
+
+    def DeepClone(self):
+        """Copy the group and its members, keeping all their uuids."""
+        _count("DeepClone")
+        return self._deep_duplicate(True)
+
+    def _deep_duplicate(self, keep_uuids):
+        group = PCB_GROUP(self.parent)
+        group.name = self.name
+        if keep_uuids:
+            group.m_Uuid = KIID(self.m_Uuid.value)
+        for item in self.items:
+            if isinstance(item, PCB_GROUP):
+                child = item._deep_duplicate(keep_uuids)
+            elif isinstance(item, FOOTPRINT):
+                child = FOOTPRINT(item)
+            else:
+                child = item._clone()
+            if keep_uuids and not isinstance(item, PCB_GROUP):
+                child.m_Uuid = KIID(item.m_Uuid.value)
+                if isinstance(item, FOOTPRINT):
+                    for copied, original in zip(
+                        itertools.chain(child.pads, child.graphics),
+                        itertools.chain(item.pads, item.graphics),
+                    ):
+                        copied.m_Uuid = KIID(original.m_Uuid.value)
+            child.group = group
+            group.items.append(child)
+        # KiCad keeps the members in an unordered set
+        random.shuffle(group.items)
+        return group
+
+    def _move(self, dx, dy):
+        for item in self.items:
+            item._move(dx, dy)
+
+    def _map(self, turn, degrees):
+        for item in self.items:
+            item._map(turn, degrees)
+
+    def _flip(self, mirror, flip_left_right):
+        for item in self.items:
+            item._flip(mirror, flip_left_right)
+
+
+class ZONES(list):
+    """Vector of zones."""
+
+
+class ZONE_FILLER:
+    """
+    Zone filler, filling each zone with its outline inset by 0.5mm.
+
+    Like KiCad's, the fill is clipped to the board outline, keeping the
+    1mm edge clearance, so a board without Edge.Cuts fills differently.
+    """
+
+    def __init__(self, board):
+        self.board = board
+
+    def Fill(self, zones):
+        _count("ZONE_FILLER.Fill")
+        edges = self.board.GetBoardEdgesBoundingBox()
+        for zone in zones:
+            xs = [x for x, _ in zone.outline]
+            ys = [y for _, y in zone.outline]
+            cx, cy = (min(xs) + max(xs)) // 2, (min(ys) + max(ys)) // 2
+            fill = [
+                (
+                    x + (500000 if x < cx else -500000),
+                    y + (500000 if y < cy else -500000),
+                )
+                for x, y in zone.outline
+            ]
+            if edges.GetWidth() and edges.GetHeight():
+                fill = [
+                    (
+                        min(
+                            max(x, edges.GetLeft() + EDGE_CLEARANCE),
+                            edges.GetRight() - EDGE_CLEARANCE,
+                        ),
+                        min(
+                            max(y, edges.GetTop() + EDGE_CLEARANCE),
+                            edges.GetBottom() - EDGE_CLEARANCE,
+                        ),
+                    )
+                    for x, y in fill
+                ]
+            zone.fills[zone.layer] = fill
+            zone.filled = True
+            zone.need_refill = False
+        return True
+
+
+class BOARD_DESIGN_SETTINGS:
+    """Board design settings, only the auxiliary origin."""
+
+    def __init__(self):
+        self.aux_origin = (0, 0)
+
+    def SetAuxOrigin(self, point):
+        self.aux_origin = (point.x, point.y)
+
+    def GetAuxOrigin(self):
+        return VECTOR2I(*self.aux_origin)
+
+
+class BOARD:
+    """Board holding tracks, drawings, footprints and zones in Python lists."""
+
+    def __init__(self):
+        self.tracks = []
+        self.drawings = []
+        self.footprints = []
+        self.zones = []
+        self.groups = []
+        self.nets = {}
+        self.title_block = TITLE_BLOCK()
+        self.filename = ""
+        self.design_settings = BOARD_DESIGN_SETTINGS()
+        self.copper_layers = 2
+
+    def Add(self, item, mode=ADD_MODE_INSERT, skip_connectivity=False):
+        _count("BOARD.Add")
+        if not skip_connectivity and isinstance(item, (PCB_TRACK, FOOTPRINT, ZONE)):
+            _count("connectivity update")
+        item.parent = self
+        if isinstance(item, PCB_TRACK):
+            self.tracks.append(item)
+        elif isinstance(item, FOOTPRINT):
+            self.footprints.append(item)
+        elif isinstance(item, ZONE):
+            self.zones.append(item)
+        elif isinstance(item, PCB_GROUP):
+            self.groups.append(item)
+        elif isinstance(item, NETINFO_ITEM):
+            item.code = len(self.nets) + 1
+            self.nets[item.name] = item
+        else:
+            self.drawings.append(item)
+
+    def BuildConnectivity(self):
+        _count("BuildConnectivity")
+
+    def Remove(self, item):
+        _count("BOARD.Remove")
+        for items in (
+            self.tracks,
+            self.drawings,
+            self.footprints,
+            self.zones,
+            self.groups,
+        ):
+            if item in items:
+                items.remove(item)
+                return
+
+    def GetTracks(self):
+        return _Items(self.tracks)
+
+    def GetDrawings(self):
+        return _Items(self.drawings)
+
+    def GetFootprints(self):
+        return _Items(self.footprints)
+
+    def Zones(self):
+        return _Items(self.zones)
+
+    def Groups(self):
+        return list(self.groups)
+
+    def GetAreaCount(self):
+        return len(self.zones)
+
+    def GetCopperLayerCount(self):
+        return self.copper_layers
+
+    def SetCopperLayerCount(self, count):
+        self.copper_layers = count
+
+    def GetArea(self, index):
+        return self.zones[index]
+
+    def FindNet(self, name):
+        return self.nets.get(name)
+
+    def GetLayerName(self, layer):
+        canonical, user = _LAYER_NAMES.get(layer, (f"Layer{layer}", None))
+        return user or canonical
+
+    @staticmethod
+    def GetStandardLayerName(layer):
+        return _LAYER_NAMES.get(layer, (f"Layer{layer}", None))[0]
+
+    def GetTitleBlock(self):
+        return self.title_block
+
+    def GetFileName(self):
+        return self.filename
+
+    def SetFileName(self, path):
+        self.filename = path
+
+    def GetDesignSettings(self):
+        return self.design_settings
+
+    def GetEnabledLayers(self):
+        return LSET([F_Cu, B_Cu] + [layer for layer in _LAYER_NAMES if layer > B_Cu])
+
+    def GetBoardEdgesBoundingBox(self):
+        box = BOX2I()
+        edges = [d for d in self.drawings if d.layer == Edge_Cuts]
+        for footprint in self.footprints:
+            edges.extend(g for g in footprint.graphics if g.layer == Edge_Cuts)
+        for edge in edges:
+            box.Merge(edge.GetBoundingBox())
+        return box
+
+    def Save(self, path):
+        with open(path, "w", encoding="utf-8") as output:
+            output.write(_format_board(self))
+        return True
+
+
+_BOARDS = {}
+
+
+def register_board(path, factory):
+    """Register a function building the board that LoadBoard(path) returns."""
+    _BOARDS[str(path)] = factory
+
+
+def LoadBoard(path):
+    """Build the board registered for path."""
+    board = _BOARDS[str(path)]()
+    board.filename = str(path)
+    return board
+
+
+def CreateEmptyBoard():
+    return BOARD()
+
+
+def Version():
+    return "8.0.0"
+
+
+# front and back layer pairs swapped by FlipLayer()
+_FLIPPED_LAYERS = {}
+for _front, _back in (
+    (F_Cu, B_Cu),
+    (F_Adhes, B_Adhes),
+    (F_Paste, B_Paste),
+    (F_SilkS, B_SilkS),
+    (F_Mask, B_Mask),
+    (F_CrtYd, B_CrtYd),
+    (F_Fab, B_Fab),
+):
+    _FLIPPED_LAYERS[_front] = _back
+    _FLIPPED_LAYERS[_back] = _front
+
+
+def FlipLayer(layer, copper_layers=2):
+    """Return the layer on the other side, inner layers counted from the back."""
+    if F_Cu < layer < B_Cu:
+        return copper_layers - 1 - layer
+    return _FLIPPED_LAYERS.get(layer, layer)
+
+
+def IsCopperLayer(layer):
+    return layer <= B_Cu
+
+
+# Gerber and Excellon output, in KiCad's file layout, for the --gerber mode
+
+PLOT_FORMAT_GERBER = 1
+
+
+class PCB_PLOT_PARAMS:
+    """Plot options, stored as plain attributes."""
+
+    def __init__(self):
+        self.output_directory = ""
+        self.use_aux_origin = False
+
+    def SetOutputDirectory(self, path):
+        self.output_directory = path
+
+    def SetUseAuxOrigin(self, use):
+        self.use_aux_origin = use
+
+    def SetFormat(self, fmt):
+        pass
+
+    def SetUseGerberX2format(self, use):
+        pass
+
+    def SetPlotFrameRef(self, plot):
+        pass
+
+    def SetCreateGerberJobFile(self, create):
+        pass
+
+
+class PLOT_CONTROLLER:
+    """Plots one layer per file like KiCad's plot controller."""
+
+    def __init__(self, board):
+        self.board = board
+        self.options = PCB_PLOT_PARAMS()
+        self.layer = F_Cu
+        self.path = None
+
+    def GetPlotOptions(self):
+        return self.options
+
+    def SetLayer(self, layer):
+        self.layer = layer
+
+    def OpenPlotfile(self, suffix, fmt, sheet):
+        stem = os.path.splitext(os.path.basename(self.board.filename))[0]
+        self.path = os.path.join(
+            self.options.output_directory, f"{stem}-{suffix}.gbr"
+        )
+        return True
+
+    def PlotLayer(self):
+        _count("PlotLayer")
+        origin = (0, 0)
+        if self.options.use_aux_origin:
+            origin = self.board.design_settings.aux_origin
+        with open(self.path, "w", encoding="utf-8") as output:
+            output.write(_plot_gerber(self.board, self.layer, origin))
+        return True
+
+    def GetPlotFileName(self):
+        return self.path
+
+    def ClosePlot(self):
+        pass
+
+
+def _plot_gerber(board, layer, origin):
+    apertures = {}
+    body = []
+
+    def xy(point):
+        return f"X{point[0] - origin[0]}Y{origin[1] - point[1]}"
+
+    def select(shape):
+        if shape not in apertures:
+            apertures[shape] = 10 + len(apertures)
+        body.append(f"D{apertures[shape]}*")
+
+    shapes = [t for t in board.tracks if t.layer == layer]
+    shapes += [d for d in board.drawings if d.layer == layer]
+    for footprint in board.footprints:
+        shapes += [g for g in footprint.graphics if g.layer == layer]
+        if layer in (F_Cu, F_Paste, F_Mask):
+            shapes += footprint.pads
+    for item in shapes:
+        if isinstance(item, PAD):
+            select(f"R,{_mm(item.size[0])}X{_mm(item.size[1])}")
+            body.append(f"{xy(item.position)}D03*")
+        elif isinstance(item, PCB_TEXT):
+            select("C,0.150000")
+            body.append(f"{xy(item.position)}D03*")
+        else:
+            select(f"C,{_mm(item.width)}")
+            body.append(f"{xy(item.start)}D02*")
+            body.append(f"{xy(item.end)}D01*")
+    for zone in board.zones:
+        for fill in [zone.fills[layer]] if layer in zone.fills else []:
+            body.append("G36*")
+            body.append(f"{xy(fill[0])}D02*")
+            body.extend(f"{xy(point)}D01*" for point in fill[1:] + fill[:1])
+            body.append("G37*")
+
+    name = _LAYER_NAMES[layer][0]
+    return "\n".join(
+        [
+            "%TF.GenerationSoftware,KiCad,Pcbnew,8.0.0*%",
+            f"%TF.FileFunction,{name}*%",
+            "%FSLAX46Y46*%",
+            "G04 Gerber Fmt 4.6, Leading zero omitted, Abs format (unit mm)*",
+            "%MOMM*%",
+            "%LPD*%",
+            "G01*",
+            "G04 APERTURE LIST*",
+        ]
+        + [f"%ADD{code}{shape}*%" for shape, code in apertures.items()]
+        + ["G04 APERTURE END LIST*"]
+        + body
+        + ["M02*", ""]
+    )
+
+
+class EXCELLON_WRITER:
+    """Writes the vias and NPTH pads of a board as Excellon drill files."""
+
+    def __init__(self, board):
+        self.board = board
+        self.offset = (0, 0)
+
+    def SetOptions(self, mirror, minimal_header, offset, merge_npth):
+        self.offset = (offset.x, offset.y)
+
+    def SetFormat(self, metric, *args):
+        pass
+
+    def CreateDrillandMapFilesSet(self, directory, gen_drill, gen_map):
+        _count("CreateDrillandMapFilesSet")
+        stem = os.path.splitext(os.path.basename(self.board.filename))[0]
+        vias = [(t.start, 300000) for t in self.board.tracks if isinstance(t, PCB_VIA)]
+        holes = [
+            (pad.position, pad.drill[0])
+            for fp in self.board.footprints
+            for pad in fp.pads
+            if pad.attribute == PAD_ATTRIB_NPTH
+        ]
+        for kind, hits in (("PTH", vias), ("NPTH", holes)):
+            lines = ["M48", "; DRILL file {KiCad 8.0.0}", "FMAT,2", "METRIC"]
+            tools = sorted({drill for _, drill in hits})
+            for tool, drill in enumerate(tools, 1):
+                lines.append(f"T{tool}C{drill / 1000000:.3f}")
+            lines += ["%", "G90", "G05"]
+            for tool, drill in enumerate(tools, 1):
+                lines.append(f"T{tool}")
+                for (x, y), hit_drill in hits:
+                    if hit_drill == drill:
+                        lines.append(
+                            f"X{_mm(x - self.offset[0])}Y{_mm(self.offset[1] - y)}"
+                        )
+            lines += ["M30", ""]
+            path = os.path.join(directory, f"{stem}-{kind}.drl")
+            with open(path, "w", encoding="utf-8") as output:
+                output.write("\n".join(lines))
+        return True
+
+
+# S-expression output, close enough to KiCad 8 for the sexpr engine
+
+
+def _mm(value):
+    text = f"{value / 1000000:.6f}".rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text
+
+
+def _q(text):
+    escaped = text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'"{escaped}"'
+
+
+def _layer(layer):
+    return _q(_LAYER_NAMES[layer][0])
+
+
+def _net(board, net):
+    return f"(net {net.code if net else 0})"
+
+
+def _format_board(board):
+    out = ["(kicad_pcb\n\t(version 20240108)\n\t(generator \"fake_pcbnew\")\n"]
+    out.append("\t(layers\n")
+    for layer, (canonical, user) in sorted(_LAYER_NAMES.items()):
+        kind = "signal" if layer <= B_Cu else "user"
+        suffix = f" {_q(user)}" if user else ""
+        out.append(f"\t\t({layer} {_q(canonical)} {kind}{suffix})\n")
+    out.append("\t)\n")
+    tb = board.title_block
+    out.append(
+        f"\t(title_block (title {_q(tb.title)}) (date {_q(tb.date)}) "
+        f"(rev {_q(tb.revision)}) (company {_q(tb.company)}))\n"
+    )
+    out.append('\t(net 0 "")\n')
+    for net in board.nets.values():
+        out.append(f"\t(net {net.code} {_q(net.name)})\n")
+
+    for fp in board.footprints:
+        px, py = fp.position
+        angle = f" {fp.orientation:g}" if fp.orientation else ""
+
+        def local(x, y):
+            # child coordinates are relative to the footprint, before it turns
+            x, y = x - px, y - py
+            for _ in range(round(fp.orientation / 90) % 4):
+                x, y = -y, x
+            return f"{_mm(x)} {_mm(y)}"
+
+        attrs = [
+            name
+            for flag, name in (
+                (FP_BOARD_ONLY, "board_only"),
+                (FP_EXCLUDE_FROM_POS_FILES, "exclude_from_pos_files"),
+                (FP_EXCLUDE_FROM_BOM, "exclude_from_bom"),
+            )
+            if fp.attributes & flag
+        ]
+        attr = f" (attr {' '.join(attrs)})" if attrs else ""
+        ref_hide = "" if fp.reference_field.visible else " (hide yes)"
+        value_hide = "" if fp.value_field.visible else " (hide yes)"
+        out.append(
+            f"\t(footprint {_q(fp.fpid)} (layer {_layer(fp.layer)}) "
+            f"(uuid {_q(fp.m_Uuid.AsString())}) (at {_mm(px)} {_mm(py)}{angle})"
+            f"{attr}\n"
+            f"\t\t(property \"Reference\" {_q(fp.reference)} (at 0 -1.5) "
+            f'(layer "F.SilkS"){ref_hide} '
+            f"(effects (font (size 1 1) (thickness 0.15))))\n"
+            f"\t\t(property \"Value\" {_q(fp.value)} (at 0 1.5) "
+            f'(layer "F.Fab"){value_hide} '
+            f"(effects (font (size 1 1) (thickness 0.15))))\n"
+        )
+        for item in fp.graphics:
+            (sx, sy), (ex, ey) = item.start, item.end
+            out.append(
+                f"\t\t(fp_line (start {local(sx, sy)}) (end {local(ex, ey)}) "
+                f"(stroke (width {_mm(item.width)}) (type solid)) "
+                f"(layer {_layer(item.layer)}) (uuid {_q(item.m_Uuid.AsString())}))\n"
+            )
+        for pad in fp.pads:
+            x, y = pad.position
+            if pad.attribute == PAD_ATTRIB_NPTH:
+                out.append(
+                    f"\t\t(pad {_q(pad.number)} np_thru_hole circle "
+                    f"(at {local(x, y)}) (size {_mm(pad.size[0])} {_mm(pad.size[1])}) "
+                    f'(drill {_mm(pad.drill[0])}) (layers "*.Cu" "*.Mask") '
+                    f"(uuid {_q(pad.m_Uuid.AsString())}))\n"
+                )
+                continue
+            out.append(
+                f"\t\t(pad {_q(pad.number)} smd rect (at {local(x, y)}{angle}) "
+                f"(size {_mm(pad.size[0])} {_mm(pad.size[1])}) "
+                f'(layers "F.Cu" "F.Paste" "F.Mask") {_net(board, pad.net)} '
+                f"(uuid {_q(pad.m_Uuid.AsString())}))\n"
+            )
+        for model in fp.models:
+            out.append(
+                f"\t\t(model {_q(model.m_Filename)} (offset (xyz 0 0 0)) "
+                "(scale (xyz 1 1 1)) (rotate (xyz 0 0 0)))\n"
+            )
+        out.append("\t)\n")
+
+    for item in board.drawings:
+        if isinstance(item, PCB_TEXT):
+            x, y = item.position
+            angle = f" {item.angle:g}" if item.angle else ""
+            out.append(
+                f"\t(gr_text {_q(item.text)} (at {_mm(x)} {_mm(y)}{angle}) "
+                f"(layer {_layer(item.layer)}) (uuid {_q(item.m_Uuid.AsString())}) "
+                f"(effects (font (size {_mm(item.size[0])} {_mm(item.size[1])}))))\n"
+            )
+        else:
+            (sx, sy), (ex, ey) = item.start, item.end
+            out.append(
+                f"\t(gr_line (start {_mm(sx)} {_mm(sy)}) (end {_mm(ex)} {_mm(ey)}) "
+                f"(stroke (width {_mm(item.width)}) (type default)) "
+                f"(layer {_layer(item.layer)}) (uuid {_q(item.m_Uuid.AsString())}))\n"
+            )
+
+    for item in board.tracks:
+        (sx, sy), (ex, ey) = item.start, item.end
+        if isinstance(item, PCB_VIA):
+            out.append(
+                f"\t(via (at {_mm(sx)} {_mm(sy)}) (size {_mm(item.width)}) "
+                f'(drill 0.3) (layers "F.Cu" "B.Cu") {_net(board, item.net)} '
+                f"(uuid {_q(item.m_Uuid.AsString())}))\n"
+            )
+        else:
+            out.append(
+                f"\t(segment (start {_mm(sx)} {_mm(sy)}) (end {_mm(ex)} {_mm(ey)}) "
+                f"(width {_mm(item.width)}) (layer {_layer(item.layer)}) "
+                f"{_net(board, item.net)} (uuid {_q(item.m_Uuid.AsString())}))\n"
+            )
+
+    for zone in board.zones:
+        name = zone.net.name if zone.net else ""
+        pts = " ".join(f"(xy {_mm(x)} {_mm(y)})" for x, y in zone.outline)
+        out.append(
+            f"\t(zone {_net(board, zone.net)} (net_name {_q(name)}) "
+            f"(layer {_layer(zone.layer)}) (uuid {_q(zone.m_Uuid.AsString())})\n"
+            f"\t\t(polygon (pts {pts}))\n"
+        )
+        for layer, poly in zone.fills.items():
+            pts = " ".join(f"(xy {_mm(x)} {_mm(y)})" for x, y in poly)
+            out.append(f"\t\t(filled_polygon (layer {_layer(layer)}) (pts {pts}))\n")
+        out.append("\t)\n")
+
+    out.append(")\n")
+    return "".join(out)
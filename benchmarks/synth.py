@@ -0,0 +1,195 @@
+"""
+Synthetic board generator for the benchmarks.
+
+Builds fake_pcbnew boards with a given number of tracks, footprints, pads per
+footprint, zones and documentation drawings inside a rectangular Edge.Cuts
+outline, and registers them so that LoadBoard() (and so panelizer.py) can load
+them by path.
+"""
+
+import math
+import random
+import uuid
+
+import fake_pcbnew as pcbnew
+
+MM = 1000000
+
+
+def make_board(
+    tracks=100,
+    footprints=25,
+    pads=4,
+    zones=1,
+    width=50,
+    height=40,
+    outline_segments=1,
+    seed=1,
+    outline=None,
+    drawings=0,
+    fab=False,
+):
+    """
+    Build a synthetic board.
+
+    Args:
+        tracks: Number of track segments (every tenth one is a via)
+        footprints: Number of footprints
+        pads: Number of pads per footprint
+        zones: Number of filled zones covering the board
+        width: Board width in mm
+        height: Board height in mm
+        outline_segments: Number of Edge.Cuts segments per side of the outline
+        seed: Random seed, so the same arguments give the same board
+        outline: Corners in mm of an Edge.Cuts polygon to use instead of the
+            width by height rectangle, e.g. an L shape
+        drawings: Number of lines on the documentation layers (User.Drawings,
+            User.Comments and F.Fab), as on a documented board
+        fab: Give every footprint an F.Fab outline and a 3D model, like
+            library footprints
+    """
+    rng = random.Random(seed)
+    board = pcbnew.BOARD()
+    board.title_block = pcbnew.TITLE_BLOCK("Synthetic", "1", "2024-01-01", "Bench")
+    nets = []
+    for i in range(max(1, tracks // 10)):
+        net = pcbnew.NETINFO_ITEM(board, f"N{i}")
+        board.Add(net)
+        nets.append(net)
+
+    # rectangular outline, optionally split into many segments per side
+    corners = outline or [(0, 0), (width, 0), (width, height), (0, height)]
+    corners = corners + corners[:1]
+    for (x0, y0), (x1, y1) in zip(corners, corners[1:]):
+        for i in range(outline_segments):
+            edge = pcbnew.PCB_SHAPE(board)
+            edge.SetStart(
+                pcbnew.VECTOR2I(
+                    (x0 + (x1 - x0) * i / outline_segments) * MM,
+                    (y0 + (y1 - y0) * i / outline_segments) * MM,
+                )
+            )
+            edge.SetEnd(
+                pcbnew.VECTOR2I(
+                    (x0 + (x1 - x0) * (i + 1) / outline_segments) * MM,
+                    (y0 + (y1 - y0) * (i + 1) / outline_segments) * MM,
+                )
+            )
+            edge.SetLayer(pcbnew.Edge_Cuts)
+            board.Add(edge)
+
+    def point():
+        return pcbnew.VECTOR2I(
+            rng.uniform(1, width - 1) * MM, rng.uniform(1, height - 1) * MM
+        )
+
+    for i in range(tracks):
+        if i % 10 == 9:
+            track = pcbnew.PCB_VIA(board)
+            track.SetPosition(point())
+        else:
+            track = pcbnew.PCB_TRACK(board)
+            track.SetStart(point())
+            track.SetEnd(point())
+            track.SetLayer(rng.choice((pcbnew.F_Cu, pcbnew.B_Cu)))
+        track.SetNet(rng.choice(nets))
+        board.Add(track)
+
+    for i in range(footprints):
+        footprint = pcbnew.FOOTPRINT(board)
+        footprint.SetReference(f"R{i + 1}")
+        footprint.SetValue(rng.choice(("10k", "1k", "100n", "4k7")))
+        footprint.SetPosition(point())
+        origin = footprint.GetPosition()
+        for number in range(pads):
+            pad = pcbnew.PAD(footprint)
+            pad.SetNumber(str(number + 1))
+            pad.SetPosition(origin + pcbnew.VECTOR2I(number * MM, 0))
+            pad.SetNet(rng.choice(nets))
+            footprint.Add(pad)
+        silk = pcbnew.PCB_SHAPE(footprint)
+        silk.SetStart(origin - pcbnew.VECTOR2I(MM, MM))
+        silk.SetEnd(origin + pcbnew.VECTOR2I(pads * MM, -MM))
+        silk.SetLayer(pcbnew.F_SilkS)
+        footprint.Add(silk)
+        if fab:
+            outline = pcbnew.PCB_SHAPE(footprint)
+            outline.SetStart(origin - pcbnew.VECTOR2I(MM, MM // 2))
+            outline.SetEnd(origin + pcbnew.VECTOR2I(pads * MM, MM // 2))
+            outline.SetLayer(pcbnew.F_Fab)
+            footprint.Add(outline)
+            footprint.Models().append(
+                pcbnew.FP_3DMODEL("${KICAD8_3DMODEL_DIR}/Synthetic.3dshapes/R.wrl")
+            )
+        board.Add(footprint)
+
+    for i in range(drawings):
+        line = pcbnew.PCB_SHAPE(board)
+        line.SetStart(point())
+        line.SetEnd(point())
+        line.SetLayer((pcbnew.Dwgs_User, pcbnew.Cmts_User, pcbnew.F_Fab)[i % 3])
+        board.Add(line)
+
+    for i in range(zones):
+        zone = pcbnew.ZONE(board)
+        zone.SetLayer(pcbnew.B_Cu if i % 2 else pcbnew.F_Cu)
+        zone.SetNet(nets[0])
+        zone.outline = [
+            (0, 0),
+            (width * MM, 0),
+            (width * MM, height * MM),
+            (0, height * MM),
+        ]
+        # a fill with some detail, as real pours have many vertices
+        half_w = (width / 2 - 0.5) * MM
+        half_h = (height / 2 - 0.5) * MM
+        zone.fills[zone.layer] = [
+            (
+                int(width * MM / 2 + half_w * rng.uniform(0.9, 1) * cos),
+                int(height * MM / 2 + half_h * rng.uniform(0.9, 1) * sin),
+            )
+            for cos, sin in _circle(64)
+        ]
+        zone.SetIsFilled(True)
+        board.Add(zone)
+
+    # seeded ids, so the same arguments give the same file
+    for item in _board_items(board):
+        item.m_Uuid = pcbnew.KIID(str(uuid.UUID(int=rng.getrandbits(128), version=4)))
+
+    return board
+
+
+def _board_items(board):
+    """Yield every item of a board, including footprint pads and drawings."""
+    for footprint in board.footprints:
+        yield footprint
+        yield from footprint.pads
+        yield from footprint.graphics
+    yield from board.drawings
+    yield from board.tracks
+    yield from board.zones
+
+
+def _circle(count):
+    """Unit vectors spread round a square, for zone fill outlines."""
+    return [
+        (
+            max(-1, min(1, 1.4 * math.cos(2 * math.pi * i / count))),
+            max(-1, min(1, 1.4 * math.sin(2 * math.pi * i / count))),
+        )
+        for i in range(count)
+    ]
+
+
+def register(path, **params):
+    """Register a synthetic board under path for LoadBoard() and return path."""
+    pcbnew.register_board(path, lambda: make_board(**params))
+    return path
+
+
+def write(path, **params):
+    """Write a synthetic board to a .kicad_pcb file, for the sexpr engine."""
+    make_board(**params).Save(path)
+    register(path, **params)
+    return path
@@ -7,10 +7,46 @@ Original author: Willem Hillier
 
 __version__ = "4.0"
 
+import bisect
+import copy
+import cProfile
+import csv
+import fnmatch
+import hashlib
+import importlib.util
+import io
+import itertools
+import json
+import math
+import multiprocessing
 import os
+import re
+import shutil
 import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
 from argparse import ArgumentParser
-import pcbnew
+from collections import Counter, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager, redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+pcbnew = None  # imported on first use, see import_pcbnew()
 
 # constants
 SCALE = 1000000  # mm to internal units
@@ -18,147 +54,241 @@ V_SCORE_TEXT_SIZE = 2
 V_SCORE_TEXT_THICKNESS = 0.1
 MIN_PANEL_SIZE_MM = 70
 MIN_RAIL_WIDTH_FOR_TEXT = 2
+DEFAULT_LINE_WIDTH = 0.1  # width in mm of new outline and v-score lines
+TEXT_THICKNESS_RATIO = 0.15  # stroke thickness of new text relative to its size
+SERVER_PORT = 8765
+PANEL_NAMESPACE = uuid.UUID("5d0b3a4e-8f5c-4a7e-9d43-2c1f6b8e7a90")  # for uuid5 ids
 
+Point = namedtuple("Point", ["x", "y"])
+Fit = namedtuple("Fit", ["boards", "num_x", "num_y", "rotated", "swapped"])
+SweepResult = namedtuple(
+    "SweepResult",
+    [
+        "cost",
+        "boards",
+        "num_x",
+        "num_y",
+        "width",
+        "height",
+        "price",
+        "hrail",
+        "vrail",
+        "padding",
+        "rotated",
+        "panel_width",
+        "panel_height",
+    ],
+)
+PanelPlan = namedtuple(
+    "PanelPlan",
+    [
+        "num_x",
+        "num_y",
+        "board_width",
+        "board_height",
+        "array_center",
+        "array_width",
+        "array_height",
+        "outline",
+        "panel_width",
+        "panel_height",
+        "pivot",
+        "copies",
+        "nested",
+        "cuts",
+        "designs",
+    ],
+)
 
-def get_layertable(board):
-    """Creates a dict to lookup layer numbers by name."""
-    return {board.GetLayerName(i): i for i in range(pcbnew.PCB_LAYER_ID_COUNT)}
+# a board of the panel: the source flipped over left to right if flip, turned
+# angle degrees about the plan's pivot, then moved by (dx, dy); x and y number
+# its column and row
+CopyTransform = namedtuple("CopyTransform", ["x", "y", "dx", "dy", "angle", "flip"])
 
+# how copies are flipped and turned before they are moved, key is the
+# (angle, flip) shared by copies of the same orientation
+Turn = namedtuple("Turn", ["key", "center", "angle", "flip"])
 
-def duplicate_board_items(
-    board, items, num_x, num_y, board_width, board_height, create_copy=None
-):
-    """
-    Duplicate board items across the panel grid.
+# another design packed on the panel: its items are moved by offset to its
+# first board, and copied from there to the others
+DesignCopies = namedtuple("DesignCopies", ["path", "offset", "copies"])
 
-    Args:
-        board: The KiCad board object
-        items: Iterable of source items to duplicate
-        num_x: Number of copies in X direction
-        num_y: Number of copies in Y direction
-        board_width: Width of single board (in internal units)
-        board_height: Height of single board (in internal units)
-        create_copy: Optional function to create a copy (defaults to item.Duplicate())
-    """
-    new_items = []
-    for source_item in items:
-        for x in range(num_x):
-            for y in range(num_y):
-                if x != 0 or y != 0:
-                    if create_copy:
-                        new_item = create_copy(source_item)
-                    else:
-                        new_item = source_item.Duplicate()
-                    new_item.Move(pcbnew.VECTOR2I(x * board_width, y * board_height))
-                    new_items.append(new_item)
-
-    for item in new_items:
-        board.Add(item)
-
-
-def duplicate_zones(board, num_x, num_y, board_width, board_height):
-    """Duplicate zones across the panel grid, preserving net assignments."""
-    new_zones = []
-    for i in range(board.GetAreaCount()):
-        source_zone = board.GetArea(i)
-        for x in range(num_x):
-            for y in range(num_y):
-                if x != 0 or y != 0:
-                    new_zone = source_zone.Duplicate()
-                    new_zone.SetNet(source_zone.GetNet())
-                    new_zone.Move(pcbnew.VECTOR2I(x * board_width, y * board_height))
-                    new_zones.append(new_zone)
-
-    for zone in new_zones:
-        board.Add(zone)
-
-
-def duplicate_footprints(board, num_x, num_y, board_width, board_height):
-    """Duplicate footprints across the panel grid with correct positioning."""
-    modules = board.GetFootprints()
-    new_modules = []
-    for source_module in modules:
-        for x in range(num_x):
-            for y in range(num_y):
-                if x != 0 or y != 0:
-                    new_module = pcbnew.FOOTPRINT(source_module)
-                    new_module.SetPosition(
-                        pcbnew.VECTOR2I(
-                            x * board_width + source_module.GetPosition().x,
-                            y * board_height + source_module.GetPosition().y,
-                        )
-                    )
-                    new_modules.append(new_module)
+# the source items of one design on the pcbnew board, with their copy offsets
+DesignItems = namedtuple(
+    "DesignItems", ["tracks", "drawings", "footprints", "zones", "offsets"]
+)
 
-    for module in new_modules:
-        board.Add(module)
+# a tab on the source outline, low to high along it from start through middle
+# to end, with the mouse-bite holes on the chord from start to end and normal
+# pointing out of the board
+Tab = namedtuple("Tab", ["low", "high", "start", "middle", "end", "normal", "holes"])
 
+# a source outline started at a corner for tabs: its points, the distance
+# along it to each, how far it bends at each and 1 or -1 for its winding
+TabOutline = namedtuple("TabOutline", ["points", "lengths", "bends", "sign"])
 
-def create_edge_cut(board, start_x, start_y, end_x, end_y, layer):
-    """Create an edge cut line on the board."""
-    edge = pcbnew.PCB_SHAPE(board)
-    board.Add(edge)
-    edge.SetStart(pcbnew.VECTOR2I(int(start_x), int(start_y)))
-    edge.SetEnd(pcbnew.VECTOR2I(int(end_x), int(end_y)))
-    edge.SetLayer(layer)
 
+class Phase:
+    """Wall time and item count of one profiled phase."""
 
-def create_panel_outline(
-    board,
-    array_center,
-    array_width,
-    array_height,
-    h_rail_width,
-    v_rail_width,
-    padding,
-    layer,
-):
+    def __init__(self, name, items):
+        self.name = name
+        self.items = items
+        self.seconds = 0.0
+
+
+class Profiler:
+    """Collects per-phase timings and item counts for --profile."""
+
+    def __init__(self):
+        self.phases = []
+        self.counters = {}
+        self.start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name, items=0):
+        """Time the enclosed block, yielding a Phase whose item count can grow."""
+        phase = Phase(name, items)
+        start = time.perf_counter()
+        try:
+            yield phase
+        finally:
+            phase.seconds = time.perf_counter() - start
+            self.phases.append(phase)
+
+    def report(self, target):
+        """Write the profile as a table to stderr, or as JSON to a file."""
+        total = time.perf_counter() - self.start
+        peak_rss = None
+        if resource is not None:
+            peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # kilobytes on Linux, bytes on macOS
+            peak_rss *= 1 if sys.platform == "darwin" else 1024
+
+        if target != "-":
+            with open(target, "w", encoding="utf-8") as profile:
+                json.dump(
+                    {
+                        "phases": [
+                            {
+                                "phase": phase.name,
+                                "seconds": round(phase.seconds, 6),
+                                "items": phase.items,
+                            }
+                            for phase in self.phases
+                        ],
+                        "counters": self.counters,
+                        "total_seconds": round(total, 6),
+                        "peak_rss_bytes": peak_rss,
+                    },
+                    profile,
+                    indent=2,
+                )
+            return
+
+        print(f"{'phase':<24}{'seconds':>10}{'items':>10}", file=sys.stderr)
+        for phase in self.phases:
+            items = phase.items or ""
+            print(
+                f"{phase.name:<24}{phase.seconds:>10.3f}{items:>10}", file=sys.stderr
+            )
+        print(f"{'total':<24}{total:>10.3f}", file=sys.stderr)
+        for name, count in self.counters.items():
+            print(f"{name}: {count}", file=sys.stderr)
+        if peak_rss is not None:
+            print(f"peak RSS: {peak_rss / 2**20:.1f}MB", file=sys.stderr)
+
+
+def import_pcbnew():
+    """Import pcbnew on first use, so argument errors don't pay for KiCad startup."""
+    global pcbnew  # pylint: disable=global-statement
+    if pcbnew is None:
+        try:
+            import pcbnew as module  # pylint: disable=import-outside-toplevel
+        except ImportError:
+            print("The pcbnew module is not available, try --engine=sexpr. Quitting.")
+            sys.exit(1)
+        pcbnew = module
+    return pcbnew
+
+
+def copy_uuid(source_id, x, y):
+    """Return the uuid of the copy at grid position (x, y) of a source item."""
+    return str(uuid.uuid5(PANEL_NAMESPACE, f"{source_id}/{x},{y}"))
+
+
+def frame_uuid(*parts):
+    """Return the uuid of a new panel item, derived from its kind and geometry."""
+    return str(uuid.uuid5(PANEL_NAMESPACE, "/".join(str(part) for part in parts)))
+
+
+def layer_uuid_name(layer):
+    """Return the canonical name of a layer id, as the sexpr engine hashes it."""
+    return pcbnew.BOARD.GetStandardLayerName(layer)
+
+
+def set_uuid(item, value):
+    """Overwrite the uuid of an item before it is added to the board."""
+    item.m_Uuid.Clone(pcbnew.KIID(value))
+
+
+def _footprint_children(footprint):
+    """List the fields, pads, drawings and zones of a footprint, in order."""
+    return [
+        *footprint.GetFields(),
+        *footprint.Pads(),
+        *footprint.GraphicalItems(),
+        *footprint.Zones(),
+    ]
+
+
+def stable_uuids(source, copies):
     """
-    Create the rectangular panel outline with edge cuts.
+    Give copies of an item uuids derived from the source's and their position.
 
-    Returns the corner coordinates (left, right, top, bottom).
+    KiCad gives every duplicate random uuids, so two runs would never save the
+    same file. Footprint children are matched to the source's by position in
+    their lists, as duplication keeps the order.
+
+    Args:
+        source: The source item
+        copies: Iterable of (x, y, copy)
     """
+    is_footprint = isinstance(source, pcbnew.FOOTPRINT)
+    source_id = source.m_Uuid.AsString()
+    child_ids = []
+    if is_footprint:
+        child_ids = [child.m_Uuid.AsString() for child in _footprint_children(source)]
+    for x, y, copy in copies:
+        set_uuid(copy, copy_uuid(source_id, x, y))
+        if is_footprint:
+            for child_id, child in zip(child_ids, _footprint_children(copy)):
+                set_uuid(child, copy_uuid(child_id, x, y))
+
+
+def panel_outline_corners(
+    array_center, array_width, array_height, h_rail_width, v_rail_width, padding
+):
+    """Return the panel outline corners (left, right, top, bottom) around the array."""
     half_padding = padding / 2 * SCALE
     left = array_center.x - array_width / 2 - h_rail_width * SCALE - half_padding
     right = array_center.x + array_width / 2 + h_rail_width * SCALE + half_padding
     top = array_center.y - array_height / 2 - v_rail_width * SCALE - half_padding
     bottom = array_center.y + array_height / 2 + v_rail_width * SCALE + half_padding
-
-    # create the four edges (top, right, bottom, left)
-    create_edge_cut(board, left, top, right, top, layer)  # top
-    create_edge_cut(board, right, top, right, bottom, layer)  # right
-    create_edge_cut(board, right, bottom, left, bottom, layer)  # bottom
-    create_edge_cut(board, left, bottom, left, top, layer)  # left
-
     return left, right, top, bottom
 
 
-def create_vscore_line(board, start_x, start_y, end_x, end_y, layer):
-    """Create a v-score line and return it for layer manipulation."""
-    line = pcbnew.PCB_SHAPE(board)
-    line.SetStart(pcbnew.VECTOR2I(int(start_x), int(start_y)))
-    line.SetEnd(pcbnew.VECTOR2I(int(end_x), int(end_y)))
-    line.SetLayer(layer)
-    return line
-
-
-def create_vscore_text(board, text, pos_x, pos_y, angle, justify, layer):
-    """Create a v-score label text."""
-    text_obj = pcbnew.PCB_TEXT(board)
-    text_obj.SetText(text)
-    text_obj.SetHorizJustify(justify)
-    text_obj.SetPosition(pcbnew.VECTOR2I(int(pos_x), int(pos_y)))
-    text_obj.SetTextSize(
-        pcbnew.VECTOR2I(SCALE * V_SCORE_TEXT_SIZE, SCALE * V_SCORE_TEXT_SIZE)
-    )
-    text_obj.SetLayer(layer)
-    text_obj.SetTextAngle(pcbnew.EDA_ANGLE(angle, 0))
-    board.Add(text_obj)
+def outline_edges(left, right, top, bottom):
+    """Return the four panel edges (top, right, bottom, left) as line tuples."""
+    return [
+        (left, top, right, top),
+        (right, top, right, bottom),
+        (right, bottom, left, bottom),
+        (left, bottom, left, top),
+    ]
 
 
-def add_vscores(
-    board,
-    layertable,
+def vscore_layout(
     panel_center,
     panel_width,
     panel_height,
@@ -169,18 +299,22 @@ def add_vscores(
     h_rail_width,
     v_rail_width,
     vscore_extend,
-    vscore_layer,
-    vscore_text_layer,
-    vscore_text,
 ):
-    """Add all v-score lines and labels to the panel."""
+    """
+    Compute the v-score lines and label anchors for a panel.
+
+    Returns (lines, labels, vscore_bottom) where lines are (start_x, start_y,
+    end_x, end_y) tuples and labels are (pos_x, pos_y, angle, justify) tuples
+    with justify being "left" or "right".
+    """
     # calculate v-score boundaries
     vscore_top = int(panel_center.y - panel_height / 2 - vscore_extend * SCALE)
     vscore_bottom = int(panel_center.y + panel_height / 2 + vscore_extend * SCALE)
     vscore_right = int(panel_center.x + panel_width / 2 + vscore_extend * SCALE)
     vscore_left = int(panel_center.x - panel_width / 2 - vscore_extend * SCALE)
 
-    v_scores = []
+    lines = []
+    labels = []
 
     # vertical v-scores
     if h_rail_width > 0:
@@ -192,19 +326,8 @@ def add_vscores(
         x_loc = int(
             panel_center.x - panel_width / 2 + h_rail_width * SCALE + board_width * x
         )
-        line = create_vscore_line(
-            board, x_loc, vscore_top, x_loc, vscore_bottom, layertable[vscore_layer]
-        )
-        v_scores.append(line)
-        create_vscore_text(
-            board,
-            vscore_text,
-            x_loc,
-            vscore_top - V_SCORE_TEXT_SIZE * SCALE,
-            900,
-            pcbnew.GR_TEXT_H_ALIGN_LEFT,
-            layertable[vscore_text_layer],
-        )
+        lines.append((x_loc, vscore_top, x_loc, vscore_bottom))
+        labels.append((x_loc, vscore_top - V_SCORE_TEXT_SIZE * SCALE, 900, "left"))
 
     # horizontal v-scores
     if v_rail_width > 0:
@@ -216,61 +339,118 @@ def add_vscores(
         y_loc = int(
             panel_center.y - panel_height / 2 + v_rail_width * SCALE + board_height * y
         )
-        line = create_vscore_line(
-            board, vscore_left, y_loc, vscore_right, y_loc, layertable[vscore_layer]
+        lines.append((vscore_left, y_loc, vscore_right, y_loc))
+        labels.append((vscore_left - V_SCORE_TEXT_SIZE * SCALE, y_loc, 0, "right"))
+
+    return lines, labels, vscore_bottom
+
+
+def cut_vscore_layout(panel_center, panel_width, panel_height, cuts, vscore_extend):
+    """
+    Compute the v-score lines and label anchors along the cuts of a packed panel.
+
+    cuts are (vertical, position, start, end) tuples, start or end being None
+    where the cut runs out to the panel edge like every vscore_layout() line.
+    Only the lines reaching the top or left edge get a label. Returns (lines,
+    labels, vscore_bottom) like vscore_layout().
+    """
+    vscore_top = int(panel_center.y - panel_height / 2 - vscore_extend * SCALE)
+    vscore_bottom = int(panel_center.y + panel_height / 2 + vscore_extend * SCALE)
+    vscore_right = int(panel_center.x + panel_width / 2 + vscore_extend * SCALE)
+    vscore_left = int(panel_center.x - panel_width / 2 - vscore_extend * SCALE)
+
+    lines = []
+    labels = []
+    for vertical, position, start, end in cuts:
+        if vertical:
+            start_y = vscore_top if start is None else start
+            end_y = vscore_bottom if end is None else end
+            lines.append((position, start_y, position, end_y))
+            if start is None:
+                label_y = vscore_top - V_SCORE_TEXT_SIZE * SCALE
+                labels.append((position, label_y, 900, "left"))
+        else:
+            start_x = vscore_left if start is None else start
+            end_x = vscore_right if end is None else end
+            lines.append((start_x, position, end_x, position))
+            if start is None:
+                label_x = vscore_left - V_SCORE_TEXT_SIZE * SCALE
+                labels.append((label_x, position, 0, "right"))
+
+    return lines, labels, vscore_bottom
+
+
+def rail_text_items(args, panel_center, panel_width, panel_height, title_text):
+    """Return the (text, pos_x, pos_y, angle) rail texts requested by the arguments."""
+    h_rail_width = args.hrail
+    v_rail_width = args.vrail
+    items = []
+
+    if args.hrailtext:
+        items.append(
+            (
+                args.hrailtext,
+                panel_center.x - panel_width / 2 + h_rail_width / 2 * SCALE,
+                panel_center.y + panel_height / 2 - SCALE,
+                900,
+            )
         )
-        v_scores.append(line)
-        create_vscore_text(
-            board,
-            vscore_text,
-            vscore_left - V_SCORE_TEXT_SIZE * SCALE,
-            y_loc,
-            0,
-            pcbnew.GR_TEXT_H_ALIGN_RIGHT,
-            layertable[vscore_text_layer],
+
+    if args.vrailtext:
+        items.append(
+            (
+                args.vrailtext,
+                panel_center.x - panel_width / 2 + SCALE,
+                panel_center.y - panel_height / 2 + v_rail_width / 2 * SCALE,
+                0,
+            )
         )
 
-    # add v-scores to board via Edge.Cuts layer workaround
-    for vscore in v_scores:
-        vscore.SetLayer(layertable["Edge.Cuts"])
-        board.Add(vscore)
+    # add title text to rail
+    if args.htitle:
+        items.append(
+            (
+                title_text,
+                panel_center.x + panel_width / 2 - h_rail_width / 2 * SCALE,
+                panel_center.y + panel_height / 2 - SCALE,
+                900,
+            )
+        )
 
-    # move back to correct layer
-    for vscore in v_scores:
-        vscore.SetLayer(layertable[vscore_layer])
+    if args.vtitle:
+        items.append(
+            (
+                title_text,
+                panel_center.x - panel_width / 2 + SCALE,
+                panel_center.y + panel_height / 2 - v_rail_width / 2 * SCALE,
+                0,
+            )
+        )
 
-    return vscore_bottom
+    return items
 
 
-def add_rail_text(board, text, pos_x, pos_y, angle=0, text_size=1):
-    """Add text to a rail on the silkscreen layer."""
-    text_obj = pcbnew.PCB_TEXT(board)
-    text_obj.SetText(text)
-    text_obj.SetTextSize(pcbnew.VECTOR2I(SCALE * text_size, SCALE * text_size))
-    text_obj.SetLayer(pcbnew.F_SilkS)
-    text_obj.SetHorizJustify(pcbnew.GR_TEXT_H_ALIGN_LEFT)
-    text_obj.SetPosition(pcbnew.VECTOR2I(int(pos_x), int(pos_y)))
-    if angle != 0:
-        text_obj.SetTextAngle(pcbnew.EDA_ANGLE(angle, 0))
-    board.Add(text_obj)
+def report_text(args, output_file, num_x, num_y):
+    """Build the report text placed under the panel."""
+    text = f"{output_file} ({num_x}x{num_y} panel) generated with:\n./panelizer.py"
+    return text + " " + " ".join(args.argv)
 
 
-def get_title_text(board):
-    """Build title text from the board's title block."""
+def format_title_text(title, revision, date, company):
+    """Join title block fields into a single line of rail text."""
     parts = []
-    title_block = board.GetTitleBlock()
 
-    if title_block.GetTitle():
-        parts.append(str(title_block.GetTitle()))
+    if title:
+        parts.append(str(title))
 
-    if title_block.GetRevision():
-        parts.append(f"Rev. {title_block.GetRevision()}")
+    if revision:
+        parts.append(f"Rev. {revision}")
 
-    if title_block.GetDate():
-        parts.append(str(title_block.GetDate()))
+    if date:
+        parts.append(str(date))
 
-    if title_block.GetCompany():
-        parts.append(f"(c) {title_block.GetCompany()}")
+    if company:
+        parts.append(f"(c) {company}")
 
     if len(parts) <= 1:
         return "".join(parts)
@@ -287,171 +467,492 @@ def get_title_text(board):
     return result
 
 
-def parse_args():
-    """Parse and validate command line arguments."""
-    parser = ArgumentParser(description="A script to panelize KiCad files.")
-    parser.add_argument(
-        "-v", "--version", action="version", version=f"%(prog)s {__version__}"
-    )
-    parser.add_argument(
-        dest="sourceBoardFile", help="Path to the *.kicad_pcb file to be panelized"
-    )
-    parser.add_argument("--numx", type=int, help="Number of boards in X direction")
-    parser.add_argument("--numy", type=int, help="Number of boards in Y direction")
-    parser.add_argument(
-        "--padding", type=int, default=1, help="Extra space between boards"
-    )
-    parser.add_argument("--panelx", type=int, help="Maximum panel size in X direction")
-    parser.add_argument("--panely", type=int, help="Maximum panel size in Y direction")
-    parser.add_argument(
-        "--hrail", type=int, default=0, help="Horizontal edge rail width"
-    )
-    parser.add_argument("--vrail", type=int, default=0, help="Vertical edge rail width")
-    parser.add_argument("--hrailtext", help="Text to put on the horizontal edge rail")
-    parser.add_argument("--vrailtext", help="Text to put on the vertical edge rail")
-    parser.add_argument(
-        "--htitle", action="store_true", help="Print title info on horizontal edge rail"
-    )
-    parser.add_argument(
-        "--vtitle", action="store_true", help="Print title info on vertical edge rail"
-    )
-    parser.add_argument(
-        "--vscorelayer", default="Edge.Cuts", help="Layer to put v-score lines on"
-    )
-    parser.add_argument(
-        "--vscoretextlayer",
-        default="User.Comments",
-        help="Layer to put v-score text on",
-    )
-    parser.add_argument(
-        "--vscoretext", default="V-SCORE", help="Text used to indicate v-scores"
-    )
-    parser.add_argument(
-        "--vscoreextends",
-        type=float,
-        default=-0.05,
-        help="How far past the board to extend the v-score lines, defaults to -0.05",
-    )
+def get_layertable(board):
+    """Creates a dict to lookup layer numbers by name."""
+    return {board.GetLayerName(i): i for i in range(pcbnew.PCB_LAYER_ID_COUNT)}
 
-    return parser.parse_args()
 
+class BoardInserter:
+    """
+    Adds new items to a board, counting the connectivity updates this costs.
 
-def validate_args(args):
-    """Validate command line arguments and return processed values."""
-    source_file = args.sourceBoardFile
+    Both modes make one board.Add() per item. A plain one updates the
+    connectivity for every item, in bulk mode items are appended without
+    that and finish() rebuilds the connectivity once for the whole panel.
+    """
 
-    # check file extension
-    if not source_file.endswith(".kicad_pcb"):
-        print(f"{source_file} is not a *.kicad_pcb file. Quitting.")
-        sys.exit(1)
+    def __init__(self, board, bulk=False):
+        self.board = board
+        self.bulk = bulk
+        self.added = 0
+        self.connectivity_updates = 0
 
-    # check rail text requirements
-    if ((args.hrailtext or args.htitle) and args.hrail < MIN_RAIL_WIDTH_FOR_TEXT) or (
-        (args.vrailtext or args.vtitle) and args.vrail < MIN_RAIL_WIDTH_FOR_TEXT
-    ):
-        print(
-            f"Rail width must be at least {MIN_RAIL_WIDTH_FOR_TEXT}mm if using rail text. Quitting."
-        )
-        sys.exit(1)
+    def add(self, items):
+        """Add an iterable of items to the board."""
+        board = self.board
+        added = 0
+        if self.bulk:
+            mode = pcbnew.ADD_MODE_BULK_APPEND
+            for item in items:
+                board.Add(item, mode, True)
+                added += 1
+        else:
+            for item in items:
+                board.Add(item)
+                added += 1
+            self.connectivity_updates += added
+        self.added += added
 
-    # check for conflicting options
-    if (args.panelx or args.panely) and (args.numx or args.numy):
-        print("Specify number of boards or size of panel, not both. Quitting.")
-        sys.exit(1)
+    def finish(self):
+        """Rebuild the connectivity once if items were added in bulk."""
+        if self.bulk and self.added:
+            self.board.BuildConnectivity()
+            self.connectivity_updates += 1
 
-    if (not args.panelx or not args.panely) and (not args.numx or not args.numy):
-        print("Specify number of boards or size of panel. Quitting.")
-        sys.exit(1)
 
-    # warn about both rails
-    if args.hrail and args.vrail:
-        print("Warning: do you really want both edge rails?")
+def copy_offsets(plan, copies=None):
+    """
+    Return the (x, y, offset, turn) of every copy except the source.
 
+    The offset vectors and turns are built once and shared by all item kinds.
+    turn is None for a plain translation, or the Turn to flip and rotate a
+    copy by before moving it. copies defaults to the plan's, those of another
+    design can be given instead.
+    """
+    pivot = pcbnew.VECTOR2I(plan.pivot.x, plan.pivot.y)
+    turns = {}
+    offsets = []
+    for copy in plan.copies if copies is None else copies:
+        turn = None
+        if copy.angle or copy.flip:
+            key = (copy.angle, copy.flip)
+            turn = turns.get(key)
+            if turn is None:
+                angle = None
+                if copy.angle:
+                    angle = pcbnew.EDA_ANGLE(copy.angle, pcbnew.DEGREES_T)
+                turn = turns[key] = Turn(key, pivot, angle, copy.flip)
+        offsets.append((copy.x, copy.y, pcbnew.VECTOR2I(copy.dx, copy.dy), turn))
+    return offsets
 
-def main():
-    """Main entry point for the panelizer script."""
-    args = parse_args()
-    validate_args(args)
 
-    source_file = args.sourceBoardFile
-    num_x = args.numx
-    num_y = args.numy
-    panel_x = args.panelx
-    panel_y = args.panely
-    padding = args.padding
-    h_rail_width = args.hrail
-    v_rail_width = args.vrail
-    vscore_layer = args.vscorelayer
-    vscore_text_layer = args.vscoretextlayer
-    vscore_text = args.vscoretext
-    vscore_extend = args.vscoreextends
+def turned_prototype(source, turn, prototypes, create_copy):
+    """
+    Return a copy of source flipped and rotated by turn, made once per turn.
 
-    # output file name
-    output_file = os.path.splitext(source_file)[0] + "_panelized.kicad_pcb"
+    The copies of the same orientation are duplicated from it and only moved,
+    so they cost what a plain translation does.
 
-    # load source board
-    board = pcbnew.LoadBoard(source_file)
-    layertable = get_layertable(board)
+    Args:
+        source: The source item
+        turn: Turn from copy_offsets()
+        prototypes: Dict of the source's prototypes so far, by turn key
+        create_copy: Function to copy an item with
+    """
+    prototype = prototypes.get(turn.key)
+    if prototype is None:
+        prototype = create_copy(source)
+        if turn.flip:
+            prototype.Flip(turn.center, True)
+        if turn.angle:
+            prototype.Rotate(turn.center, turn.angle)
+        prototypes[turn.key] = prototype
+    return prototype
 
-    # get board dimensions
-    bbox = board.GetBoardEdgesBoundingBox()
-    board_width = bbox.GetWidth() + padding * SCALE
-    board_height = bbox.GetHeight() + padding * SCALE
 
-    # calculate number of boards if panel size specified
-    if panel_x:
-        num_x = int((panel_x * SCALE - 2 * h_rail_width * SCALE) / board_width)
-    if panel_y:
-        num_y = int((panel_y * SCALE - 2 * v_rail_width * SCALE) / board_height)
+def _duplicate(item):
+    """Copy a board item."""
+    return item.Duplicate()
 
-    # check we can actually panelize
-    if num_x == 0 or num_y == 0:
-        print("Panel size is too small for board. Quitting.")
-        sys.exit(1)
 
-    # duplicate all board items
-    duplicate_board_items(
-        board, board.GetTracks(), num_x, num_y, board_width, board_height
-    )
-    duplicate_board_items(
-        board, board.GetDrawings(), num_x, num_y, board_width, board_height
-    )
-    duplicate_footprints(board, num_x, num_y, board_width, board_height)
-    duplicate_zones(board, num_x, num_y, board_width, board_height)
+def duplicate_board_items(board, items, offsets, create_copy=None, inserter=None):
+    """
+    Duplicate board items across the panel grid.
 
-    # get array dimensions
-    array_bbox = board.GetBoardEdgesBoundingBox()
-    array_width = array_bbox.GetWidth()
-    array_height = array_bbox.GetHeight()
-    array_center = array_bbox.GetCenter()
-
-    # erase existing edge cuts
-    for drawing in board.GetDrawings():
-        if drawing.IsOnLayer(layertable["Edge.Cuts"]):
-            drawing.DeleteStructure()
-
-    # create panel outline
-    create_panel_outline(
-        board,
-        array_center,
-        array_width,
-        array_height,
-        h_rail_width,
-        v_rail_width,
-        padding,
-        layertable["Edge.Cuts"],
+    Args:
+        board: The KiCad board object
+        items: Iterable of source items to duplicate
+        offsets: Copy offsets from copy_offsets()
+        create_copy: Optional function to create a copy (defaults to item.Duplicate())
+        inserter: Optional BoardInserter to add the copies with
+    """
+    if create_copy is None:
+        create_copy = _duplicate
+    new_items = []
+    for source_item in items:
+        copies = []
+        prototypes = {}
+        for x, y, offset, turn in offsets:
+            prototype = source_item
+            if turn:
+                prototype = turned_prototype(source_item, turn, prototypes, create_copy)
+            new_item = create_copy(prototype)
+            new_item.Move(offset)
+            copies.append((x, y, new_item))
+        stable_uuids(source_item, copies)
+        new_items.extend(new_item for _, _, new_item in copies)
+
+    (inserter or BoardInserter(board)).add(new_items)
+
+
+def duplicate_zones(board, offsets, translate_fills=False, inserter=None, zones=None):
+    """
+    Duplicate zones across the panel grid, preserving net assignments.
+
+    Duplicate() copies a zone's filled polygons and Move() and Rotate() take
+    them along, so every copy already has the source fills. With
+    translate_fills, copies of filled zones are also marked as filled and not
+    needing a refill, so the panel is saved with them. Flipped copies change
+    layers, which KiCad unfills. zones defaults to every zone of the board.
+    Returns the number of source zones that had no fill.
+    """
+    if zones is None:
+        zones = [board.GetArea(i) for i in range(board.GetAreaCount())]
+    new_zones = []
+    unfilled = 0
+    for source_zone in zones:
+        net = source_zone.GetNet()
+        filled = translate_fills and source_zone.IsFilled()
+        if translate_fills and not filled:
+            unfilled += 1
+        copies = []
+        prototypes = {}
+        for x, y, offset, turn in offsets:
+            prototype = source_zone
+            if turn:
+                prototype = turned_prototype(source_zone, turn, prototypes, _duplicate)
+            new_zone = prototype.Duplicate()
+            new_zone.SetNet(net)
+            new_zone.Move(offset)
+            if filled and not (turn and turn.flip):
+                new_zone.SetIsFilled(True)
+                new_zone.SetNeedRefill(False)
+            copies.append((x, y, new_zone))
+        stable_uuids(source_zone, copies)
+        new_zones.extend(new_zone for _, _, new_zone in copies)
+
+    (inserter or BoardInserter(board)).add(new_zones)
+
+    return unfilled
+
+
+def duplicate_footprints(board, offsets, inserter=None, footprints=None):
+    """
+    Duplicate footprints across the panel grid with correct positioning.
+
+    Each source footprint, or its turned prototype, is the prototype for its
+    copies: the copy constructor carries its orientation, side and fields
+    over natively, and the copy is moved by the shared offset, so the source
+    position is never looked up per copy. footprints defaults to every
+    footprint of the board.
+    """
+    if footprints is None:
+        footprints = list(board.GetFootprints())
+    new_modules = []
+    for source_module in footprints:
+        copies = []
+        prototypes = {}
+        for x, y, offset, turn in offsets:
+            prototype = source_module
+            if turn:
+                prototype = turned_prototype(
+                    source_module, turn, prototypes, pcbnew.FOOTPRINT
+                )
+            new_module = pcbnew.FOOTPRINT(prototype)
+            new_module.Move(offset)
+            copies.append((x, y, new_module))
+        stable_uuids(source_module, copies)
+        new_modules.extend(new_module for _, _, new_module in copies)
+
+    (inserter or BoardInserter(board)).add(new_modules)
+
+
+def _group_members(group):
+    """Yield the items of a group, including nested groups after their items."""
+    for item in group.GetItems():
+        if isinstance(item, pcbnew.PCB_GROUP):
+            yield from _group_members(item)
+        yield item
+
+
+def _deep_clone(group):
+    """Copy a group with copies of its members, keeping all their uuids."""
+    return group.DeepClone()
+
+
+def duplicate_as_groups(board, items, offsets, keep_groups=False, inserter=None):
+    """
+    Duplicate board items across the panel grid one whole board at a time.
+
+    The items are gathered into a group that KiCad deep-clones and moves
+    natively once per copy, instead of one Python call per item and copy.
+    Items already in a group are carried along by their outermost group.
+    Zone fills are copied and moved with their zones. The copies are
+    ungrouped afterwards unless keep_groups is set, which leaves one group
+    named after each board position.
+
+    Args:
+        board: The KiCad board object
+        items: Iterable of source items to duplicate
+        offsets: Copy offsets from copy_offsets()
+        keep_groups: Keep the per-copy groups instead of ungrouping them
+        inserter: Optional BoardInserter to add the copies with
+    """
+    inserter = inserter or BoardInserter(board)
+    source = pcbnew.PCB_GROUP(board)
+    set_uuid(source, frame_uuid("group"))
+    members = set()
+    for item in items:
+        while item.GetParentGroup() is not None:
+            item = item.GetParentGroup()
+        if item.m_Uuid.AsString() not in members:
+            members.add(item.m_Uuid.AsString())
+            source.AddItem(item)
+
+    # DeepClone() keeps the uuids of the members, so each copy's uuids follow
+    # from its own without matching it back to the source item. KiCad keeps
+    # the members in an unordered set, so the uuids also put them back in the
+    # order of the source items
+    order = {
+        member.m_Uuid.AsString(): index
+        for index, member in enumerate(_group_members(source))
+    }
+    copies = []
+    ordered = []
+    prototypes = {}
+    for x, y, offset, turn in offsets:
+        prototype = source
+        if turn:
+            prototype = turned_prototype(source, turn, prototypes, _deep_clone)
+        group = prototype.DeepClone()
+        group.Move(offset)
+        group.SetName(f"Board {x + 1},{y + 1}")
+        copies.append(group)
+        cloned = [None] * len(order)
+        for member in _group_members(group):
+            cloned[order[member.m_Uuid.AsString()]] = member
+            stable_uuids(member, [(x, y, member)])
+        stable_uuids(group, [(x, y, group)])
+        ordered.extend(cloned)
+
+    # the copies' own items still have to be handed to the board one by one
+    inserter.add(ordered)
+
+    if keep_groups:
+        source.SetName("Board 1,1")
+        inserter.add([source] + copies)
+    else:
+        for group in [source] + copies:
+            group.RemoveAll()
+
+    return len(copies)
+
+
+def import_design(board, design, path, number, offset, edge_cuts, inserter):
+    """
+    Copy another design into the panel as the first of its boards.
+
+    Its items are moved by offset and get uuids derived from their own and the
+    design number, so designs copied from the same project don't clash. Its
+    nets are added to the panel named after the design, e.g. sensor-GND, so
+    the nets of different designs stay apart, and its Edge.Cuts drawings are
+    left out like the source board's. Returns its DesignItems, without offsets.
+
+    Args:
+        board: The panel board
+        design: The other design's board
+        path: Path of the other design's board file
+        number: Number of the design on the panel, from 1
+        offset: (x, y) to move the design by
+        edge_cuts: Edge.Cuts layer id
+        inserter: BoardInserter to add the items with
+    """
+    prefix = os.path.splitext(os.path.basename(path))[0] + "-"
+    nets = {}
+
+    def set_net(item):
+        name = item.GetNetname()
+        if not name:
+            item.SetNetCode(0)
+            return
+        if name not in nets:
+            nets[name] = pcbnew.NETINFO_ITEM(board, prefix + name)
+            board.Add(nets[name])
+        item.SetNet(nets[name])
+
+    if design.GetCopperLayerCount() > board.GetCopperLayerCount():
+        board.SetCopperLayerCount(design.GetCopperLayerCount())
+
+    vector = pcbnew.VECTOR2I(*offset)
+    imported = []
+    for items in (
+        design.GetTracks(),
+        [item for item in design.GetDrawings() if not item.IsOnLayer(edge_cuts)],
+        design.GetFootprints(),
+        design.Zones(),
+    ):
+        copies = []
+        for item in items:
+            if isinstance(item, pcbnew.FOOTPRINT):
+                new_item = pcbnew.FOOTPRINT(item)
+            else:
+                new_item = item.Duplicate()
+            # copies have columns from 0, so a negative one is never taken
+            stable_uuids(item, [(-number, 0, new_item)])
+            new_item.Move(vector)
+            copies.append(new_item)
+        imported.append(copies)
+    tracks, drawings, footprints, zones = imported
+
+    pads = (pad for footprint in footprints for pad in footprint.Pads())
+    for item in itertools.chain(tracks, drawings, zones, pads):
+        if isinstance(item, pcbnew.BOARD_CONNECTED_ITEM):
+            set_net(item)
+    inserter.add(itertools.chain(*imported))
+    return DesignItems(tracks, drawings, footprints, zones, None)
+
+
+def refill_zones(board, zones, per_zone=False):
+    """
+    Fill zones with KiCad's zone filler, returning (zone, seconds) timings.
+
+    All zones go to one Fill() call, which KiCad spreads over its own thread
+    pool, timed against None. per_zone fills and times them one at a time
+    instead, to find slow pours at the cost of that parallelism.
+    """
+    filler = pcbnew.ZONE_FILLER(board)
+    zones = list(zones)
+    batches = [[zone] for zone in zones] if per_zone else [zones]
+    timings = []
+    for batch in batches if zones else []:
+        fill = pcbnew.ZONES()
+        for zone in batch:
+            fill.append(zone)
+        start = time.perf_counter()
+        filler.Fill(fill)
+        timings.append((batch[0] if per_zone else None, time.perf_counter() - start))
+    return timings
+
+
+def print_fill_times(board, zones, timings):
+    """Print the fill time of the zones, then any per-zone times, slowest first."""
+    print(f"Filled {zones} zone(s) in {sum(t for _, t in timings):.3f}s")
+    per_zone = [timing for timing in timings if timing[0] is not None]
+    for zone, seconds in sorted(per_zone, key=lambda timing: -timing[1]):
+        layer = board.GetLayerName(zone.GetLayer())
+        print(f"  {seconds:8.3f}s  {zone.GetNetname() or '<no net>'} on {layer}")
+
+
+def create_edge_cut(board, start_x, start_y, end_x, end_y, layer):
+    """Create an edge cut line on the board."""
+    edge = pcbnew.PCB_SHAPE(board)
+    name = layer_uuid_name(layer)
+    set_uuid(edge, frame_uuid("line", name, start_x, start_y, end_x, end_y))
+    board.Add(edge)
+    edge.SetStart(pcbnew.VECTOR2I(int(start_x), int(start_y)))
+    edge.SetEnd(pcbnew.VECTOR2I(int(end_x), int(end_y)))
+    edge.SetLayer(layer)
+
+
+def create_panel_outline(
+    board,
+    array_center,
+    array_width,
+    array_height,
+    h_rail_width,
+    v_rail_width,
+    padding,
+    layer,
+):
+    """
+    Create the rectangular panel outline with edge cuts.
+
+    Returns the corner coordinates (left, right, top, bottom).
+    """
+    left, right, top, bottom = panel_outline_corners(
+        array_center, array_width, array_height, h_rail_width, v_rail_width, padding
     )
 
-    # get final panel dimensions
-    panel_bbox = board.GetBoardEdgesBoundingBox()
-    panel_width = panel_bbox.GetWidth()
-    panel_height = panel_bbox.GetHeight()
-    panel_center = array_center
+    # create the four edges (top, right, bottom, left)
+    for start_x, start_y, end_x, end_y in outline_edges(left, right, top, bottom):
+        create_edge_cut(board, start_x, start_y, end_x, end_y, layer)
 
-    # add v-scores
-    vscore_bottom = add_vscores(
-        board,
-        layertable,
+    return left, right, top, bottom
+
+
+def create_mouse_bites(board, centre, holes):
+    """Create a footprint of the NPTH holes of one row of mouse-bites."""
+    footprint = pcbnew.FOOTPRINT(board)
+    set_uuid(footprint, frame_uuid("tab", *centre))
+    footprint.SetPosition(pcbnew.VECTOR2I(*centre))
+    footprint.SetValue("MouseBite")
+    footprint.Reference().SetVisible(False)
+    footprint.Value().SetVisible(False)
+    footprint.SetAttributes(
+        pcbnew.FP_EXCLUDE_FROM_POS_FILES
+        | pcbnew.FP_EXCLUDE_FROM_BOM
+        | pcbnew.FP_BOARD_ONLY
+    )
+    size = pcbnew.VECTOR2I(int(TAB_DRILL * SCALE), int(TAB_DRILL * SCALE))
+    for x, y in holes:
+        pad = pcbnew.PAD(footprint)
+        set_uuid(pad, frame_uuid("hole", x, y))
+        pad.SetAttribute(pcbnew.PAD_ATTRIB_NPTH)
+        pad.SetShape(pcbnew.PAD_SHAPE_CIRCLE)
+        pad.SetSize(size)
+        pad.SetDrillSize(size)
+        pad.SetLayerSet(pad.UnplatedHoleMask())
+        pad.SetPosition(pcbnew.VECTOR2I(x, y))
+        footprint.Add(pad)
+    board.Add(footprint)
+
+
+def create_vscore_line(board, start_x, start_y, end_x, end_y, layer):
+    """Create a v-score line and return it for layer manipulation."""
+    line = pcbnew.PCB_SHAPE(board)
+    name = layer_uuid_name(layer)
+    set_uuid(line, frame_uuid("line", name, start_x, start_y, end_x, end_y))
+    line.SetStart(pcbnew.VECTOR2I(int(start_x), int(start_y)))
+    line.SetEnd(pcbnew.VECTOR2I(int(end_x), int(end_y)))
+    line.SetLayer(layer)
+    return line
+
+
+def create_vscore_text(board, text, pos_x, pos_y, angle, justify, layer):
+    """Create a v-score label text."""
+    text_obj = pcbnew.PCB_TEXT(board)
+    name = layer_uuid_name(layer)
+    set_uuid(text_obj, frame_uuid("text", name, text, pos_x, pos_y, angle))
+    text_obj.SetText(text)
+    text_obj.SetHorizJustify(justify)
+    text_obj.SetPosition(pcbnew.VECTOR2I(int(pos_x), int(pos_y)))
+    text_obj.SetTextSize(
+        pcbnew.VECTOR2I(SCALE * V_SCORE_TEXT_SIZE, SCALE * V_SCORE_TEXT_SIZE)
+    )
+    text_obj.SetLayer(layer)
+    text_obj.SetTextAngle(pcbnew.EDA_ANGLE(angle, 0))
+    board.Add(text_obj)
+
+
+def add_vscores(
+    board,
+    layertable,
+    panel_center,
+    panel_width,
+    panel_height,
+    board_width,
+    board_height,
+    num_x,
+    num_y,
+    h_rail_width,
+    v_rail_width,
+    vscore_extend,
+    vscore_layer,
+    vscore_text_layer,
+    vscore_text,
+):
+    """Add all v-score lines and labels to the panel."""
+    lines, labels, vscore_bottom = vscore_layout(
         panel_center,
         panel_width,
         panel_height,
@@ -462,77 +963,5162 @@ def main():
         h_rail_width,
         v_rail_width,
         vscore_extend,
+    )
+    create_vscores(
+        board,
+        layertable,
+        lines,
+        labels,
         vscore_layer,
         vscore_text_layer,
         vscore_text,
     )
+    return vscore_bottom
 
-    # add rail text
-    if args.hrailtext:
-        add_rail_text(
-            board,
-            args.hrailtext,
-            panel_center.x - panel_width / 2 + h_rail_width / 2 * SCALE,
-            panel_center.y + panel_height / 2 - SCALE,
-            angle=900,
-        )
 
-    if args.vrailtext:
-        add_rail_text(
+def create_vscores(
+    board, layertable, lines, labels, vscore_layer, vscore_text_layer, vscore_text
+):
+    """Add v-score lines and their labels to the panel."""
+    justify = {
+        "left": pcbnew.GR_TEXT_H_ALIGN_LEFT,
+        "right": pcbnew.GR_TEXT_H_ALIGN_RIGHT,
+    }
+
+    v_scores = []
+    for start_x, start_y, end_x, end_y in lines:
+        v_scores.append(
+            create_vscore_line(
+                board, start_x, start_y, end_x, end_y, layertable[vscore_layer]
+            )
+        )
+    for pos_x, pos_y, angle, align in labels:
+        create_vscore_text(
             board,
-            args.vrailtext,
-            panel_center.x - panel_width / 2 + SCALE,
-            panel_center.y - panel_height / 2 + v_rail_width / 2 * SCALE,
+            vscore_text,
+            pos_x,
+            pos_y,
+            angle,
+            justify[align],
+            layertable[vscore_text_layer],
         )
 
-    # add title text to rail
-    title_text = get_title_text(board)
+    # add v-scores to board via Edge.Cuts layer workaround
+    for vscore in v_scores:
+        vscore.SetLayer(layertable["Edge.Cuts"])
+        board.Add(vscore)
 
-    if args.htitle:
-        add_rail_text(
-            board,
-            title_text,
-            panel_center.x + panel_width / 2 - h_rail_width / 2 * SCALE,
-            panel_center.y + panel_height / 2 - SCALE,
-            angle=900,
+    # move back to correct layer
+    for vscore in v_scores:
+        vscore.SetLayer(layertable[vscore_layer])
+
+
+def add_rail_text(board, text, pos_x, pos_y, angle=0, text_size=1):
+    """Add text to a rail on the silkscreen layer."""
+    text_obj = pcbnew.PCB_TEXT(board)
+    name = layer_uuid_name(pcbnew.F_SilkS)
+    set_uuid(text_obj, frame_uuid("text", name, text, pos_x, pos_y, angle))
+    text_obj.SetText(text)
+    text_obj.SetTextSize(pcbnew.VECTOR2I(SCALE * text_size, SCALE * text_size))
+    text_obj.SetLayer(pcbnew.F_SilkS)
+    text_obj.SetHorizJustify(pcbnew.GR_TEXT_H_ALIGN_LEFT)
+    text_obj.SetPosition(pcbnew.VECTOR2I(int(pos_x), int(pos_y)))
+    if angle != 0:
+        text_obj.SetTextAngle(pcbnew.EDA_ANGLE(angle, 0))
+    board.Add(text_obj)
+
+
+def get_title_text(board):
+    """Build title text from the board's title block."""
+    title_block = board.GetTitleBlock()
+    return format_title_text(
+        title_block.GetTitle(),
+        title_block.GetRevision(),
+        title_block.GetDate(),
+        title_block.GetCompany(),
+    )
+
+
+# Gerber output: plots the source board once and lets step and repeat copy it
+
+GERBER_APERTURE_END = "G04 APERTURE END LIST*"
+_GERBER_DCODE = re.compile(r"D(\d+)\*$")
+_EXCELLON_COORD = re.compile(r"([XY])(-?\d*\.?\d+)")
+_EXCELLON_TOOL = re.compile(r"T\d+")
+
+
+def gerber_step_repeat(text, num_x, num_y, pitch_x, pitch_y):
+    """
+    Wrap the graphics of a KiCad Gerber file in a step and repeat block.
+
+    The block is repeated num_x times pitch_x apart to the right and num_y
+    times pitch_y apart upwards, with the pitches in internal units.
+    """
+    lines = text.splitlines()
+    start = lines.index(GERBER_APERTURE_END) + 1
+    end = len(lines) - 1 - lines[::-1].index("M02*")
+    step = f"%SRX{num_x}Y{num_y}I{iu_to_mm(pitch_x)}J{iu_to_mm(pitch_y)}*%"
+    return "\n".join(
+        lines[:start] + [step] + lines[start:end] + ["%SR*%"] + lines[end:] + [""]
+    )
+
+
+def _renumber_apertures(lines, offset, macros):
+    """Move aperture numbers up by offset and prefix the macro names."""
+    out = []
+    for line in lines:
+        if line.startswith("%ADD"):
+            match = re.match(r"%ADD(\d+)([^,*]+)(.*)", line)
+            name = match.group(2)
+            if name in macros:
+                name = "Panel" + name
+            line = f"%ADD{int(match.group(1)) + offset}{name}{match.group(3)}"
+        elif line.startswith("%AM"):
+            line = "%AMPanel" + line[3:]
+        elif not line.startswith("%"):
+            line = _GERBER_DCODE.sub(
+                lambda m: f"D{int(m.group(1)) + offset}*"
+                if int(m.group(1)) >= 10
+                else m.group(0),
+                line,
+            )
+        out.append(line)
+    return out
+
+
+def merge_gerber(base, extra):
+    """
+    Append the graphics of one KiCad Gerber file to another of the same layer.
+
+    The apertures and macros of extra are renumbered and renamed so they
+    don't clash with those of base. Both files must use the same coordinate
+    format, which KiCad always does.
+    """
+    base_lines = base.splitlines()
+    extra_lines = extra.splitlines()
+    codes = [
+        int(re.match(r"%ADD(\d+)", line).group(1))
+        for line in base_lines
+        if line.startswith("%ADD")
+    ]
+    offset = max(codes, default=9) - 9
+    macros = {line[3:].split("*")[0] for line in extra_lines if line.startswith("%AM")}
+
+    extra_start = next(
+        i for i, line in enumerate(extra_lines) if line in ("%LPD*%", "G01*")
+    )
+    extra_end = extra_lines.index(GERBER_APERTURE_END)
+    definitions = _renumber_apertures(
+        [
+            line
+            for line in extra_lines[extra_start:extra_end]
+            if not line.startswith("G04") and line not in ("%LPD*%", "G01*")
+        ],
+        offset,
+        macros,
+    )
+    graphics = _renumber_apertures(
+        extra_lines[extra_end + 1 : extra_lines.index("M02*")], offset, macros
+    )
+
+    base_end = base_lines.index(GERBER_APERTURE_END)
+    m02 = len(base_lines) - 1 - base_lines[::-1].index("M02*")
+    return "\n".join(
+        base_lines[:base_end]
+        + definitions
+        + base_lines[base_end:m02]
+        + ["%TD*%", "%LPD*%", "G01*"]
+        + graphics
+        + base_lines[m02:]
+        + [""]
+    )
+
+
+def excellon_repeat(text, offsets):
+    """
+    Repeat every hit and route of a KiCad Excellon file at each offset.
+
+    Offsets are (dx, dy) in internal units along the Excellon axes, with y
+    pointing up. Coordinates must be absolute and in decimal format.
+    """
+    lines = text.splitlines()
+    header_end = lines.index("%") + 1
+    out = lines[:header_end]
+    tools = []
+    for line in lines[header_end:]:
+        if line == "M30":
+            break
+        if _EXCELLON_TOOL.fullmatch(line):
+            tools.append((line, []))
+        elif tools:
+            tools[-1][1].append(line)
+        else:
+            out.append(line)
+
+    def shifted(line, dx, dy):
+        return _EXCELLON_COORD.sub(
+            lambda m: m.group(1)
+            + iu_to_mm(mm_to_iu(m.group(2)) + (dx if m.group(1) == "X" else dy)),
+            line,
         )
 
-    if args.vtitle:
-        add_rail_text(
-            board,
-            title_text,
-            panel_center.x - panel_width / 2 + SCALE,
-            panel_center.y + panel_height / 2 - v_rail_width / 2 * SCALE,
+    for tool, body in tools:
+        out.append(tool)
+        for dx, dy in offsets:
+            out.extend(shifted(line, dx, dy) for line in body)
+    out.append("M30")
+    return "\n".join(out + [""])
+
+
+def gerber_layers(board, layertable, args):
+    """Return the layers to plot: copper, mask, paste, silk, outline and v-scores."""
+    fab_layers = {
+        pcbnew.F_SilkS,
+        pcbnew.B_SilkS,
+        pcbnew.F_Mask,
+        pcbnew.B_Mask,
+        pcbnew.F_Paste,
+        pcbnew.B_Paste,
+        pcbnew.Edge_Cuts,
+        layertable[args.vscorelayer],
+        layertable[args.vscoretextlayer],
+    }
+    return [
+        layer
+        for layer in board.GetEnabledLayers().Seq()
+        if pcbnew.IsCopperLayer(layer) or layer in fab_layers
+    ]
+
+
+def plot_gerbers(board, layers, output_dir, use_aux_origin=False):
+    """Plot each layer to its own Gerber file, returning {layer: path}."""
+    controller = pcbnew.PLOT_CONTROLLER(board)
+    options = controller.GetPlotOptions()
+    options.SetOutputDirectory(output_dir)
+    options.SetFormat(pcbnew.PLOT_FORMAT_GERBER)
+    options.SetUseGerberX2format(True)
+    options.SetUseAuxOrigin(use_aux_origin)
+    options.SetPlotFrameRef(False)
+    options.SetCreateGerberJobFile(False)
+
+    paths = {}
+    for layer in layers:
+        controller.SetLayer(layer)
+        controller.OpenPlotfile(
+            board.GetLayerName(layer).replace(".", "_"), pcbnew.PLOT_FORMAT_GERBER, ""
         )
+        controller.PlotLayer()
+        paths[layer] = controller.GetPlotFileName()
+    controller.ClosePlot()
+    return paths
 
-    # add report text
-    report_args = (
-        f"{output_file} ({num_x}x{num_y} panel) generated with:\n./panelizer.py"
-    )
-    report_args += " " + " ".join(sys.argv[1:])
-    report_text = pcbnew.PCB_TEXT(board)
-    report_text.SetText(report_args)
-    report_text.SetTextSize(pcbnew.VECTOR2I(SCALE, SCALE))
-    report_text.SetLayer(layertable["User.Comments"])
-    report_text.SetHorizJustify(pcbnew.GR_TEXT_H_ALIGN_CENTER)
-    report_text.SetPosition(pcbnew.VECTOR2I(panel_center.x, vscore_bottom + 10 * SCALE))
-    board.Add(report_text)
 
-    # save output
-    board.Save(output_file)
+def write_drill_files(board, output_dir):
+    """Write the plated and non-plated Excellon files, returning their paths."""
+    writer = pcbnew.EXCELLON_WRITER(board)
+    writer.SetOptions(False, False, pcbnew.VECTOR2I(0, 0), False)
+    writer.SetFormat(True)
+    writer.CreateDrillandMapFilesSet(output_dir, True, False)
+    stem = os.path.splitext(os.path.basename(board.GetFileName()))[0]
+    paths = [os.path.join(output_dir, f"{stem}-{kind}.drl") for kind in ["PTH", "NPTH"]]
+    return [path for path in paths if os.path.exists(path)]
 
-    # print warnings and report
-    if (
-        panel_width / SCALE < MIN_PANEL_SIZE_MM
-        or panel_height / SCALE < MIN_PANEL_SIZE_MM
-    ):
-        print(f"Warning: panel is under {MIN_PANEL_SIZE_MM}x{MIN_PANEL_SIZE_MM}mm")
 
-    if panel_x or panel_y:
-        print(f"You can fit {num_x} x {num_y} boards on the panel")
+_PLOT_BOARD = None  # the panel as loaded by a plot worker, see plot_panel()
 
-    print(f"Board dimensions: {board_width / SCALE}x{board_height / SCALE}mm")
-    print(f"Panel dimensions: {panel_width / SCALE}x{panel_height / SCALE}mm")
+
+def _init_plot_worker(path):
+    """Import pcbnew and load the saved panel, once per plot worker."""
+    global _PLOT_BOARD  # pylint: disable=global-statement
+    import_pcbnew()
+    _PLOT_BOARD = pcbnew.LoadBoard(path)
+
+
+def _plot_layer(board, layer, output_dir):
+    """Plot one layer of a board, returning (layer, path, seconds)."""
+    start = time.perf_counter()
+    path = plot_gerbers(board, [layer], output_dir)[layer]
+    return layer, path, time.perf_counter() - start
+
+
+def _plot_worker_layer(task):
+    """Plot one layer of the panel this worker loaded."""
+    return _plot_layer(_PLOT_BOARD, *task)
+
+
+def plot_panel(args, board, layertable, output_dir, profiler):
+    """
+    Plot the Gerber and drill files of a panel that has just been saved.
+
+    Layers are shared out over a pool of worker processes that each load the
+    saved panel once. They are spawned rather than forked: KiCad's own
+    thread pool has run by now, building the connectivity or filling zones,
+    and a forked child of a process with threads can deadlock on a lock one
+    of them held. With one job or one layer the board in memory is plotted
+    here instead, without loading it again.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    layers = gerber_layers(board, layertable, args)
+    tasks = [(layer, output_dir) for layer in layers]
+    workers = max(1, min(args.jobs, len(layers)))
+
+    start = time.perf_counter()
+    with profiler.phase("plot layers", len(layers)):
+        if workers > 1:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_plot_worker,
+                initargs=(board.GetFileName(),),
+            ) as executor:
+                timings = list(executor.map(_plot_worker_layer, tasks))
+        else:
+            timings = [_plot_layer(board, *task) for task in tasks]
+
+    with profiler.phase("write drill files"):
+        drill_start = time.perf_counter()
+        drill_paths = write_drill_files(board, output_dir)
+        drill_seconds = time.perf_counter() - drill_start
+
+    total = time.perf_counter() - start
+    print(
+        f"Plotted {len(layers)} layer(s) and drill files in {total:.3f}s "
+        f"with {workers} process(es)"
+    )
+    for layer, path, seconds in timings:
+        name = board.GetLayerName(layer)
+        print(f"  {seconds:8.3f}s  {name} -> {os.path.basename(path)}")
+    print(f"  {drill_seconds:8.3f}s  drill -> {len(drill_paths)} file(s)")
+
+
+def write_gerbers(args, board, layertable, plan, output_dir, profiler):
+    """
+    Write fab output for the panel without duplicating the board.
+
+    The source board is plotted once per layer and wrapped in a step and
+    repeat block at the board pitch, and its drill hits are repeated per
+    copy. The outline, v-scores and text are plotted from a separate board
+    holding only those and merged into the same layer files.
+
+    Returns the final (panel_width, panel_height) in internal units.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(board.GetFileName()))[0]
+    layers = gerber_layers(board, layertable, args)
+    frame_layers = {
+        layertable["Edge.Cuts"],
+        layertable[args.vscorelayer],
+        layertable[args.vscoretextlayer],
+        layertable["User.Comments"],
+        pcbnew.F_SilkS,
+    }
+
+    # Gerber y points up, so the block is plotted at the bottom row of the
+    # panel and stepped upwards, everything else uses the board's origin; the
+    # board's own aux origin is put back afterwards
+    with profiler.phase("plot source layers", len(layers)):
+        settings = board.GetDesignSettings()
+        aux_origin = settings.GetAuxOrigin()
+        aux_origin = pcbnew.VECTOR2I(aux_origin.x, aux_origin.y)
+        settings.SetAuxOrigin(pcbnew.VECTOR2I(0, -(plan.num_y - 1) * plan.board_height))
+        try:
+            paths = plot_gerbers(board, layers, output_dir, use_aux_origin=True)
+        finally:
+            settings.SetAuxOrigin(aux_origin)
+
+    with profiler.phase("plot panel frame"):
+        frame = pcbnew.CreateEmptyBoard()
+        with tempfile.TemporaryDirectory() as frame_dir:
+            frame.SetFileName(os.path.join(frame_dir, stem + ".kicad_pcb"))
+            panel_width, panel_height = add_panel_frame(
+                args,
+                frame,
+                layertable,
+                plan,
+                get_title_text(board),
+                output_path(board.GetFileName()),
+            )
+            frame_paths = plot_gerbers(
+                frame, [layer for layer in layers if layer in frame_layers], frame_dir
+            )
+            for layer, path in paths.items():
+                with open(path, encoding="utf-8") as plot:
+                    text = gerber_step_repeat(
+                        plot.read(),
+                        plan.num_x,
+                        plan.num_y,
+                        plan.board_width,
+                        plan.board_height,
+                    )
+                if layer in frame_paths:
+                    with open(frame_paths[layer], encoding="utf-8") as plot:
+                        text = merge_gerber(text, plot.read())
+                with open(path, "w", encoding="utf-8") as plot:
+                    plot.write(text)
+
+    with profiler.phase("write drill files"):
+        offsets = [
+            (x * plan.board_width, -y * plan.board_height)
+            for x in range(plan.num_x)
+            for y in range(plan.num_y)
+        ]
+        for path in write_drill_files(board, output_dir):
+            with open(path, encoding="utf-8") as drill:
+                text = excellon_repeat(drill.read(), offsets)
+            with open(path, "w", encoding="utf-8") as drill:
+                drill.write(text)
+
+    return panel_width, panel_height
+
+
+# S-expression engine: panelizes the *.kicad_pcb text directly, without pcbnew
+
+_SEXPR_TOKEN = re.compile(r'\(|\)|"(?:[^"\\]|\\.)*"|[^\s()"]+')
+_UNESCAPE = re.compile(r"\\(.)")
+_TOP_LEVEL_INDENT = re.compile(r"\n([ \t]+)\(")
+
+# nodes whose first two values are absolute coordinates
+_COORD_NODES = {"at", "start", "end", "mid", "center", "xy"}
+_ID_NODES = {"uuid", "tstamp"}
+_TRACK_NODES = {"segment", "arc", "via"}
+_DRAWING_NODES = {
+    "gr_line",
+    "gr_rect",
+    "gr_circle",
+    "gr_arc",
+    "gr_poly",
+    "gr_curve",
+    "gr_bbox",
+    "gr_text",
+    "gr_text_box",
+    "dimension",
+    "image",
+    "target",
+}
+_FOOTPRINT_NODES = {"footprint", "module"}
+_FP_SHAPE_NODES = {"fp_line", "fp_rect", "fp_circle", "fp_arc", "fp_poly", "fp_curve"}
+
+
+def parse_sexpr(text):
+    """Parse S-expression text into nested lists of raw atom strings."""
+    stack = [[]]
+    for token in _SEXPR_TOKEN.findall(text):
+        if token == "(":
+            node = []
+            stack[-1].append(node)
+            stack.append(node)
+        elif token == ")":
+            stack.pop()
+        else:
+            stack[-1].append(token)
+    return stack[0][0]
+
+
+def _format_node(node, depth, out):
+    """Append the KiCad style text of a node to out."""
+    if not any(isinstance(child, list) for child in node):
+        out.append("(" + " ".join(node) + ")")
+        return
+
+    indent = "\n" + "\t" * (depth + 1)
+    out.append("(" + node[0])
+    after_list = False
+    for child in node[1:]:
+        if isinstance(child, list):
+            out.append(indent)
+            _format_node(child, depth + 1, out)
+            after_list = True
+        else:
+            out.append(indent if after_list else " ")
+            out.append(child)
+    out.append("\n" + "\t" * depth + ")")
+
+
+def format_sexpr(node):
+    """Format nested lists back into KiCad style S-expression text."""
+    out = []
+    _format_node(node, 0, out)
+    out.append("\n")
+    return "".join(out)
+
+
+def unquote(atom):
+    """Return the string value of a raw atom."""
+    if atom.startswith('"'):
+        return _UNESCAPE.sub(
+            lambda m: "\n" if m.group(1) == "n" else m.group(1), atom[1:-1]
+        )
+    return atom
+
+
+def quote(value):
+    """Return a raw quoted atom for a string value."""
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'"{escaped}"'
+
+
+def mm_to_iu(atom):
+    """Convert a raw millimetre atom to internal units."""
+    return round(float(atom) * SCALE)
+
+
+def iu_to_mm(value):
+    """Format internal units as a raw millimetre atom."""
+    text = f"{value / SCALE:.6f}".rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text
+
+
+def find_child(node, name):
+    """Return the first child list of node with the given name, or None."""
+    for child in node[1:]:
+        if isinstance(child, list) and child and child[0] == name:
+            return child
+    return None
+
+
+def _copy_id(atom, cell):
+    """Return the id atom of the copy at grid position cell of a source id atom."""
+    new = copy_uuid(unquote(atom), *cell)
+    return quote(new) if atom.startswith('"') else new
+
+
+def _copy_ids(node, cell):
+    """Clone a node, deriving every uuid/tstamp in it from the source's."""
+    if node[0] in _ID_NODES:
+        return [node[0], _copy_id(node[1], cell)]
+    return [_copy_ids(c, cell) if isinstance(c, list) else c for c in node]
+
+
+def translate_copy(node, dx, dy, cell):
+    """
+    Clone a top level board item moved by (dx, dy) internal units.
+
+    Footprint children are stored relative to the footprint, so only the
+    footprint's own position and any zones it contains are translated. Ids
+    are derived from the source ids and the grid position cell, so the same
+    board always gives the same panel.
+    """
+    head = node[0]
+    if head in _COORD_NODES and len(node) >= 3:
+        pos_x = iu_to_mm(mm_to_iu(node[1]) + dx)
+        pos_y = iu_to_mm(mm_to_iu(node[2]) + dy)
+        return [head, pos_x, pos_y] + node[3:]
+    if head in _ID_NODES:
+        return [head, _copy_id(node[1], cell)]
+
+    relative = head in _FOOTPRINT_NODES
+    out = [head]
+    for child in node[1:]:
+        if not isinstance(child, list):
+            out.append(child)
+        elif relative and child[0] not in ("at", "zone"):
+            out.append(_copy_ids(child, cell))
+        else:
+            out.append(translate_copy(child, dx, dy, cell))
+    return out
+
+
+def _rotate(x, y, angle):
+    """Rotate a point by a KiCad angle in degrees (counter-clockwise on screen)."""
+    if not angle:
+        return x, y
+    rad = math.radians(angle)
+    cos, sin = math.cos(rad), math.sin(rad)
+    return x * cos + y * sin, -x * sin + y * cos
+
+
+def _circumcenter(start, mid, end):
+    """Return the centre of the circle through three points, None if in line."""
+    (ax, ay), (bx, by), (cx, cy) = start, mid, end
+    det = 2 * (ax * (by - cy) + bx * (cy - ay) + cx * (ay - by))
+    if not det:
+        return None
+    ux = (
+        (ax**2 + ay**2) * (by - cy)
+        + (bx**2 + by**2) * (cy - ay)
+        + (cx**2 + cy**2) * (ay - by)
+    ) / det
+    uy = (
+        (ax**2 + ay**2) * (cx - bx)
+        + (bx**2 + by**2) * (ax - cx)
+        + (cx**2 + cy**2) * (bx - ax)
+    ) / det
+    return ux, uy
+
+
+def _arc_extents(start, mid, end):
+    """Return the points bounding an arc through start, mid and end."""
+    center = _circumcenter(start, mid, end)
+    if center is None:
+        return [start, mid, end]
+    (ax, ay), (bx, by), (cx, cy) = start, mid, end
+    ux, uy = center
+    radius = math.hypot(ax - ux, ay - uy)
+
+    def angle_of(px, py):
+        return math.atan2(py - uy, px - ux) % (2 * math.pi)
+
+    start_angle = angle_of(ax, ay)
+    sweep = (angle_of(cx, cy) - start_angle) % (2 * math.pi)
+    if (angle_of(bx, by) - start_angle) % (2 * math.pi) > sweep:
+        # the arc runs the other way round, through mid
+        start_angle, sweep = angle_of(cx, cy), 2 * math.pi - sweep
+
+    points = [start, mid, end]
+    for quadrant in range(4):
+        theta = quadrant * math.pi / 2
+        if (theta - start_angle) % (2 * math.pi) <= sweep:
+            points.append(
+                (ux + radius * math.cos(theta), uy + radius * math.sin(theta))
+            )
+    return points
+
+
+def _shape_extents(node):
+    """Return the (points, width) that bound a graphic shape, in internal units."""
+
+    def point(name):
+        child = find_child(node, name)
+        return (mm_to_iu(child[1]), mm_to_iu(child[2]))
+
+    kind = node[0][3:]
+    stroke = find_child(node, "stroke")
+    width_node = find_child(stroke, "width") if stroke else find_child(node, "width")
+    width = mm_to_iu(width_node[1]) if width_node else 0
+
+    if kind in ("line", "rect"):
+        points = [point("start"), point("end")]
+    elif kind == "circle":
+        (cx, cy), (ex, ey) = point("center"), point("end")
+        radius = math.hypot(ex - cx, ey - cy)
+        points = [(cx - radius, cy - radius), (cx + radius, cy + radius)]
+    elif kind == "arc":
+        points = _arc_extents(point("start"), point("mid"), point("end"))
+    else:
+        pts = find_child(node, "pts")
+        points = [
+            (mm_to_iu(xy[1]), mm_to_iu(xy[2]))
+            for xy in pts[1:]
+            if isinstance(xy, list) and xy[0] == "xy"
+        ]
+    return points, width
+
+
+def _is_on_layer(node, layer):
+    """Check if an item's layer is the given canonical layer name."""
+    layer_node = find_child(node, "layer")
+    return layer_node is not None and unquote(layer_node[1]) == layer
+
+
+def sexpr_edge_bbox(root):
+    """
+    Compute the Edge.Cuts bounding box of a parsed board.
+
+    Mirrors GetBoardEdgesBoundingBox(), including half the line width, and
+    returns (left, top, right, bottom) in internal units.
+    """
+    xs = []
+    ys = []
+
+    def merge(points, width, offset=(0, 0), angle=0):
+        half = width / 2
+        for px, py in points:
+            px, py = _rotate(px, py, angle)
+            xs.extend((offset[0] + px - half, offset[0] + px + half))
+            ys.extend((offset[1] + py - half, offset[1] + py + half))
+
+    for node in root[1:]:
+        if not isinstance(node, list):
+            continue
+        if node[0] in _DRAWING_NODES and node[0].startswith("gr_"):
+            if node[0] not in ("gr_text", "gr_text_box") and _is_on_layer(
+                node, "Edge.Cuts"
+            ):
+                merge(*_shape_extents(node))
+        elif node[0] in _FOOTPRINT_NODES:
+            at = find_child(node, "at")
+            offset = (mm_to_iu(at[1]), mm_to_iu(at[2]))
+            angle = float(at[3]) if len(at) > 3 else 0
+            for child in node[1:]:
+                if (
+                    isinstance(child, list)
+                    and child[0] in _FP_SHAPE_NODES
+                    and _is_on_layer(child, "Edge.Cuts")
+                ):
+                    child = ["gr_" + child[0][3:]] + child[1:]
+                    merge(*_shape_extents(child), offset=offset, angle=angle)
+
+    if not xs:
+        print("Board has no Edge.Cuts outline. Quitting.")
+        sys.exit(1)
+    return int(min(xs)), int(min(ys)), int(max(xs)), int(max(ys))
+
+
+def scan_edge_cuts(text):
+    """
+    Parse only the top level nodes of board text that mention Edge.Cuts.
+
+    KiCad starts every top level node on a line of its own and escapes the
+    newlines in strings, so the nodes are found by searching the text and
+    only they are tokenized. The returned root is enough for sexpr_edge_bbox()
+    and sexpr_edge_loops(). Text laid out some other way is parsed whole.
+    """
+    indent = _TOP_LEVEL_INDENT.search(text)
+    if indent is None:
+        return parse_sexpr(text)
+    marker = "\n" + indent.group(1) + "("
+    close = text.rstrip().rfind(")")
+    root = parse_sexpr(text[: indent.start()])
+    pos = text.find("Edge.Cuts", indent.start())
+    while pos != -1:
+        start = text.rfind(marker, 0, pos)
+        end = text.find(marker, pos)
+        if end == -1:
+            end = close
+        root.append(parse_sexpr(text[start:end]))
+        pos = text.find("Edge.Cuts", end)
+    return root
+
+
+def sexpr_layertable(root):
+    """Creates a dict to lookup canonical layer names by user or canonical name."""
+    table = {}
+    layers = find_child(root, "layers")
+    for entry in layers[1:] if layers else []:
+        canonical = unquote(entry[1])
+        table[canonical] = canonical
+        if len(entry) > 3:
+            table[unquote(entry[3])] = canonical
+    return table
+
+
+def sexpr_title_text(root):
+    """Build title text from a parsed board's title block."""
+    title_block = find_child(root, "title_block")
+
+    def field(name):
+        node = find_child(title_block, name) if title_block else None
+        return unquote(node[1]) if node and len(node) > 1 else ""
+
+    return format_title_text(
+        field("title"), field("rev"), field("date"), field("company")
+    )
+
+
+def sexpr_line(start_x, start_y, end_x, end_y, layer, id_node="uuid"):
+    """Create a graphic line item on the given canonical layer."""
+    return [
+        "gr_line",
+        ["start", iu_to_mm(int(start_x)), iu_to_mm(int(start_y))],
+        ["end", iu_to_mm(int(end_x)), iu_to_mm(int(end_y))],
+        ["stroke", ["width", str(DEFAULT_LINE_WIDTH)], ["type", "default"]],
+        ["layer", quote(layer)],
+        [
+            id_node,
+            quote(frame_uuid("line", layer, start_x, start_y, end_x, end_y)),
+        ],
+    ]
+
+
+def sexpr_text(
+    text,
+    pos_x,
+    pos_y,
+    layer,
+    angle=0,
+    size=1,
+    thickness=None,
+    justify=None,
+    id_node="uuid",
+):
+    """Create a graphic text item, with angle in tenths of a degree."""
+    at = ["at", iu_to_mm(int(pos_x)), iu_to_mm(int(pos_y))]
+    if angle:
+        at.append(f"{angle / 10:g}")
+    if thickness is None:
+        thickness = size * TEXT_THICKNESS_RATIO
+    font = ["font", ["size", f"{size:g}", f"{size:g}"], ["thickness", f"{thickness:g}"]]
+    effects = ["effects", font]
+    if justify:
+        effects.append(["justify", justify])
+    return [
+        "gr_text",
+        quote(text),
+        at,
+        ["layer", quote(layer)],
+        [id_node, quote(frame_uuid("text", layer, text, pos_x, pos_y, angle))],
+        effects,
+    ]
+
+
+def sexpr_mouse_bites(centre, holes, id_node="uuid"):
+    """
+    Create a footprint of the NPTH holes of one row of mouse-bites.
+
+    Boards with uuids are KiCad 8 files and get property fields, older ones
+    with tstamps get fp_text fields.
+    """
+    center_x, center_y = centre
+    effects = ["effects", ["font", ["size", "1", "1"], ["thickness", "0.15"]]]
+    fields = []
+    for name, text, layer in (
+        ("Reference", "", "F.SilkS"),
+        ("Value", "MouseBite", "F.Fab"),
+    ):
+        field_id = [id_node, quote(frame_uuid("tab", name, center_x, center_y))]
+        if id_node == "uuid":
+            fields.append(
+                ["property", quote(name), quote(text), ["at", "0", "0", "0"]]
+                + [["layer", quote(layer)], ["hide", "yes"], field_id, effects]
+            )
+        else:
+            fields.append(
+                ["fp_text", name.lower(), quote(text), ["at", "0", "0"]]
+                + [["layer", quote(layer)], "hide", effects, field_id]
+            )
+    drill = f"{TAB_DRILL:g}"
+    pads = [
+        [
+            "pad",
+            '""',
+            "np_thru_hole",
+            "circle",
+            ["at", iu_to_mm(x - center_x), iu_to_mm(y - center_y)],
+            ["size", drill, drill],
+            ["drill", drill],
+            ["layers", '"*.Cu"', '"*.Mask"'],
+            [id_node, quote(frame_uuid("hole", x, y))],
+        ]
+        for x, y in holes
+    ]
+    return [
+        "footprint",
+        '"MouseBite"',
+        ["layer", '"F.Cu"'],
+        [id_node, quote(frame_uuid("tab", center_x, center_y))],
+        ["at", iu_to_mm(center_x), iu_to_mm(center_y)],
+        ["attr", "board_only", "exclude_from_pos_files", "exclude_from_bom"],
+        *fields,
+        *pads,
+    ]
+
+
+def _sexpr_id_node(root):
+    """Return the id node name (uuid or tstamp) used by a parsed board."""
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node[0] in _ID_NODES:
+            return node[0]
+        stack.extend(c for c in node[1:] if isinstance(c, list))
+    return "uuid"
+
+
+def _item_id(node):
+    """Return the uuid or tstamp of a top level item, or None."""
+    for child in node[1:]:
+        if isinstance(child, list) and child and child[0] in _ID_NODES:
+            return unquote(child[1])
+    return None
+
+
+def sexpr_board_items(root, edge_cuts):
+    """
+    Split the top level of a parsed board for panelizing.
+
+    Returns (items, kept, header): the items copied to every board, every node
+    except the source outline, and the nodes that are neither (setup, nets,
+    title block and so on).
+    """
+    items = []
+    kept = []
+    header = []
+    for node in root[1:]:
+        if isinstance(node, list) and node[0] in _DRAWING_NODES:
+            if _is_on_layer(node, edge_cuts):
+                continue
+        if isinstance(node, list) and (
+            node[0] in _TRACK_NODES
+            or node[0] in _DRAWING_NODES
+            or node[0] in _FOOTPRINT_NODES
+            or node[0] == "zone"
+        ):
+            items.append(node)
+        else:
+            header.append(node)
+        kept.append(node)
+    return items, kept, header
+
+
+def grid_copies(items, plan):
+    """Yield (item index, copy) for every board of the panel but the first."""
+    for copy in plan.copies:
+        for index, item in enumerate(items):
+            yield index, translate_copy(item, copy.dx, copy.dy, (copy.x, copy.y))
+
+
+# Nesting: packs the boards by their Edge.Cuts outline rather than its bounding
+# box, in lattices of staggered or interlocking copies
+
+NEST_STEPS = 100  # coarse steps a pitch is scanned in before it is refined
+NEST_RESOLUTION = 10000  # pitches are refined to 0.01mm
+NEST_ARC_ERROR = 10000  # furthest an arc's chords stray from it, 0.01mm
+
+# the other board of an alternating pair sits this far below the first, in
+# quarters of the board height
+NEST_PAIR_DROPS = (0, 1, -1, 2, -2)
+NEST_STAGGERS = (0, 1 / 2, 1 / 3, 2 / 3)
+
+# boards are placed at motif member + column // len(motif) * ux, rows are
+# moved by vy and shifted by row * vx, wrapped to under ux
+Lattice = namedtuple("Lattice", ["motif", "ux", "vx", "vy", "transposed"])
+
+
+def _arc_points(start, mid, end):
+    """Approximate an arc through start, mid and end with a polyline."""
+    center = _circumcenter(start, mid, end)
+    if center is None:
+        return [start, end]
+    ux, uy = center
+    radius = math.hypot(start[0] - ux, start[1] - uy)
+    first = math.atan2(start[1] - uy, start[0] - ux)
+    sweep = (math.atan2(end[1] - uy, end[0] - ux) - first) % (2 * math.pi)
+    if (math.atan2(mid[1] - uy, mid[0] - ux) - first) % (2 * math.pi) > sweep:
+        # the arc runs the other way round, through mid
+        sweep -= 2 * math.pi
+    count = _arc_segments(radius, abs(sweep))
+    points = [start]
+    for i in range(1, count):
+        angle = first + sweep * i / count
+        points.append((ux + radius * math.cos(angle), uy + radius * math.sin(angle)))
+    return points + [end]
+
+
+def _arc_segments(radius, sweep):
+    """Return how many chords keep within NEST_ARC_ERROR of an arc."""
+    if radius <= NEST_ARC_ERROR:
+        return max(2, math.ceil(sweep / (math.pi / 2)))
+    return max(2, math.ceil(sweep / (2 * math.acos(1 - NEST_ARC_ERROR / radius))))
+
+
+def _shape_path(node):
+    """Return the points along a graphic shape, in internal units."""
+
+    def point(name):
+        child = find_child(node, name)
+        return (mm_to_iu(child[1]), mm_to_iu(child[2]))
+
+    kind = node[0][3:]
+    if kind == "line":
+        return [point("start"), point("end")]
+    if kind == "rect":
+        (sx, sy), (ex, ey) = point("start"), point("end")
+        return [(sx, sy), (ex, sy), (ex, ey), (sx, ey), (sx, sy)]
+    if kind == "circle":
+        (cx, cy), (ex, ey) = point("center"), point("end")
+        radius = math.hypot(ex - cx, ey - cy)
+        count = _arc_segments(radius, 2 * math.pi)
+        path = [
+            (
+                cx + radius * math.cos(2 * math.pi * i / count),
+                cy + radius * math.sin(2 * math.pi * i / count),
+            )
+            for i in range(count)
+        ]
+        return path + path[:1]
+    if kind == "arc":
+        return _arc_points(point("start"), point("mid"), point("end"))
+    pts = [
+        (mm_to_iu(xy[1]), mm_to_iu(xy[2]))
+        for xy in find_child(node, "pts")[1:]
+        if isinstance(xy, list) and xy[0] == "xy"
+    ]
+    if kind == "curve" and len(pts) == 4:
+        (ax, ay), (bx, by), (cx, cy), (dx, dy) = pts
+        return [
+            (
+                (1 - t) ** 3 * ax
+                + 3 * (1 - t) ** 2 * t * bx
+                + 3 * (1 - t) * t**2 * cx
+                + t**3 * dx,
+                (1 - t) ** 3 * ay
+                + 3 * (1 - t) ** 2 * t * by
+                + 3 * (1 - t) * t**2 * cy
+                + t**3 * dy,
+            )
+            for t in (i / 16 for i in range(17))
+        ]
+    return pts + pts[:1]
+
+
+def _point_key(point):
+    """Round a point to 1um, so the ends of joined shapes compare equal."""
+    return (round(point[0] / 1000), round(point[1] / 1000))
+
+
+def _chain_loops(paths):
+    """Join paths end to end and return the closed loops, without repeats."""
+    ends = {}
+    for index, path in enumerate(paths):
+        for point in (path[0], path[-1]):
+            ends.setdefault(_point_key(point), []).append(index)
+    loops = []
+    used = set()
+    for index, path in enumerate(paths):
+        if index in used:
+            continue
+        used.add(index)
+        loop = list(path)
+        while loop and _point_key(loop[-1]) != _point_key(loop[0]):
+            joined = [i for i in ends.get(_point_key(loop[-1]), []) if i not in used]
+            if not joined:
+                loop = None
+                break
+            used.add(joined[0])
+            following = paths[joined[0]]
+            if _point_key(following[0]) != _point_key(loop[-1]):
+                following = following[::-1]
+            loop.extend(following[1:])
+        if loop and len(loop) > 3:
+            loops.append(loop[:-1])
+    return loops
+
+
+def _polygon_area(polygon):
+    """Return the area of a polygon."""
+    return abs(
+        sum(
+            x0 * y1 - x1 * y0
+            for (x0, y0), (x1, y1) in zip(polygon, polygon[1:] + polygon[:1])
+        )
+        / 2
+    )
+
+
+def sexpr_edge_outline(root):
+    """
+    Extract the board outline polygon from the Edge.Cuts shapes of a board.
+
+    Arcs and circles are split into chords. Returns (polygon, line_width),
+    with polygon the largest closed loop, or None if the outline isn't closed.
+    """
+    loops, line_width = sexpr_edge_loops(root)
+    if not loops:
+        return None, line_width
+    return max(loops, key=_polygon_area), line_width
+
+
+def sexpr_edge_loops(root):
+    """
+    Chain the Edge.Cuts shapes of a board into closed loops.
+
+    Arcs and circles are split into chords. Returns (loops, line_width), the
+    loops being the outline and any cutouts, in no particular order.
+    """
+    paths = []
+    line_width = 0
+
+    def add(node, offset=(0, 0), angle=0):
+        nonlocal line_width
+        line_width = max(line_width, _shape_extents(node)[1])
+        path = []
+        for px, py in _shape_path(node):
+            px, py = _rotate(px, py, angle)
+            path.append((offset[0] + px, offset[1] + py))
+        if len(path) > 1:
+            paths.append(path)
+
+    for node in root[1:]:
+        if not isinstance(node, list):
+            continue
+        if node[0] in _DRAWING_NODES and node[0].startswith("gr_"):
+            if node[0] not in ("gr_text", "gr_text_box") and _is_on_layer(
+                node, "Edge.Cuts"
+            ):
+                add(node)
+        elif node[0] in _FOOTPRINT_NODES:
+            at = find_child(node, "at")
+            offset = (mm_to_iu(at[1]), mm_to_iu(at[2]))
+            angle = float(at[3]) if len(at) > 3 else 0
+            for child in node[1:]:
+                if (
+                    isinstance(child, list)
+                    and child[0] in _FP_SHAPE_NODES
+                    and _is_on_layer(child, "Edge.Cuts")
+                ):
+                    add(["gr_" + child[0][3:]] + child[1:], offset, angle)
+
+    return _chain_loops(paths), line_width
+
+
+class OutlineIndex:
+    """
+    A board outline with its edges in a uniform grid, for clearance checks.
+
+    Each edge is filed under the cells its box grown by the clearance covers,
+    so checking another outline against it only measures the edges sharing
+    cells with the other outline's edges, instead of every pair of edges.
+    """
+
+    def __init__(self, polygon, clearance):
+        self.polygon = polygon
+        self.clearance = clearance
+        self.segments = [
+            (ax, ay, bx, by, min(ax, bx), min(ay, by), max(ax, bx), max(ay, by))
+            for (ax, ay), (bx, by) in zip(polygon, polygon[1:] + polygon[:1])
+        ]
+        xs = [x for x, _ in polygon]
+        ys = [y for _, y in polygon]
+        self.bbox = (min(xs), min(ys), max(xs), max(ys))
+        self.width = self.bbox[2] - self.bbox[0]
+        self.height = self.bbox[3] - self.bbox[1]
+        perimeter = sum(math.dist(a, b) for a, b in zip(polygon, polygon[1:]))
+        self.cell = max(clearance, perimeter / len(polygon), 1)
+        self.grid = {}
+        for index, (*_, left, top, right, bottom) in enumerate(self.segments):
+            for key in self._cells(
+                left - clearance, top - clearance, right + clearance, bottom + clearance
+            ):
+                self.grid.setdefault(key, []).append(index)
+
+    def _cells(self, left, top, right, bottom):
+        """Yield the grid cells a box covers."""
+        cell = self.cell
+        for cx in range(int(left // cell), int(right // cell) + 1):
+            for cy in range(int(top // cell), int(bottom // cell) + 1):
+                yield cx, cy
+
+    def contains(self, x, y):
+        """Check whether a point is inside the outline."""
+        inside = False
+        for ax, ay, bx, by, *_ in self.segments:
+            if (ay > y) != (by > y) and x < ax + (y - ay) * (bx - ax) / (by - ay):
+                inside = not inside
+        return inside
+
+    def clear(self, other, dx, dy):
+        """
+        Check that another outline moved by (dx, dy) keeps clear of this one.
+
+        Args:
+            other: OutlineIndex of the other board
+            dx: Horizontal offset of the other board
+            dy: Vertical offset of the other board
+        """
+        clearance = self.clearance
+        left = self.bbox[0] - clearance - dx
+        top = self.bbox[1] - clearance - dy
+        right = self.bbox[2] + clearance - dx
+        bottom = self.bbox[3] + clearance - dy
+        if (
+            other.bbox[0] >= right
+            or other.bbox[2] <= left
+            or other.bbox[1] >= bottom
+            or other.bbox[3] <= top
+        ):
+            return True
+
+        limit = clearance * clearance
+        segments = self.segments
+        grid = self.grid
+        cell = self.cell
+        for ax, ay, bx, by, edge_left, edge_top, edge_right, edge_bottom in (
+            other.segments
+        ):
+            if (
+                edge_left > right
+                or edge_right < left
+                or edge_top > bottom
+                or edge_bottom < top
+            ):
+                continue
+            ax += dx
+            ay += dy
+            bx += dx
+            by += dy
+            near_left = edge_left + dx - clearance
+            near_top = edge_top + dy - clearance
+            near_right = edge_right + dx + clearance
+            near_bottom = edge_bottom + dy + clearance
+            seen = set()
+            for cx in range(
+                int((edge_left + dx) // cell), int((edge_right + dx) // cell) + 1
+            ):
+                for cy in range(
+                    int((edge_top + dy) // cell), int((edge_bottom + dy) // cell) + 1
+                ):
+                    for index in grid.get((cx, cy), ()):
+                        if index in seen:
+                            continue
+                        seen.add(index)
+                        cx0, cy0, cx1, cy1, *box = segments[index]
+                        if (
+                            box[0] <= near_right
+                            and box[2] >= near_left
+                            and box[1] <= near_bottom
+                            and box[3] >= near_top
+                            and _segments_within(
+                                ax, ay, bx, by, cx0, cy0, cx1, cy1, limit
+                            )
+                        ):
+                            return False
+
+        # no edges are close, so the outlines are apart unless one holds the other
+        x, y = other.polygon[0]
+        if self.contains(x + dx, y + dy):
+            return False
+        x, y = self.polygon[0]
+        return not other.contains(x - dx, y - dy)
+
+
+def _point_segment_distance2(px, py, ax, ay, bx, by):
+    """Return the squared distance from a point to a segment."""
+    sx = bx - ax
+    sy = by - ay
+    length2 = sx * sx + sy * sy
+    if length2:
+        t = ((px - ax) * sx + (py - ay) * sy) / length2
+        if t >= 1:
+            ax, ay = bx, by
+        elif t > 0:
+            ax += t * sx
+            ay += t * sy
+    return (px - ax) ** 2 + (py - ay) ** 2
+
+
+def _segments_within(ax, ay, bx, by, cx, cy, ex, ey, limit):
+    """Check whether segments ab and ce cross or come within sqrt(limit)."""
+    d1 = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+    d2 = (bx - ax) * (ey - ay) - (by - ay) * (ex - ax)
+    d3 = (ex - cx) * (ay - cy) - (ey - cy) * (ax - cx)
+    d4 = (ex - cx) * (by - cy) - (ey - cy) * (bx - cx)
+    if (d1 > 0) != (d2 > 0) and (d3 > 0) != (d4 > 0):
+        return True
+    return (
+        _point_segment_distance2(ax, ay, cx, cy, ex, ey) < limit
+        or _point_segment_distance2(bx, by, cx, cy, ex, ey) < limit
+        or _point_segment_distance2(cx, cy, ax, ay, bx, by) < limit
+        or _point_segment_distance2(ex, ey, ax, ay, bx, by) < limit
+    )
+
+
+def _first_clear(clear, low, high, step):
+    """
+    Return about the smallest value from low up to high for which clear() holds.
+
+    The range is scanned in steps and the first clear step is refined to
+    NEST_RESOLUTION. high is taken to be clear.
+    """
+    blocked = None
+    value = low
+    while value < high and not clear(value):
+        blocked = value
+        value += step
+    value = min(value, high)
+    if blocked is None:
+        return value
+    while value - blocked > NEST_RESOLUTION:
+        middle = (blocked + value) // 2
+        if clear(middle):
+            value = middle
+        else:
+            blocked = middle
+    return value
+
+
+def _lattice_clear(shapes, motif, ux, vx, vy, first_row=0):
+    """
+    Check that the boards of a lattice keep clear of each other.
+
+    Only pairs of boards close enough to touch are checked, and each pair
+    once. With vy of 0 only the boards of one row are checked.
+    """
+    reach_x = shapes[0].width + shapes[0].clearance
+    reach_y = shapes[0].height + shapes[0].clearance
+    span = max(ty for _, ty, _ in motif) - min(ty for _, ty, _ in motif)
+    row = first_row
+    while row == 0 or (vy and row * vy < reach_y + span):
+        for first, (ax, ay, a_angle) in enumerate(motif):
+            for second, (bx, by, b_angle) in enumerate(motif):
+                base = bx - ax + row * vx
+                dy = by - ay + row * vy
+                if abs(dy) >= reach_y:
+                    continue
+                for k in range(
+                    math.ceil((-reach_x - base) / ux),
+                    math.floor((reach_x - base) / ux) + 1,
+                ):
+                    if row == 0 and (k < 0 or (k == 0 and second <= first)):
+                        continue
+                    if not shapes[a_angle].clear(shapes[b_angle], base + k * ux, dy):
+                        return False
+        if not vy:
+            break
+        row += 1
+    return True
+
+
+def nest_lattices(shapes, rotate, transposed=False):
+    """
+    Search the lattices the outline packs into, each at its tightest pitches.
+
+    Rows of the board alone and, with rotate, of pairs of the board and the
+    board turned 180 degrees are tried, each with the rows staggered by
+    NEST_STAGGERS of the row pitch.
+
+    Args:
+        shapes: OutlineIndex of the board as drawn (0) and turned 180 degrees
+        rotate: Also try pairs of alternating boards
+        transposed: Whether the outline was transposed, to make columns
+    """
+    width = shapes[0].width
+    height = shapes[0].height
+    clearance = shapes[0].clearance
+    step = max(NEST_RESOLUTION, max(width, height) // NEST_STEPS)
+    motifs = [((0, 0, 0),)]
+    if rotate:
+        for drop in NEST_PAIR_DROPS:
+            ty = drop * height // 4
+            tx = _first_clear(
+                lambda tx: shapes[0].clear(shapes[180], tx, ty),
+                0,
+                width + clearance,
+                step,
+            )
+            motifs.append(((0, 0, 0), (tx, ty, 180)))
+
+    lattices = []
+    for motif in motifs:
+        tx = motif[-1][0]
+        drop = max(abs(ty) for _, ty, _ in motif)
+        ux = _first_clear(
+            lambda ux: _lattice_clear(shapes, motif, ux, 0, 0),
+            step,
+            tx + width + clearance,
+            step,
+        )
+        for stagger in NEST_STAGGERS:
+            vx = round(ux * stagger)
+            vy = _first_clear(
+                lambda vy: _lattice_clear(shapes, motif, ux, vx, vy, 1),
+                step,
+                height + drop + clearance,
+                step,
+            )
+            lattices.append(Lattice(motif, ux, vx, vy, transposed))
+    return lattices
+
+
+def lattice_boards(lattice, columns, rows):
+    """
+    Return the (column, row, dx, dy, angle) of a block of boards of a lattice.
+
+    A transposed lattice's rows run down the panel, so its columns and rows
+    and its offsets are swapped back.
+    """
+    motif, ux, vx, vy, transposed = lattice
+    boards = []
+    for row in range(rows):
+        shift = (row * vx) % ux
+        for column in range(columns):
+            tx, ty, angle = motif[column % len(motif)]
+            dx = column // len(motif) * ux + tx + shift
+            dy = row * vy + ty
+            if transposed:
+                boards.append((row, column, dy, dx, angle))
+            else:
+                boards.append((column, row, dx, dy, angle))
+    return boards
+
+
+def _block_size(lattice, columns, rows, board_width, board_height, shifts):
+    """Return the (width, height) of a block of boards along the lattice rows."""
+    motif, ux, _, vy, _ = lattice
+    size = len(motif)
+    xs = [
+        i // size * ux + motif[i % size][0]
+        for i in itertools.chain(range(min(columns, size)), range(columns)[-size:])
+    ]
+    ys = [ty for _, ty, _ in motif[:columns]]
+    return (
+        max(xs) - min(xs) + shifts[rows - 1] + board_width,
+        (rows - 1) * vy + max(ys) - min(ys) + board_height,
+    )
+
+
+def best_block(args, lattice, board_width, board_height):
+    """
+    Return the (boards, area, columns, rows) of the best block of a lattice.
+
+    With --panelx/--panely that is the most boards fitting between the rails,
+    the smallest first, otherwise --numx by --numy boards. Sizes are of the
+    board Edge.Cuts bounding boxes and of the block along the lattice rows.
+    """
+    if lattice.transposed:
+        board_width, board_height = board_height, board_width
+
+    def shifts(count):
+        # widest row shift of the first rows
+        widest = [0]
+        for row in range(1, count):
+            widest.append(max(widest[-1], (row * lattice.vx) % lattice.ux))
+        return widest
+
+    if not args.panelx:
+        columns, rows = args.numx, args.numy
+        if lattice.transposed:
+            columns, rows = rows, columns
+        width, height = _block_size(
+            lattice, columns, rows, board_width, board_height, shifts(rows)
+        )
+        return columns * rows, width * height, columns, rows
+
+    limit_x = (args.panelx - 2 * args.hrail - args.padding) * SCALE
+    limit_y = (args.panely - 2 * args.vrail - args.padding) * SCALE
+    if lattice.transposed:
+        limit_x, limit_y = limit_y, limit_x
+    motif_height = max(ty for _, ty, _ in lattice.motif) - min(
+        ty for _, ty, _ in lattice.motif
+    )
+    most_rows = max(1, int((limit_y - board_height - motif_height) // lattice.vy) + 1)
+    widest = shifts(most_rows)
+    best = (0, 0, 0, 0)
+    columns = 1
+    while True:
+        width, _ = _block_size(
+            lattice, columns, 1, board_width, board_height, widest
+        )
+        if width > limit_x:
+            break
+        for rows in range(most_rows, 0, -1):
+            width, height = _block_size(
+                lattice, columns, rows, board_width, board_height, widest
+            )
+            if width <= limit_x and height <= limit_y:
+                if (columns * rows, -width * height) > (best[0], -best[1]):
+                    best = (columns * rows, width * height, columns, rows)
+                break
+        columns += 1
+    return best
+
+
+def describe_lattice(lattice):
+    """Describe the arrangement of a lattice."""
+    lines = "columns" if lattice.transposed else "rows"
+    parts = ["alternating 180 degrees" if len(lattice.motif) > 1 else "as drawn"]
+    if lattice.vx:
+        parts.append(f"{lines} staggered by {lattice.vx / SCALE:g}mm")
+    else:
+        parts.append(f"in {lines}")
+    return ", ".join(parts)
+
+
+def nest_panel(args, bbox, root, rotate=True, report=True):
+    """
+    Lay out the panel by nesting the board outlines, for --nest.
+
+    The Edge.Cuts polygon is extracted once and the lattices it packs into
+    are searched with clearance checks between the outlines. The nested plan
+    is returned if it fits more boards, or the same boards in less area, than
+    the bounding box grid, otherwise the grid plan.
+
+    Args:
+        args: Parsed arguments
+        bbox: Edge.Cuts bounding box (left, top, right, bottom)
+        root: The parsed source board
+        rotate: Also try boards turned 180 degrees
+        report: Print the utilization of the nested and grid panels
+    """
+    start = time.perf_counter()
+    grid = plan_panel(args, bbox)
+    polygon, line_width = sexpr_edge_outline(root)
+    if polygon is None:
+        if report:
+            print("Warning: the board outline isn't closed, so it can't be nested")
+        return grid
+
+    # the bounding box holds half the line width, so the lines' centres are a
+    # line width further apart than the boxes, as on the grid
+    clearance = args.padding * SCALE + line_width + NEST_ARC_ERROR
+    pivot = grid.pivot
+    left, top, right, bottom = bbox
+    board_width = right - left
+    board_height = bottom - top
+    best = None
+    for transposed in (False, True):
+        points = [(y, x) if transposed else (x, y) for x, y in polygon]
+        cx, cy = (pivot.y, pivot.x) if transposed else pivot
+        shapes = {
+            0: OutlineIndex(points, clearance),
+            180: OutlineIndex([(2 * cx - x, 2 * cy - y) for x, y in points], clearance),
+        }
+        for lattice in nest_lattices(shapes, rotate, transposed):
+            boards, area, columns, rows = best_block(
+                args, lattice, board_width, board_height
+            )
+            if boards and (best is None or (boards, -area) > (best[0], -best[1])):
+                best = (boards, area, lattice, columns, rows)
+
+    def utilization(plan):
+        board_area = _polygon_area(polygon) * plan.num_x * plan.num_y
+        return 100 * board_area / plan.panel_width / plan.panel_height
+
+    grid_boards = grid.num_x * grid.num_y
+    if best is None or (best[0], -best[1]) <= (
+        grid_boards,
+        -grid.array_width * grid.array_height,
+    ):
+        if report:
+            print(
+                f"Nesting doesn't beat the bounding box grid ({grid_boards} boards, "
+                f"{utilization(grid):.1f}% of the panel is board), keeping the grid"
+            )
+        return grid
+
+    _, _, lattice, columns, rows = best
+    boards = lattice_boards(lattice, columns, rows)
+    min_dx = min(dx for _, _, dx, _, _ in boards)
+    min_dy = min(dy for _, _, _, dy, _ in boards)
+    array_width = max(dx for _, _, dx, _, _ in boards) - min_dx + board_width
+    array_height = max(dy for _, _, _, dy, _ in boards) - min_dy + board_height
+    array_center = Point(
+        left + min_dx + array_width // 2, top + min_dy + array_height // 2
+    )
+    outline, panel_width, panel_height = panel_extent(
+        args, array_center, array_width, array_height
+    )
+    plan = grid._replace(
+        num_x=max(x for x, _, _, _, _ in boards) + 1,
+        num_y=max(y for _, y, _, _, _ in boards) + 1,
+        array_center=array_center,
+        array_width=array_width,
+        array_height=array_height,
+        outline=outline,
+        panel_width=panel_width,
+        panel_height=panel_height,
+        copies=[
+            CopyTransform(*board, False) for board in boards if board[0] or board[1]
+        ],
+        nested=True,
+    )
+    if report:
+        print(
+            f"Nested {best[0]} boards ({describe_lattice(lattice)}): "
+            f"{utilization(plan):.1f}% of the panel is board, against "
+            f"{grid_boards} boards and {utilization(grid):.1f}% on the bounding "
+            f"box grid, in {time.perf_counter() - start:.2f}s"
+        )
+    return plan
+
+
+# Packing: puts several designs on one panel with guillotine cuts, so every
+# board comes off along straight v-scores
+
+# orders to place the boards in, biggest first by each measure
+PACK_ORDERS = (
+    lambda width, height: -width * height,
+    lambda width, height: -max(width, height),
+    lambda width, height: -height,
+    lambda width, height: -width,
+)
+
+# free rectangles a board goes into, tightest first: best short side and best
+# area fit, given the free (w, h) and the board's (width, height)
+PACK_FITS = (
+    lambda w, h, width, height: sorted((w - width, h - height)),
+    lambda w, h, width, height: (w * h - width * height, min(w - width, h - height)),
+)
+
+# whether the first cut runs across the whole free rectangle under the board
+# (rather than down it, beside the board): across the shorter or the longer
+# leftover, or leaving the largest or the smallest free rectangle
+PACK_SPLITS = (
+    lambda w, h, width, height: w - width <= h - height,
+    lambda w, h, width, height: w - width > h - height,
+    lambda w, h, width, height: width * (h - height) <= (w - width) * height,
+    lambda w, h, width, height: width * (h - height) > (w - width) * height,
+)
+
+
+def design_list(args):
+    """
+    Return the (path, quantity) of every design on the panel.
+
+    The board being panelized comes first with --quantity boards, then the
+    comma separated PATH[:COUNT] entries of --designs, one board if no count.
+    Returns None if --designs isn't a valid list.
+    """
+    designs = [(args.sourceBoardFile, args.quantity)]
+    for entry in (args.designs or "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        path, _, count = entry.rpartition(":")
+        if not count.isdigit():
+            path, count = entry, "1"
+        if not path.endswith(".kicad_pcb") or int(count) < 1:
+            return None
+        designs.append((path, int(count)))
+    return designs
+
+
+def guillotine_pack(sizes, bin_width, bin_height, fit, split):
+    """
+    Place rectangles in a bin, cutting the free space with guillotine cuts.
+
+    Each rectangle goes at the top left corner of the free rectangle that fit
+    ranks tightest, and the rest of that free rectangle is cut in two, first
+    across or down it as split decides. Every cut runs edge to edge of the
+    piece it divides, so the pieces come apart one straight cut at a time.
+
+    Args:
+        sizes: (width, height) of each rectangle, in the order to place them
+        bin_width: Width of the bin
+        bin_height: Height of the bin
+        fit: One of PACK_FITS
+        split: One of PACK_SPLITS
+
+    Returns (positions, cuts) where positions has the (x, y) of each rectangle
+    or None if it didn't fit, and cuts are (vertical, position, start, end).
+    """
+    free = [(0, 0, bin_width, bin_height)]
+    positions = []
+    cuts = []
+    for width, height in sizes:
+        best = None
+        for index, (_, _, w, h) in enumerate(free):
+            if width <= w and height <= h:
+                rank = fit(w, h, width, height)
+                if best is None or rank < best[0]:
+                    best = (rank, index)
+        if best is None:
+            positions.append(None)
+            continue
+        x, y, w, h = free.pop(best[1])
+        positions.append((x, y))
+        right = w - width
+        below = h - height
+        if split(w, h, width, height):
+            if below:
+                cuts.append((False, y + height, x, x + w))
+                free.append((x, y + height, w, below))
+            if right:
+                cuts.append((True, x + width, y, y + height))
+                free.append((x + width, y, right, height))
+        else:
+            if right:
+                cuts.append((True, x + width, y, y + h))
+                free.append((x + width, y, right, h))
+            if below:
+                cuts.append((False, y + height, x, x + width))
+                free.append((x, y + height, width, below))
+    return positions, cuts
+
+
+def _trim_cuts(cuts, width, height):
+    """Clip cuts to the used width by height of the bin and join those that meet."""
+    spans = {}
+    for vertical, position, start, end in cuts:
+        limit, length = (width, height) if vertical else (height, width)
+        end = min(end, length)
+        if 0 < position < limit and start < end:
+            spans.setdefault((vertical, position), []).append((start, end))
+    trimmed = []
+    for (vertical, position), line in sorted(
+        spans.items(), key=lambda item: (not item[0][0], item[0][1])
+    ):
+        line.sort()
+        start, end = line[0]
+        for next_start, next_end in line[1:]:
+            if next_start > end:
+                trimmed.append((vertical, position, start, end))
+                start = next_start
+            end = max(end, next_end)
+        trimmed.append((vertical, position, start, end))
+    return trimmed
+
+
+def pack_designs(args, bboxes, designs, report=True):
+    """
+    Lay out several designs on a --panelx/--panely panel.
+
+    The boards are packed with guillotine_pack() in every order, fit and cut
+    rule of PACK_ORDERS, PACK_FITS and PACK_SPLITS, keeping the layout with
+    the most boards and then the smallest area. v-scores go only along its
+    cuts, and along the rails. The first board of the first design stays
+    where it is and the panel shrinks to the boards that fit.
+
+    Args:
+        args: Parsed arguments
+        bboxes: (left, top, right, bottom) of each design's Edge.Cuts
+        designs: (path, quantity) of each design, from design_list()
+        report: Print what was packed
+    """
+    start = time.perf_counter()
+    padding = args.padding * SCALE
+    bin_width = (args.panelx - 2 * args.hrail) * SCALE
+    bin_height = (args.panely - 2 * args.vrail) * SCALE
+    sizes = [
+        (right - left + padding, bottom - top + padding)
+        for left, top, right, bottom in bboxes
+    ]
+    boards = [
+        (design, sizes[design])
+        for design, (_, quantity) in enumerate(designs)
+        for _ in range(quantity)
+    ]
+
+    best = None
+    for order in PACK_ORDERS:
+        ordered = sorted(boards, key=lambda board: order(*board[1]))
+        for fit in PACK_FITS:
+            for split in PACK_SPLITS:
+                positions, cuts = guillotine_pack(
+                    [size for _, size in ordered], bin_width, bin_height, fit, split
+                )
+                placed = [
+                    (design, position)
+                    for (design, _), position in zip(ordered, positions)
+                    if position
+                ]
+                if not any(design == 0 for design, _ in placed):
+                    continue
+                used_width = max(x + sizes[design][0] for design, (x, _) in placed)
+                used_height = max(y + sizes[design][1] for design, (_, y) in placed)
+                score = (len(placed), -used_width * used_height)
+                if best is None or score > best[0]:
+                    best = (score, placed, cuts, used_width, used_height)
+
+    if best is None:
+        print("Panel size is too small for board. Quitting.")
+        sys.exit(1)
+    _, placed, cuts, used_width, used_height = best
+
+    # each design's boards in reading order, the first is its source
+    cells = [
+        sorted((y, x) for design, (x, y) in placed if design == number)
+        for number in range(len(designs))
+    ]
+    left, top, right, bottom = bboxes[0]
+    pivot = Point((left + right) // 2, (top + bottom) // 2)
+    origin_x = left - padding // 2 - cells[0][0][1]
+    origin_y = top - padding // 2 - cells[0][0][0]
+
+    def copies(design_cells):
+        (first_y, first_x), *rest = design_cells
+        return [
+            CopyTransform(number, 0, x - first_x, y - first_y, 0, False)
+            for number, (y, x) in enumerate(rest, 1)
+        ]
+
+    others = []
+    for (path, _), (left, top, _, _), design_cells in zip(
+        designs[1:], bboxes[1:], cells[1:]
+    ):
+        if design_cells:
+            y, x = design_cells[0]
+            offset = Point(
+                origin_x + x + padding // 2 - left, origin_y + y + padding // 2 - top
+            )
+            others.append(DesignCopies(path, offset, copies(design_cells)))
+
+    # v-scores along the cuts, open ends run out through the rails
+    lines = []
+    if args.hrail:
+        lines += [(True, x, None, None) for x in (origin_x, origin_x + used_width)]
+    if args.vrail:
+        lines += [(False, y, None, None) for y in (origin_y, origin_y + used_height)]
+    for vertical, position, low, high in _trim_cuts(cuts, used_width, used_height):
+        base, across, length = (
+            (origin_x, origin_y, used_height)
+            if vertical
+            else (origin_y, origin_x, used_width)
+        )
+        lines.append(
+            (
+                vertical,
+                base + position,
+                None if low == 0 else across + low,
+                None if high == length else across + high,
+            )
+        )
+    lines.sort(key=lambda line: (not line[0], line[1], line[2] is not None, line[2]))
+
+    array_width = used_width - padding
+    array_height = used_height - padding
+    array_center = Point(origin_x + used_width // 2, origin_y + used_height // 2)
+    outline, panel_width, panel_height = panel_extent(
+        args, array_center, array_width, array_height
+    )
+    board_width, board_height = sizes[0]
+    plan = PanelPlan(
+        len(placed),
+        1,
+        board_width,
+        board_height,
+        array_center,
+        array_width,
+        array_height,
+        outline,
+        panel_width,
+        panel_height,
+        pivot,
+        copies(cells[0]),
+        False,
+        lines,
+        others,
+    )
+
+    if report:
+        packed = ", ".join(
+            f"{len(design_cells)} x {os.path.basename(path)}"
+            for (path, _), design_cells in zip(designs, cells)
+        )
+        print(
+            f"Packed {packed} with {len(lines)} v-scores, "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+        for (path, quantity), design_cells in zip(designs, cells):
+            if len(design_cells) < quantity:
+                print(
+                    f"Warning: only {len(design_cells)} of {quantity} "
+                    f"{os.path.basename(path)} boards fit on the panel"
+                )
+    return plan
+
+
+# Tabs: holds the boards in by tabs with mouse-bite holes and routes out the
+# gaps round their outlines, for boards that can't be v-scored apart
+
+TAB_DRILL = 0.5  # mouse-bite hole diameter in mm
+TAB_HOLE_PITCH = 0.8  # centre to centre spacing of the holes in mm
+TAB_CLEARANCE = 1  # room in mm kept between the holes and copper or courtyards
+TAB_MAX_BEND = 30  # degrees the outline may turn within a tab
+TAB_REACH = 2  # tabs bridge gaps of up to this many times the padding
+TAB_INDEX_CELL = 5 * SCALE  # cell size of the keepout and outline grids
+TAB_RAY_START = 1000  # rays ignore the outline they start on for 1um
+
+
+class BoxIndex:
+    """
+    Boxes filed in a uniform grid, to find those overlapping an area quickly.
+
+    Each box is filed under the cells it covers, so a query only compares
+    the boxes sharing cells with it, however many boxes there are.
+    """
+
+    def __init__(self, boxes, cell=TAB_INDEX_CELL):
+        self.boxes = boxes
+        self.cell = cell
+        self.grid = {}
+        for index, box in enumerate(boxes):
+            for key in self._cells(*box):
+                self.grid.setdefault(key, []).append(index)
+
+    def _cells(self, left, top, right, bottom):
+        """Yield the grid cells a box covers."""
+        cell = self.cell
+        for cx in range(int(left // cell), int(right // cell) + 1):
+            for cy in range(int(top // cell), int(bottom // cell) + 1):
+                yield cx, cy
+
+    def query(self, left, top, right, bottom):
+        """Yield the index of every box overlapping the given one, once."""
+        boxes = self.boxes
+        seen = set()
+        for key in self._cells(left, top, right, bottom):
+            for index in self.grid.get(key, ()):
+                if index in seen:
+                    continue
+                seen.add(index)
+                box = boxes[index]
+                if (
+                    box[0] <= right
+                    and box[2] >= left
+                    and box[1] <= bottom
+                    and box[3] >= top
+                ):
+                    yield index
+
+    def clear(self, x, y, radius):
+        """Check that no box comes within radius of a point."""
+        for _ in self.query(x - radius, y - radius, x + radius, y + radius):
+            return False
+        return True
+
+
+def sexpr_keepouts(root):
+    """
+    Return the boxes (left, top, right, bottom) that tab holes keep clear of.
+
+    These bound the copper tracks, vias, pads and graphics and the footprint
+    courtyards of a parsed board. Zones are left out, their fills keep clear
+    of the holes once refilled.
+    """
+    boxes = []
+
+    def add(points, width=0, offset=(0, 0), angle=0):
+        half = width / 2
+        xs = []
+        ys = []
+        for px, py in points:
+            px, py = _rotate(px, py, angle)
+            xs.append(offset[0] + px)
+            ys.append(offset[1] + py)
+        boxes.append((min(xs) - half, min(ys) - half, max(xs) + half, max(ys) + half))
+
+    def point(node, name):
+        child = find_child(node, name)
+        return (mm_to_iu(child[1]), mm_to_iu(child[2]))
+
+    def on_copper(node):
+        layer = find_child(node, "layer")
+        return layer is not None and unquote(layer[1]).endswith(".Cu")
+
+    for node in root[1:]:
+        if not isinstance(node, list):
+            continue
+        if node[0] in ("segment", "arc"):
+            points = [point(node, "start"), point(node, "end")]
+            if node[0] == "arc":
+                points = _arc_extents(points[0], point(node, "mid"), points[1])
+            width = find_child(node, "width")
+            add(points, mm_to_iu(width[1]) if width else 0)
+        elif node[0] == "via":
+            size = find_child(node, "size")
+            add([point(node, "at")], mm_to_iu(size[1]) if size else 0)
+        elif node[0] in _DRAWING_NODES and node[0].startswith("gr_"):
+            if node[0] not in ("gr_text", "gr_text_box") and on_copper(node):
+                add(*_shape_extents(node))
+        elif node[0] in _FOOTPRINT_NODES:
+            at = find_child(node, "at")
+            offset = (mm_to_iu(at[1]), mm_to_iu(at[2]))
+            angle = float(at[3]) if len(at) > 3 else 0
+            for child in node[1:]:
+                if not isinstance(child, list):
+                    continue
+                if child[0] == "pad":
+                    # the circle through the pad's corners bounds it at any angle
+                    size = find_child(child, "size")
+                    diameter = math.hypot(mm_to_iu(size[1]), mm_to_iu(size[2]))
+                    add([point(child, "at")], diameter, offset, angle)
+                elif child[0] in _FP_SHAPE_NODES and (
+                    on_copper(child)
+                    or _is_on_layer(child, "F.CrtYd")
+                    or _is_on_layer(child, "B.CrtYd")
+                ):
+                    child = ["gr_" + child[0][3:]] + child[1:]
+                    add(*_shape_extents(child), offset=offset, angle=angle)
+    return boxes
+
+
+def copy_point(copy, pivot, x, y):
+    """
+    Return where a point of the source board lands on a copy.
+
+    Args:
+        copy: CopyTransform of the copy
+        pivot: Point the copy is flipped and turned about
+        x: Horizontal position on the source board
+        y: Vertical position on the source board
+    """
+    if copy.flip:
+        x = 2 * pivot.x - x
+    if copy.angle:
+        x, y = _rotate(x - pivot.x, y - pivot.y, copy.angle)
+        x, y = pivot.x + x, pivot.y + y
+    return x + copy.dx, y + copy.dy
+
+
+def source_point(copy, pivot, x, y):
+    """Return the point of the source board that lands on (x, y) of a copy."""
+    x, y = x - copy.dx, y - copy.dy
+    if copy.angle:
+        x, y = _rotate(x - pivot.x, y - pivot.y, -copy.angle)
+        x, y = pivot.x + x, pivot.y + y
+    if copy.flip:
+        x = 2 * pivot.x - x
+    return x, y
+
+
+def _path_lengths(points, closed):
+    """Return the distance along a path to each of its points, and its end."""
+    lengths = [0]
+    ends = points[1:] + points[:1] if closed else points[1:]
+    for a, b in zip(points, ends):
+        lengths.append(lengths[-1] + math.dist(a, b))
+    return lengths
+
+
+def _point_along(points, lengths, distance):
+    """Return the point a distance along a path from _path_lengths()."""
+    index = min(max(bisect.bisect_right(lengths, distance) - 1, 0), len(lengths) - 2)
+    (ax, ay), (bx, by) = points[index], points[(index + 1) % len(points)]
+    span = lengths[index + 1] - lengths[index]
+    share = (distance - lengths[index]) / span if span else 0
+    return ax + (bx - ax) * share, ay + (by - ay) * share
+
+
+def _hole_row(start, end):
+    """Return the mouse-bite holes along a line, centred on it."""
+    length = math.dist(start, end)
+    pitch = TAB_HOLE_PITCH * SCALE
+    count = max(1, int((length - TAB_DRILL * SCALE) // pitch) + 1)
+    (ax, ay), (bx, by) = start, end
+    holes = []
+    for number in range(count):
+        share = 0.5
+        if length:
+            share += (number - (count - 1) / 2) * pitch / length
+        holes.append((round(ax + (bx - ax) * share), round(ay + (by - ay) * share)))
+    return holes
+
+
+def outline_tab(outline, keepouts, low, width):
+    """
+    Return the Tab of a width from a distance along a TabOutline.
+
+    Returns None if the outline bends round too much within the tab or its
+    holes come near a keepout.
+
+    Args:
+        outline: TabOutline of the source board
+        keepouts: BoxIndex of the source keepouts
+        low: Distance along the outline to the start of the tab
+        width: Tab width in internal units
+    """
+    points, lengths, bends, sign = outline
+    high = low + width
+    first = bisect.bisect_right(lengths, low)
+    last = bisect.bisect_left(lengths, high)
+    if sum(bends[first:last]) > TAB_MAX_BEND:
+        return None
+    start = _point_along(points, lengths, low)
+    end = _point_along(points, lengths, high)
+    holes = _hole_row(start, end)
+    radius = (TAB_DRILL / 2 + TAB_CLEARANCE) * SCALE
+    if not all(keepouts.clear(x, y, radius) for x, y in holes):
+        return None
+    dx, dy = end[0] - start[0], end[1] - start[1]
+    length = math.hypot(dx, dy)
+    normal = (sign * dy / length, -sign * dx / length)
+    middle = _point_along(points, lengths, low + width / 2)
+    return Tab(low, high, start, middle, end, normal, holes)
+
+
+def tab_slots(polygon, keepouts, pitch, width):
+    """
+    Find where tabs can go along a board outline, clear of the keepouts.
+
+    The outline is split into sides at its corners and each side into slots
+    of about the pitch, one tab to a slot. The places in a slot are tried
+    from its middle out in quarter tab widths, leaving out those that bend
+    round too much of the outline or have holes near a keepout. Returns the
+    slots, each the list of its clear tabs best first, and the TabOutline,
+    started at a corner.
+
+    Args:
+        polygon: Outline of the source board
+        keepouts: BoxIndex of the source keepouts
+        pitch: Distance between tabs in internal units
+        width: Tab width in internal units
+    """
+    points = [p for p, q in zip(polygon, polygon[1:] + polygon[:1]) if p != q]
+    count = len(points)
+    bends = []
+    for index, (bx, by) in enumerate(points):
+        ax, ay = points[index - 1]
+        cx, cy = points[(index + 1) % count]
+        cross = (bx - ax) * (cy - by) - (by - ay) * (cx - bx)
+        dot = (bx - ax) * (cx - bx) + (by - ay) * (cy - by)
+        bends.append(abs(math.degrees(math.atan2(cross, dot))))
+
+    # start at a corner, so no side runs round the end of the outline
+    corners = [index for index, bend in enumerate(bends) if bend > TAB_MAX_BEND]
+    if corners:
+        first = corners[0]
+        points = points[first:] + points[:first]
+        bends = bends[first:] + bends[:first]
+    lengths = _path_lengths(points, True)
+    corners = [
+        lengths[index] for index, bend in enumerate(bends) if bend > TAB_MAX_BEND
+    ]
+    sides = list(zip([0] + corners[1:], corners[1:] + [lengths[-1]]))
+
+    # the outward normal of a chord (dx, dy) is (dy, -dx) if the outline runs
+    # counter-clockwise by the numbers, with y down
+    area = sum(
+        x0 * y1 - x1 * y0
+        for (x0, y0), (x1, y1) in zip(points, points[1:] + points[:1])
+    )
+    outline = TabOutline(points, lengths, bends, 1 if area > 0 else -1)
+
+    slots = []
+    slide = width / 4
+    for side_start, side_end in sides:
+        length = side_end - side_start
+        if length < width:
+            continue
+        spacing = length / max(1, round(length / pitch))
+        for number in range(round(length / spacing)):
+            low = side_start + (number + 0.5) * spacing - width / 2
+            reach = min((spacing - width) / 2, low - side_start)
+            shifts = [0]
+            for step in range(1, int(reach // slide) + 1):
+                shifts += [step * slide, -step * slide]
+            slot = [
+                outline_tab(outline, keepouts, low + shift, width) for shift in shifts
+            ]
+            slot = [tab for tab in slot if tab is not None]
+            if slot:
+                slots.append(slot)
+    return slots, outline
+
+
+def _ray_hit(px, py, nx, ny, ax, ay, bx, by):
+    """Return (distance, share) where a ray meets a segment, or None."""
+    ex, ey = bx - ax, by - ay
+    denominator = nx * ey - ny * ex
+    if not denominator:
+        return None
+    wx, wy = ax - px, ay - py
+    distance = (wx * ey - wy * ex) / denominator
+    share = (wx * ny - wy * nx) / denominator
+    if distance < TAB_RAY_START or not 0 <= share <= 1:
+        return None
+    return distance, share
+
+
+def _overlaps(cuts, low, high, margin):
+    """Check whether an interval comes within margin of any cut interval."""
+    return any(
+        low - margin < cut_high and high + margin > cut_low
+        for cut_low, cut_high in cuts
+    )
+
+
+def _path_pieces(points, closed, cuts):
+    """Return the lines of a path, leaving out the cut intervals."""
+    lengths = _path_lengths(points, closed)
+    ends = points[1:] + points[:1] if closed else points[1:]
+    cuts = sorted(cuts)
+    lines = []
+    for index, (a, b) in enumerate(zip(points, ends)):
+        low, high = lengths[index], lengths[index + 1]
+        if high <= low:
+            continue
+        pieces = [(low, high)]
+        for cut_low, cut_high in cuts:
+            if cut_low >= high or cut_high <= low:
+                continue
+            pieces = [
+                piece
+                for piece_low, piece_high in pieces
+                for piece in (
+                    (piece_low, min(piece_high, cut_low)),
+                    (max(piece_low, cut_high), piece_high),
+                )
+                if piece[1] > piece[0]
+            ]
+        for piece_low, piece_high in pieces:
+            start = _point_along(points, lengths, piece_low)
+            end = _point_along(points, lengths, piece_high)
+            if piece_low == low:
+                start = a
+            if piece_high == high:
+                end = b
+            lines.append(tuple(round(value) for value in (*start, *end)))
+    return lines
+
+
+def tab_frame_edges(outline, h_rail_width, v_rail_width):
+    """
+    Return the lines round the rails of a panel with tabs.
+
+    The boards sit in a window inside the rails that is routed out, so the
+    rails are outlined inside and out. On a side without a rail the window
+    and panel edges cancel out, and the boards' own outlines are the panel
+    edge there.
+    """
+    left, right, top, bottom = outline
+    window = (
+        left + h_rail_width * SCALE,
+        right - h_rail_width * SCALE,
+        top + v_rail_width * SCALE,
+        bottom - v_rail_width * SCALE,
+    )
+
+    # where edges on the same line overlap, an even number of them cancel
+    spans = {}
+    edges = outline_edges(*outline) + outline_edges(*window)
+    for start_x, start_y, end_x, end_y in edges:
+        if start_x == end_x:
+            spans.setdefault((True, start_x), []).extend((start_y, end_y))
+        else:
+            spans.setdefault((False, start_y), []).extend((start_x, end_x))
+    lines = []
+    for (vertical, position), ends in spans.items():
+        ends.sort()
+        for low, high in zip(ends[::2], ends[1::2]):
+            if high > low:
+                if vertical:
+                    lines.append((position, low, position, high))
+                else:
+                    lines.append((low, position, high, position))
+    return lines
+
+
+def tab_layout(args, plan, root, report=True):
+    """
+    Lay out the Edge.Cuts lines and mouse-bite holes of a panel with tabs.
+
+    The places tabs can go are found once on the source outline, clear of
+    the keepouts in a BoxIndex of the source, and every copy reuses them.
+    Each slot of a copy gets the first of its tabs whose edges reach another
+    board or a rail across the gap, with the holes on that side clear of the
+    board there too, checked against the same index. A board the slots leave
+    with fewer than two tabs also tries tabs where each neighbour comes
+    closest, and if it is still short the panel isn't made, as the board
+    would fall out. Returns (lines, bites): the outline lines and the holes
+    of each row of mouse-bites, with the row's centre.
+
+    Args:
+        args: Parsed arguments
+        plan: PanelPlan of the panel
+        root: The parsed source board
+        report: Print the number of tabs and holes
+    """
+    start_time = time.perf_counter()
+    loops, line_width = sexpr_edge_loops(root)
+    if not loops:
+        print("The board outline isn't closed, so it can't be tabbed. Quitting.")
+        sys.exit(1)
+    outline = max(loops, key=_polygon_area)
+    cutouts = [loop for loop in loops if loop is not outline]
+    keepouts = BoxIndex(sexpr_keepouts(root))
+    width = args.tabwidth * SCALE
+    slots, source = tab_slots(outline, keepouts, args.tabs * SCALE, width)
+    outline = source.points
+    reach = TAB_REACH * args.padding * SCALE + line_width
+    pivot = plan.pivot
+
+    # the rails and every copy's outline, with the cuts the tabs make in them
+    boards = [CopyTransform(0, 0, 0, 0, 0, False)] + list(plan.copies)
+    paths = [
+        ([(x0, y0), (x1, y1)], False, None)
+        for x0, y0, x1, y1 in tab_frame_edges(plan.outline, args.hrail, args.vrail)
+    ]
+    for number, board in enumerate(boards):
+        points = [copy_point(board, pivot, x, y) for x, y in outline]
+        paths.append((points, True, number))
+    lengths = [_path_lengths(points, closed) for points, closed, _ in paths]
+    cuts = [[] for _ in paths]
+    segments = []
+    boxes = []
+    for path, (points, closed, _) in enumerate(paths):
+        ends = points[1:] + points[:1] if closed else points[1:]
+        for index, ((ax, ay), (bx, by)) in enumerate(zip(points, ends)):
+            segments.append((path, index, ax, ay, bx, by))
+            boxes.append((min(ax, bx), min(ay, by), max(ax, bx), max(ay, by)))
+    edges = BoxIndex(boxes)
+
+    def cast(x, y, nx, ny):
+        ex, ey = x + nx * reach, y + ny * reach
+        best = None
+        for found in edges.query(min(x, ex), min(y, ey), max(x, ex), max(y, ey)):
+            path, index, ax, ay, bx, by = segments[found]
+            hit = _ray_hit(x, y, nx, ny, ax, ay, bx, by)
+            if hit and hit[0] <= reach and (best is None or hit[0] < best[0]):
+                distance, share = hit
+                along = lengths[path][index] + share * math.dist((ax, ay), (bx, by))
+                best = (distance, path, along)
+        return best
+
+    radius = (TAB_DRILL / 2 + TAB_CLEARANCE) * SCALE
+    margin = width / 2
+
+    def bridge(board, own, tab):
+        """Return how a tab of a copy crosses the gap, or None if it can't."""
+        if _overlaps(cuts[own], tab.low, tab.high, margin):
+            return None
+        start = copy_point(board, pivot, *tab.start)
+        end = copy_point(board, pivot, *tab.end)
+        nx, ny = tab.normal
+        if board.flip:
+            nx = -nx
+        nx, ny = _rotate(nx, ny, board.angle)
+        middle = copy_point(board, pivot, *tab.middle)
+        hits = [cast(x, y, nx, ny) for x, y in (start, middle, end)]
+        if None in hits or len({path for _, path, _ in hits}) > 1:
+            return None
+        far = hits[0][1]
+        if far == own:
+            return None
+
+        # the far side runs between the edges' hits, the way the middle is
+        low, high = sorted((hits[0][2], hits[2][2]))
+        far_cuts = [(low, high)]
+        if not low <= hits[1][2] <= high:
+            far_cuts = [(high, lengths[far][-1]), (0, low)]
+        if any(_overlaps(cuts[far], *cut, margin) for cut in far_cuts):
+            return None
+        far_start = (start[0] + nx * hits[0][0], start[1] + ny * hits[0][0])
+        far_end = (end[0] + nx * hits[2][0], end[1] + ny * hits[2][0])
+        rows = [[copy_point(board, pivot, x, y) for x, y in tab.holes]]
+        if paths[far][2] is not None:
+            # a tab between boards breaks off both of them
+            row = _hole_row(far_start, far_end)
+            other = boards[paths[far][2]]
+            if not all(
+                keepouts.clear(*source_point(other, pivot, x, y), radius)
+                for x, y in row
+            ):
+                return None
+            rows.append(row)
+        return far, far_cuts, [(*start, *far_start), (*end, *far_end)], rows
+
+    def approaches(own):
+        """
+        Return where each other path within reach comes closest to a path.
+
+        The result maps each path to the squared distance and the distance
+        along own's path of its closest approach.
+        """
+        points = paths[own][0]
+        closest = {}
+        for index, (a, b) in enumerate(zip(points, points[1:] + points[:1])):
+            low = lengths[own][index]
+            span = lengths[own][index + 1] - low
+            for found in edges.query(
+                min(a[0], b[0]) - reach,
+                min(a[1], b[1]) - reach,
+                max(a[0], b[0]) + reach,
+                max(a[1], b[1]) + reach,
+            ):
+                path, _, cx, cy, ex, ey = segments[found]
+                if path == own:
+                    continue
+                # the closest points of two polylines include a corner of one
+                nearest = [(_point_segment_distance2(*a, cx, cy, ex, ey), low)]
+                for fx, fy in ((cx, cy), (ex, ey)):
+                    share = 0
+                    if span:
+                        dot = (fx - a[0]) * (b[0] - a[0]) + (fy - a[1]) * (b[1] - a[1])
+                        share = min(max(dot / span**2, 0), 1)
+                    nearest.append(
+                        (_point_segment_distance2(fx, fy, *a, *b), low + share * span)
+                    )
+                best = min(nearest)
+                if best[0] > reach**2:
+                    continue
+                if path not in closest or best < closest[path]:
+                    closest[path] = best
+        return closest
+
+    lines = []
+    bites = []
+    tabbed = Counter()
+    kept = 0
+
+    def place(number, own, tab, found):
+        """Cut a tab's gap in both outlines and add its sides and holes."""
+        far, far_cuts, sides, rows = found
+        tabbed[number] += 1
+        if paths[far][2] is not None:
+            tabbed[paths[far][2]] += 1
+        cuts[own].append((tab.low, tab.high))
+        cuts[far].extend(far_cuts)
+        lines.extend(tuple(round(value) for value in side) for side in sides)
+        for row in rows:
+            row = [(round(x), round(y)) for x, y in row]
+            centre = (
+                round(sum(x for x, _ in row) / len(row)),
+                round(sum(y for _, y in row) / len(row)),
+            )
+            bites.append((centre, row))
+
+    frame_paths = len(paths) - len(boards)
+    for number, board in enumerate(boards):
+        own = frame_paths + number
+        for slot in slots:
+            for tab in slot:
+                found = bridge(board, own, tab)
+                if found is not None:
+                    place(number, own, tab, found)
+                    kept += 1
+                    break
+
+    # the slots can miss where a neighbour comes closest, between them or
+    # where they slid off it, so a board short of two tabs tries there too
+    slide = width / 4
+    for number, board in enumerate(boards):
+        own = frame_paths + number
+        if tabbed[number] >= 2:
+            continue
+        for _, along in sorted(approaches(own).values()):
+            for shift in (0, slide, -slide, 2 * slide, -2 * slide):
+                low = along - width / 2 + shift
+                low = min(max(low, 0), source.lengths[-1] - width)
+                tab = outline_tab(source, keepouts, low, width)
+                found = tab and bridge(board, own, tab)
+                if found:
+                    place(number, own, tab, found)
+                    kept += 1
+                    break
+            if tabbed[number] >= 2:
+                break
+
+    for (points, closed, _), path_cuts in zip(paths, cuts):
+        lines.extend(_path_pieces(points, closed, path_cuts))
+    for board in boards:
+        for loop in cutouts:
+            points = [copy_point(board, pivot, x, y) for x, y in loop]
+            lines.extend(_path_pieces(points, True, []))
+
+    if report:
+        holes = sum(len(row) for _, row in bites)
+        print(
+            f"Placed {kept} tabs with {holes} mouse-bite holes on {len(boards)} "
+            f"boards, in {time.perf_counter() - start_time:.2f}s"
+        )
+    loose = sum(tabbed[number] < 2 for number in range(len(boards)))
+    if loose:
+        print(
+            f"{loose} board(s) would be held in by fewer than two tabs, try a "
+            "smaller --tabs or --tabwidth, or more --padding. Quitting."
+        )
+        sys.exit(1)
+    return lines, bites
+
+
+# Item filters: drops the layers and kinds of item a panel doesn't need from
+# the source board, once, so they are never copied
+
+FILTER_ITEMS = ("dimensions", "fptext", "images", "models", "text")
+
+# pcbnew classes and file nodes of each kind of item, models are cleared from
+# the footprints instead
+_FILTER_CLASSES = {
+    "dimensions": {
+        "PCB_DIM_ALIGNED",
+        "PCB_DIM_ORTHOGONAL",
+        "PCB_DIM_RADIAL",
+        "PCB_DIM_LEADER",
+        "PCB_DIM_CENTER",
+    },
+    "fptext": {"PCB_TEXT", "PCB_TEXTBOX"},
+    "images": {"PCB_REFERENCE_IMAGE", "PCB_BITMAP"},
+    "text": {"PCB_TEXT", "PCB_TEXTBOX"},
+}
+_FILTER_NODES = {
+    "dimensions": {"dimension"},
+    "fptext": {"fp_text", "fp_text_box"},
+    "images": {"image"},
+    "text": {"gr_text", "gr_text_box"},
+}
+_BOARD_FILTERS = {"dimensions", "images", "text"}
+_FOOTPRINT_FILTERS = {"dimensions", "fptext"}
+
+# footprint children that are drawn on one layer, the rest are kept
+_FP_LAYER_NODES = _FP_SHAPE_NODES | {"fp_text", "fp_text_box", "dimension", "zone"}
+
+
+def filter_kinds(args):
+    """Return the set of --exclude-items kinds, or None if one is unknown."""
+    if not args.exclude_items:
+        return set()
+    kinds = {kind.strip() for kind in args.exclude_items.split(",")}
+    return kinds if kinds <= set(FILTER_ITEMS) else None
+
+
+def kept_layers(args, layertable):
+    """
+    Work out the layers --include-layers and --exclude-layers keep.
+
+    Layer names may use wildcards, e.g. *.Fab, and Edge.Cuts is always kept.
+
+    Args:
+        args: Parsed arguments
+        layertable: Layers by name, from get_layertable() or sexpr_layertable()
+
+    Returns the set of kept layers, or None if every layer is kept.
+    """
+    if not args.include_layers and not args.exclude_layers:
+        return None
+    layers = set(layertable.values())
+    for option, patterns, include in (
+        ("--include-layers", args.include_layers, True),
+        ("--exclude-layers", args.exclude_layers, False),
+    ):
+        if not patterns:
+            continue
+        matched = set()
+        for pattern in patterns.split(","):
+            names = [
+                name
+                for name in layertable
+                if fnmatch.fnmatchcase(name, pattern.strip())
+            ]
+            if not names:
+                print(f"{option} layer {pattern} isn't on the board. Quitting.")
+                sys.exit(1)
+            matched.update(layertable[name] for name in names)
+        layers = layers & matched if include else layers - matched
+    layers.add(layertable["Edge.Cuts"])
+    return layers
+
+
+def filter_board(args, board):
+    """
+    Delete the items of a pcbnew board that the item filters leave out.
+
+    Footprints, pads, vias and footprint fields are always kept, tracks,
+    drawings and zones are dropped when none of their layers is kept. Layers
+    go by their names on the board or their standard names, e.g. F.SilkS.
+
+    Returns the number of items deleted.
+    """
+    layertable = get_layertable(board)
+    for layer in range(pcbnew.PCB_LAYER_ID_COUNT):
+        layertable.setdefault(pcbnew.BOARD.GetStandardLayerName(layer), layer)
+    layers = kept_layers(args, layertable)
+    kinds = filter_kinds(args)
+    board_classes = set().union(*(_FILTER_CLASSES[k] for k in kinds & _BOARD_FILTERS))
+    footprint_classes = set().union(
+        *(_FILTER_CLASSES[k] for k in kinds & _FOOTPRINT_FILTERS)
+    )
+
+    def dropped(item, classes):
+        return item.GetClass() in classes or (
+            layers is not None and item.GetLayer() not in layers
+        )
+
+    def zone_dropped(zone):
+        return layers is not None and not any(
+            layer in layers for layer in zone.GetLayerSet().Seq()
+        )
+
+    items = [item for item in board.GetDrawings() if dropped(item, board_classes)]
+    items += [
+        track
+        for track in board.GetTracks()
+        if track.GetClass() != "PCB_VIA" and dropped(track, ())
+    ]
+    items += [zone for zone in board.Zones() if zone_dropped(zone)]
+    models = 0
+    for footprint in board.GetFootprints():
+        items += [
+            item
+            for item in footprint.GraphicalItems()
+            if dropped(item, footprint_classes)
+        ]
+        items += [zone for zone in footprint.Zones() if zone_dropped(zone)]
+        if "models" in kinds:
+            models += len(footprint.Models())
+            footprint.Models().clear()
+    for item in items:
+        item.DeleteStructure()
+    return len(items) + models
+
+
+def sexpr_filter_items(args, root, layertable):
+    """
+    Remove the items of a parsed board that the item filters leave out.
+
+    The same items are kept as by filter_board(), and items on a wildcard
+    layer such as *.Cu are kept too.
+
+    Returns the number of nodes removed.
+    """
+    layers = kept_layers(args, layertable)
+    kinds = filter_kinds(args)
+    board_nodes = set().union(*(_FILTER_NODES[k] for k in kinds & _BOARD_FILTERS))
+    footprint_nodes = set().union(
+        *(_FILTER_NODES[k] for k in kinds & _FOOTPRINT_FILTERS)
+    )
+    if "models" in kinds:
+        footprint_nodes.add("model")
+
+    def on_kept_layer(node):
+        layer_node = find_child(node, "layer")
+        if layer_node is not None:
+            names = layer_node[1:2]
+        else:
+            layer_node = find_child(node, "layers")
+            names = layer_node[1:] if layer_node is not None else []
+        names = [unquote(name) for name in names if not isinstance(name, list)]
+        if layers is None or not names:
+            return True
+        return any(name not in layertable or name in layers for name in names)
+
+    def kept(node, names, layered):
+        if not isinstance(node, list):
+            return True
+        if node[0] == "fp_text" and node[1] in ("reference", "value"):
+            return True
+        if node[0] in names:
+            return False
+        return node[0] not in layered or on_kept_layer(node)
+
+    removed = 0
+    nodes = []
+    top_layered = (_TRACK_NODES - {"via"}) | _DRAWING_NODES | {"zone"}
+    for node in root[1:]:
+        if not kept(node, board_nodes, top_layered):
+            removed += 1
+            continue
+        if isinstance(node, list) and node[0] in _FOOTPRINT_NODES:
+            children = [
+                child
+                for child in node
+                if kept(child, footprint_nodes, _FP_LAYER_NODES)
+            ]
+            removed += len(node) - len(children)
+            node[:] = children
+        nodes.append(node)
+    root[1:] = nodes
+    return removed
+
+
+# Assembly output: placement and BOM files for the whole panel, computed from
+# the source footprints and the grid rather than from every copy
+
+Placement = namedtuple(
+    "Placement",
+    ["reference", "value", "package", "x", "y", "rotation", "bottom", "pos", "bom"],
+)
+
+
+def pcbnew_placements(board):
+    """Return the Placement of every footprint on a pcbnew board."""
+    placements = []
+    for footprint in board.GetFootprints():
+        position = footprint.GetPosition()
+        attributes = footprint.GetAttributes()
+        placements.append(
+            Placement(
+                footprint.GetReference(),
+                footprint.GetValue(),
+                str(footprint.GetFPID().GetLibItemName()),
+                position.x,
+                position.y,
+                footprint.GetOrientationDegrees(),
+                footprint.IsFlipped(),
+                not attributes & pcbnew.FP_EXCLUDE_FROM_POS_FILES,
+                not attributes & (pcbnew.FP_EXCLUDE_FROM_BOM | pcbnew.FP_DNP),
+            )
+        )
+    return placements
+
+
+def sexpr_placements(root):
+    """Return the Placement of every footprint in a parsed board."""
+
+    def field(node, name):
+        # KiCad 8 properties, or the fp_text of older boards
+        for child in node[1:]:
+            if not isinstance(child, list) or len(child) < 3:
+                continue
+            if child[0] == "property" and unquote(child[1]) == name.capitalize():
+                return unquote(child[2])
+            if child[0] == "fp_text" and child[1] == name:
+                return unquote(child[2])
+        return ""
+
+    placements = []
+    for node in root[1:]:
+        if not isinstance(node, list) or node[0] not in _FOOTPRINT_NODES:
+            continue
+        at = find_child(node, "at")
+        attr = find_child(node, "attr") or []
+        package = unquote(node[1]) if not isinstance(node[1], list) else ""
+        placements.append(
+            Placement(
+                field(node, "reference"),
+                field(node, "value"),
+                package.split(":")[-1],
+                mm_to_iu(at[1]),
+                mm_to_iu(at[2]),
+                float(at[3]) if len(at) > 3 else 0.0,
+                _is_on_layer(node, "B.Cu"),
+                "exclude_from_pos_files" not in attr,
+                "exclude_from_bom" not in attr and "dnp" not in attr,
+            )
+        )
+    return placements
+
+
+def _natural_key(reference):
+    """Sort key putting R2 before R10."""
+    parts = re.split(r"(\d+)", reference)
+    return [int(part) if part.isdigit() else part for part in parts]
+
+
+def _csv_text(value):
+    """Quote a CSV text field the way KiCad's position files do."""
+    return '"' + value.replace('"', '""') + '"'
+
+
+def panel_positions(parts, cells, pivot):
+    """
+    Yield the placement row of every part on every board of the panel.
+
+    Args:
+        parts: (reference, value, package, x, y, rotation, side) of each part
+        cells: (suffix, dx, dy, angle, flip) of each board
+        pivot: Point the boards are flipped and turned about
+    """
+    for reference, value, package, x, y, rotation, side in parts:
+        for suffix, dx, dy, angle, flip in cells:
+            if angle or flip:
+                px, py = x - pivot.x, y - pivot.y
+                part_rotation = rotation
+                part_side = side
+                if flip:
+                    # a footprint flipped left to right is mirrored in x and
+                    # its orientation goes from o to 180 - o
+                    px = -px
+                    part_rotation = 180 - rotation
+                    part_side = "top" if side == "bottom" else "bottom"
+                if angle:
+                    px, py = _rotate(px, py, angle)
+                yield (
+                    reference + suffix,
+                    value,
+                    package,
+                    pivot.x + round(px) + dx,
+                    pivot.y + round(py) + dy,
+                    round((part_rotation + angle) % 360, 4),
+                    part_side,
+                )
+            else:
+                yield (
+                    reference + suffix,
+                    value,
+                    package,
+                    x + dx,
+                    y + dy,
+                    rotation,
+                    side,
+                )
+
+
+def write_assembly_files(placements, plan, output_file, fmt="kicad"):
+    """
+    Write the placement and BOM files for every board in the panel.
+
+    Each copy's designators get a _column_row suffix, e.g. R1_3_2, and its
+    positions are the source positions moved (and turned) like the copy, with
+    y pointing up like KiCad's position files and the Gerber output. fmt is
+    "kicad" or "jlc". Returns the (pos_path, bom_path) written.
+    """
+    base = os.path.splitext(output_file)[0]
+    pos_path = base + "-pos.csv"
+    bom_path = base + "-bom.csv"
+    cells = sorted(
+        [("_1_1", 0, 0, 0, False)]
+        + [
+            (f"_{copy.x + 1}_{copy.y + 1}", copy.dx, copy.dy, copy.angle, copy.flip)
+            for copy in plan.copies
+        ],
+        key=lambda cell: [int(n) for n in cell[0].split("_")[1:]],
+    )
+
+    # the per-part columns are gathered once, only the positions vary by copy
+    parts = [
+        (
+            part.reference,
+            part.value,
+            part.package,
+            part.x,
+            part.y,
+            round(part.rotation, 4),
+            "bottom" if part.bottom else "top",
+        )
+        for part in sorted(placements, key=lambda part: _natural_key(part.reference))
+        if part.pos
+    ]
+    rows = panel_positions(parts, cells, plan.pivot)
+    with open(pos_path, "w", encoding="utf-8", newline="") as pos_file:
+        if fmt == "jlc":
+            writer = csv.writer(pos_file)
+            writer.writerow(["Designator", "Mid X", "Mid Y", "Layer", "Rotation"])
+            writer.writerows(
+                [
+                    reference,
+                    f"{iu_to_mm(x)}mm",
+                    f"{iu_to_mm(-y)}mm",
+                    side.capitalize(),
+                    f"{rotation:g}",
+                ]
+                for reference, _, _, x, y, rotation, side in rows
+            )
+        else:
+            # KiCad's own layout: quoted text, fixed decimals, unquoted side
+            text = _csv_text
+            pos_file.write("Ref,Val,Package,PosX,PosY,Rot,Side\n")
+            pos_file.writelines(
+                f"{text(reference)},{text(value)},{text(package)},"
+                f"{x / SCALE:.4f},{-y / SCALE:.4f},"
+                f"{rotation:.6f},{side}\n"
+                for reference, value, package, x, y, rotation, side in rows
+            )
+
+    # one BOM line per value and package, with the quantity for the panel
+    groups = {}
+    for part in placements:
+        if part.bom:
+            groups.setdefault((part.value, part.package), []).append(part.reference)
+    with open(bom_path, "w", encoding="utf-8", newline="") as bom_file:
+        writer = csv.writer(bom_file)
+        if fmt == "jlc":
+            writer.writerow(["Comment", "Designator", "Footprint"])
+        else:
+            writer.writerow(["Reference", "Value", "Footprint", "Qty"])
+        for (value, package), references in sorted(
+            groups.items(),
+            key=lambda group: min(map(_natural_key, group[1])),
+        ):
+            designators = ",".join(
+                reference + suffix
+                for reference in sorted(references, key=_natural_key)
+                for suffix, _, _, _, _ in cells
+            )
+            if fmt == "jlc":
+                writer.writerow([value, designators, package])
+            else:
+                writer.writerow(
+                    [designators, value, package, len(references) * len(cells)]
+                )
+
+    return pos_path, bom_path
+
+
+def build_parser(parser_class=ArgumentParser):
+    """Create the command line argument parser."""
+    parser = parser_class(description="A script to panelize KiCad files.")
+    parser.add_argument(
+        "-v", "--version", action="version", version=f"%(prog)s {__version__}"
+    )
+    parser.add_argument(
+        dest="sourceBoardFiles",
+        metavar="sourceBoardFile",
+        nargs="*",
+        help="Path to the *.kicad_pcb file(s) to be panelized",
+    )
+    parser.add_argument("--numx", type=int, help="Number of boards in X direction")
+    parser.add_argument("--numy", type=int, help="Number of boards in Y direction")
+    parser.add_argument(
+        "--padding", type=int, default=1, help="Extra space between boards"
+    )
+    parser.add_argument("--panelx", type=int, help="Maximum panel size in X direction")
+    parser.add_argument("--panely", type=int, help="Maximum panel size in Y direction")
+    parser.add_argument(
+        "--hrail", type=int, default=0, help="Horizontal edge rail width"
+    )
+    parser.add_argument("--vrail", type=int, default=0, help="Vertical edge rail width")
+    parser.add_argument("--hrailtext", help="Text to put on the horizontal edge rail")
+    parser.add_argument("--vrailtext", help="Text to put on the vertical edge rail")
+    parser.add_argument(
+        "--htitle", action="store_true", help="Print title info on horizontal edge rail"
+    )
+    parser.add_argument(
+        "--vtitle", action="store_true", help="Print title info on vertical edge rail"
+    )
+    parser.add_argument(
+        "--vscorelayer", default="Edge.Cuts", help="Layer to put v-score lines on"
+    )
+    parser.add_argument(
+        "--vscoretextlayer",
+        default="User.Comments",
+        help="Layer to put v-score text on",
+    )
+    parser.add_argument(
+        "--vscoretext", default="V-SCORE", help="Text used to indicate v-scores"
+    )
+    parser.add_argument(
+        "--vscoreextends",
+        type=float,
+        default=-0.05,
+        help="How far past the board to extend the v-score lines, defaults to -0.05",
+    )
+    parser.add_argument(
+        "--keepfills",
+        action="store_true",
+        help="Mark the copies of filled zones as filled so no refill is needed",
+    )
+    parser.add_argument(
+        "--refill",
+        choices=["source", "panel"],
+        help="Refill zones of the first board and copy the fills, or the whole "
+        "panel, on KiCad's zone filler threads (their number is KiCad's)",
+    )
+    parser.add_argument(
+        "--refill-timing",
+        action="store_true",
+        help="Fill and time the zones one at a time, slower than a plain --refill",
+    )
+    parser.add_argument(
+        "--bulkadd",
+        action="store_true",
+        help="Add copies without per-item connectivity updates, rebuilding it once",
+    )
+    parser.add_argument(
+        "--groupcopy",
+        nargs="?",
+        const="ungroup",
+        choices=["ungroup", "keep"],
+        help="Duplicate each board copy as one group, then ungroup or keep the groups",
+    )
+    parser.add_argument(
+        "--include-layers",
+        metavar="LAYERS",
+        help="Only copy the items on these comma separated layers, e.g. *.Cu,*.SilkS",
+    )
+    parser.add_argument(
+        "--exclude-layers",
+        metavar="LAYERS",
+        help="Leave out the items on these comma separated layers, e.g. *.Fab",
+    )
+    parser.add_argument(
+        "--exclude-items",
+        metavar="KINDS",
+        help="Leave out dimensions, fptext, images, models or text, comma separated",
+    )
+    parser.add_argument(
+        "--gerber",
+        metavar="DIR",
+        help="Write step and repeat Gerber and drill files to DIR instead of a board",
+    )
+    parser.add_argument(
+        "--cpl",
+        nargs="?",
+        const="kicad",
+        choices=["kicad", "jlc"],
+        help="Write placement and BOM files for the whole panel (KiCad or JLC format)",
+    )
+    parser.add_argument(
+        "--plot",
+        metavar="DIR",
+        help="Plot Gerber and drill files of the panel to DIR, layers in parallel",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["pcbnew", "sexpr"],
+        default="pcbnew",
+        help="Load the board with pcbnew or rewrite the file directly without KiCad",
+    )
+    parser.add_argument(
+        "--fit",
+        action="store_true",
+        help="Also try the board turned 90 degrees and the rails on the other axis",
+    )
+    parser.add_argument(
+        "--nest",
+        action="store_true",
+        help="Pack the boards by their outline, staggered or turned 180 degrees",
+    )
+    parser.add_argument(
+        "--orient",
+        metavar="PATTERN",
+        help="Turn and flip the boards in a repeating pattern, e.g. 0,180/f0,f180",
+    )
+    parser.add_argument(
+        "--designs",
+        metavar="BOARDS",
+        help="Other boards to pack on the panel, comma separated PATH[:COUNT]",
+    )
+    parser.add_argument(
+        "--quantity",
+        type=int,
+        default=1,
+        help="Number of boards of the source board to pack with --designs",
+    )
+    parser.add_argument(
+        "--tabs",
+        type=float,
+        metavar="PITCH",
+        help="Hold the boards in by tabs about PITCH mm apart and route round them",
+    )
+    parser.add_argument(
+        "--tabwidth", type=float, default=3, help="Width of the --tabs tabs in mm"
+    )
+    parser.add_argument(
+        "--sweep",
+        metavar="PRICES",
+        help="Rank panel sizes, rails and padding by cost per board from a price table",
+    )
+    parser.add_argument(
+        "--rails",
+        default="0,5",
+        help="Comma separated rail widths for --sweep to try on each axis",
+    )
+    parser.add_argument(
+        "--paddings", help="Comma separated paddings for --sweep, defaults to --padding"
+    )
+    parser.add_argument(
+        "--sweeptop",
+        type=int,
+        default=10,
+        help="Number of --sweep configurations to list",
+    )
+    parser.add_argument(
+        "--update",
+        metavar="PANEL",
+        help="Patch a panel built by the sexpr engine with the changes to the board",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Print the panel layout as JSON without creating the panel",
+    )
+
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="-",
+        help="Report per-phase timings, item counts and peak RSS to stderr or a file",
+    )
+    parser.add_argument(
+        "--cprofile", help="Write cProfile statistics of the whole run to a file"
+    )
+    parser.add_argument(
+        "--batch", help="TOML file of [[job]] tables to panelize in one run"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of worker processes for batch runs and plotting",
+    )
+    parser.add_argument("--summary", help="Write the batch summary to a JSON file")
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Copy the panel of an unchanged board from the cache instead",
+    )
+    parser.add_argument(
+        "--cachedir",
+        help="Directory to cache panels in, implies --cache "
+        "(defaults to ~/.cache/kicad-panelizer)",
+    )
+    parser.add_argument(
+        "--cachesize",
+        type=int,
+        default=1024,
+        help="Maximum size of the cache in MB, least recently used panels go first",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Turn --cache off again, e.g. for one job of a batch",
+    )
+
+    return parser
+
+
+def parse_args(argv=None):
+    """Parse command line arguments, keeping the argv for the report text."""
+    args = build_parser().parse_args(argv)
+    args.argv = sys.argv[1:] if argv is None else argv
+    return args
+
+
+def validate_args(args):
+    """Validate command line arguments and return processed values."""
+    source_file = args.sourceBoardFile
+
+    # check file extension
+    if not source_file.endswith(".kicad_pcb"):
+        print(f"{source_file} is not a *.kicad_pcb file. Quitting.")
+        sys.exit(1)
+
+    # check rail text requirements, --sweep checks every rail width it tries
+    if not args.sweep and (
+        ((args.hrailtext or args.htitle) and args.hrail < MIN_RAIL_WIDTH_FOR_TEXT)
+        or ((args.vrailtext or args.vtitle) and args.vrail < MIN_RAIL_WIDTH_FOR_TEXT)
+    ):
+        print(
+            f"Rail width must be at least {MIN_RAIL_WIDTH_FOR_TEXT}mm if using rail text. Quitting."
+        )
+        sys.exit(1)
+
+    # check for conflicting options
+    if (args.panelx or args.panely) and (args.numx or args.numy):
+        print("Specify number of boards or size of panel, not both. Quitting.")
+        sys.exit(1)
+
+    if (
+        not args.sweep
+        and (not args.panelx or not args.panely)
+        and (not args.numx or not args.numy)
+    ):
+        print("Specify number of boards or size of panel. Quitting.")
+        sys.exit(1)
+
+    if args.refill and args.engine == "sexpr":
+        print("Refilling zones needs the pcbnew engine. Quitting.")
+        sys.exit(1)
+
+    if args.refill_timing and not args.refill:
+        print("--refill-timing needs --refill. Quitting.")
+        sys.exit(1)
+
+    if args.gerber and args.engine == "sexpr":
+        print("Gerber output needs the pcbnew engine. Quitting.")
+        sys.exit(1)
+
+    # --gerber plots the source once and never builds the panel board
+    if args.gerber and (
+        args.refill == "panel" or args.groupcopy or args.bulkadd or args.keepfills
+    ):
+        print(
+            "--gerber can't be used with --refill=panel, --groupcopy, --bulkadd "
+            "or --keepfills, it doesn't copy the board. Quitting."
+        )
+        sys.exit(1)
+
+    if args.plot and args.engine == "sexpr":
+        print("Plotting needs the pcbnew engine. Quitting.")
+        sys.exit(1)
+
+    if args.plot and args.gerber:
+        print("Use --gerber or --plot, not both. Quitting.")
+        sys.exit(1)
+
+    if args.groupcopy and args.engine == "sexpr":
+        print("Group duplication needs the pcbnew engine. Quitting.")
+        sys.exit(1)
+
+    if args.fit and not args.sweep and not (args.panelx and args.panely):
+        print("--fit needs --panelx and --panely. Quitting.")
+        sys.exit(1)
+
+    if args.nest and (args.fit or args.gerber or args.sweep):
+        print("--nest can't be used with --fit, --gerber or --sweep. Quitting.")
+        sys.exit(1)
+
+    if args.nest and args.tabs is None:
+        print(
+            "--nest needs --tabs, nested boards can't be v-scored, so only the "
+            "panel outline would be cut. Quitting."
+        )
+        sys.exit(1)
+
+    if args.orient:
+        pattern = orientation_pattern(args.orient)
+        if pattern is None:
+            print(
+                "--orient takes boards of 0, 90, 180 or 270 degrees, f in front "
+                "to flip them, separated by commas and rows by /. Quitting."
+            )
+            sys.exit(1)
+        if pattern[0][0] != (0, False):
+            print("The first board of --orient must be 0, as drawn. Quitting.")
+            sys.exit(1)
+        if args.engine == "sexpr":
+            print("--orient needs the pcbnew engine. Quitting.")
+            sys.exit(1)
+        if args.fit or args.nest or args.gerber or args.sweep:
+            print(
+                "--orient can't be used with --fit, --nest, --gerber or --sweep. "
+                "Quitting."
+            )
+            sys.exit(1)
+
+    if args.designs:
+        designs = design_list(args)
+        if designs is None:
+            print(
+                "--designs takes *.kicad_pcb files, each with an optional :COUNT, "
+                "separated by commas. Quitting."
+            )
+            sys.exit(1)
+        paths = [os.path.abspath(path) for path, _ in designs]
+        if len(set(paths)) < len(paths):
+            print("Give each board once, with a count for more. Quitting.")
+            sys.exit(1)
+        if not (args.panelx and args.panely):
+            print("--designs needs --panelx and --panely. Quitting.")
+            sys.exit(1)
+        if args.engine == "sexpr":
+            print("--designs needs the pcbnew engine. Quitting.")
+            sys.exit(1)
+        if (
+            args.fit
+            or args.nest
+            or args.orient
+            or args.groupcopy
+            or args.gerber
+            or args.cpl
+            or args.sweep
+        ):
+            print(
+                "--designs can't be used with --fit, --nest, --orient, --groupcopy, "
+                "--gerber, --cpl or --sweep. Quitting."
+            )
+            sys.exit(1)
+
+    if args.quantity < 1 or (args.quantity != 1 and not args.designs):
+        print("--quantity needs --designs and at least one board. Quitting.")
+        sys.exit(1)
+
+    if args.tabs is not None:
+        if args.tabs <= 0 or args.tabwidth <= 0:
+            print("--tabs and --tabwidth must be more than 0. Quitting.")
+            sys.exit(1)
+        if args.padding <= 0:
+            print("--tabs needs --padding to leave room for the router. Quitting.")
+            sys.exit(1)
+        if args.fit or args.designs or args.gerber or args.sweep:
+            print(
+                "--tabs can't be used with --fit, --designs, --gerber or --sweep. "
+                "Quitting."
+            )
+            sys.exit(1)
+
+    if filter_kinds(args) is None:
+        print(
+            f"--exclude-items takes {', '.join(FILTER_ITEMS)}, separated by "
+            "commas. Quitting."
+        )
+        sys.exit(1)
+
+    if args.update and args.engine != "sexpr":
+        print("Updating a panel needs the sexpr engine. Quitting.")
+        sys.exit(1)
+
+    if args.update and not args.update.endswith(".kicad_pcb"):
+        print(f"{args.update} is not a *.kicad_pcb file. Quitting.")
+        sys.exit(1)
+
+    # warn about both rails
+    if args.hrail and args.vrail:
+        print("Warning: do you really want both edge rails?")
+
+
+def compute_layout(args, bbox_width, bbox_height):
+    """
+    Work out the grid for a board of the given Edge.Cuts bounding box.
+
+    Returns (num_x, num_y, board_width, board_height) with the board pitch in
+    internal units, quitting if the panel is too small for a single board.
+    """
+    num_x = args.numx
+    num_y = args.numy
+    padding = args.padding
+    board_width = bbox_width + padding * SCALE
+    board_height = bbox_height + padding * SCALE
+
+    # calculate number of boards if panel size specified
+    if args.panelx:
+        num_x = fit_count(args.panelx, args.hrail, board_width)
+    if args.panely:
+        num_y = fit_count(args.panely, args.vrail, board_height)
+
+    # check we can actually panelize
+    if num_x == 0 or num_y == 0:
+        print("Panel size is too small for board. Quitting.")
+        sys.exit(1)
+
+    return num_x, num_y, board_width, board_height
+
+
+def fit_count(panel_size, rail_width, pitch):
+    """Return how many boards of a pitch fit between the rails of a panel."""
+    return max(0, int((panel_size * SCALE - 2 * rail_width * SCALE) / pitch))
+
+
+def rank_fits(args, bbox_width, bbox_height, rotate=True):
+    """
+    Rank the ways of fitting a board on a --panelx/--panely panel.
+
+    The board is tried as it is and turned 90 degrees, each with the rails as
+    given and moved to the other axis. Layouts with more boards come first,
+    the given orientation and rails win a tie.
+
+    Args:
+        args: Parsed arguments
+        bbox_width: Width of the board's Edge.Cuts bounding box
+        bbox_height: Height of the board's Edge.Cuts bounding box
+        rotate: Also try the board turned 90 degrees
+    """
+    padding = args.padding * SCALE
+    rails = [(False, args.hrail, args.vrail)]
+    if args.hrail != args.vrail:
+        rails.append((True, args.vrail, args.hrail))
+    fits = []
+    for rotated in (False, True) if rotate else (False,):
+        width, height = bbox_width, bbox_height
+        if rotated:
+            width, height = height, width
+        for swapped, h_rail_width, v_rail_width in rails:
+            num_x = fit_count(args.panelx, h_rail_width, width + padding)
+            num_y = fit_count(args.panely, v_rail_width, height + padding)
+            fits.append(Fit(num_x * num_y, num_x, num_y, rotated, swapped))
+    return sorted(fits, key=lambda fit: -fit.boards)
+
+
+def describe_fit(args, fit):
+    """Describe the orientation and rails of a fit."""
+    h_rail_width, v_rail_width = args.hrail, args.vrail
+    if fit.swapped:
+        h_rail_width, v_rail_width = v_rail_width, h_rail_width
+    parts = ["turned 90 degrees" if fit.rotated else "as drawn"]
+    if h_rail_width:
+        parts.append(f"{h_rail_width}mm rails left and right")
+    if v_rail_width:
+        parts.append(f"{v_rail_width}mm rails top and bottom")
+    return ", ".join(parts)
+
+
+def print_fits(args, fits):
+    """Print the ranked fits, marking the one used."""
+    print(f"Layouts on a {args.panelx}x{args.panely}mm panel:")
+    for rank, fit in enumerate(fits, 1):
+        mark = "*" if rank == 1 else " "
+        print(
+            f"{mark} {rank}. {fit.boards} boards ({fit.num_x} x {fit.num_y}), "
+            f"{describe_fit(args, fit)}"
+        )
+
+
+def apply_fit(args, fit):
+    """Return args with the rails, and their text, moved as in a fit."""
+    if not fit.swapped:
+        return args
+    args = copy.copy(args)
+    args.hrail, args.vrail = args.vrail, args.hrail
+    args.hrailtext, args.vrailtext = args.vrailtext, args.hrailtext
+    args.htitle, args.vtitle = args.vtitle, args.htitle
+    return args
+
+
+def fit_board(args, bbox, rotate=True, report=True):
+    """
+    Pick the layout with the most boards for --fit.
+
+    bbox is (left, top, right, bottom) in internal units. Returns (args, fits)
+    with args changed to the rails of the best fit, which is fits[0].
+    """
+    left, top, right, bottom = bbox
+    fits = rank_fits(args, right - left, bottom - top, rotate)
+    if report:
+        print_fits(args, fits)
+    return apply_fit(args, fits[0]), fits
+
+
+def rotate_board(board, center):
+    """Turn every item of a board 90 degrees about center."""
+    angle = pcbnew.EDA_ANGLE(90, pcbnew.DEGREES_T)
+    for items in (
+        board.GetTracks(),
+        board.GetDrawings(),
+        board.GetFootprints(),
+        board.Zones(),
+    ):
+        for item in items:
+            item.Rotate(center, angle)
+
+
+def panel_extent(args, array_center, array_width, array_height):
+    """Return the (outline, panel_width, panel_height) around an array of boards."""
+    outline = panel_outline_corners(
+        array_center, array_width, array_height, args.hrail, args.vrail, args.padding
+    )
+
+    # get final panel dimensions, including the outline width like pcbnew does
+    panel_width = int(outline[1] - outline[0]) + DEFAULT_LINE_WIDTH * SCALE
+    panel_height = int(outline[3] - outline[2]) + DEFAULT_LINE_WIDTH * SCALE
+    return outline, panel_width, panel_height
+
+
+def orientation_pattern(pattern):
+    """
+    Parse an --orient pattern into rows of (angle, flip).
+
+    Boards are separated by commas and rows by slashes, each board is 0, 90,
+    180 or 270 degrees, with an f in front for a board flipped over, e.g.
+    "0,180/f0,f180". Returns None if the pattern isn't valid.
+    """
+    rows = []
+    for row in pattern.split("/"):
+        cells = []
+        for cell in row.split(","):
+            cell = cell.strip().lower()
+            flip = cell.startswith("f")
+            angle = cell[1:] if flip else cell
+            if flip and not angle:
+                angle = "0"
+            if angle not in ("0", "90", "180", "270"):
+                return None
+            cells.append((int(angle), flip))
+        rows.append(cells)
+    return rows
+
+
+def plan_panel(args, bbox):
+    """
+    Lay out the panel arithmetically from the source Edge.Cuts bounding box.
+
+    bbox is (left, top, right, bottom) in internal units. The array and panel
+    dimensions match what GetBoardEdgesBoundingBox() reports once the copies
+    and the panel outline have been added to the board. With --orient, the
+    boards are flipped and turned about their centre in the pattern given,
+    and boards turned 90 degrees are centred in square cells.
+    """
+    left, top, right, bottom = bbox
+    bbox_width = right - left
+    bbox_height = bottom - top
+    pattern = [[(0, False)]]
+    if args.orient:
+        pattern = orientation_pattern(args.orient)
+    cell_width, cell_height = bbox_width, bbox_height
+    if any(angle % 180 for row in pattern for angle, _ in row):
+        cell_width = cell_height = max(bbox_width, bbox_height)
+    num_x, num_y, board_width, board_height = compute_layout(
+        args, cell_width, cell_height
+    )
+
+    # get array dimensions
+    array_left = left - (cell_width - bbox_width) // 2
+    array_top = top - (cell_height - bbox_height) // 2
+    array_width = cell_width + (num_x - 1) * board_width
+    array_height = cell_height + (num_y - 1) * board_height
+    array_center = Point(array_left + array_width // 2, array_top + array_height // 2)
+    outline, panel_width, panel_height = panel_extent(
+        args, array_center, array_width, array_height
+    )
+
+    copies = []
+    for x in range(num_x):
+        for y in range(num_y):
+            row = pattern[y % len(pattern)]
+            angle, flip = row[x % len(row)]
+            if x != 0 or y != 0:
+                copies.append(
+                    CopyTransform(x, y, x * board_width, y * board_height, angle, flip)
+                )
+
+    return PanelPlan(
+        num_x,
+        num_y,
+        board_width,
+        board_height,
+        array_center,
+        array_width,
+        array_height,
+        outline,
+        panel_width,
+        panel_height,
+        Point((left + right) // 2, (top + bottom) // 2),
+        copies,
+        False,
+        None,
+        [],
+    )
+
+
+def print_plan(args):
+    """Print the panel layout as JSON, reading only the board outline."""
+    with open(args.sourceBoardFile, encoding="utf-8") as source:
+        text = source.read()
+    # tabs keep clear of the copper and courtyards, so they need the whole board
+    root = parse_sexpr(text) if args.tabs else scan_edge_cuts(text)
+    if args.tabs and (args.include_layers or args.exclude_layers or args.exclude_items):
+        sexpr_filter_items(args, root, sexpr_layertable(root))
+    bbox = sexpr_edge_bbox(root)
+    fits = []
+    if args.fit:
+        args, fits = fit_board(args, bbox, args.engine != "sexpr", report=False)
+        if fits[0].rotated:
+            left, top, right, bottom = bbox
+            center_x, center_y = (left + right) / 2, (top + bottom) / 2
+            half_width, half_height = (right - left) / 2, (bottom - top) / 2
+            bbox = (
+                center_x - half_height,
+                center_y - half_width,
+                center_x + half_height,
+                center_y + half_width,
+            )
+    if args.nest:
+        plan = nest_panel(args, bbox, root, args.engine != "sexpr", report=False)
+    elif args.designs:
+        designs = design_list(args)
+        bboxes = [bbox]
+        for path, _ in designs[1:]:
+            with open(path, encoding="utf-8") as design:
+                bboxes.append(sexpr_edge_bbox(scan_edge_cuts(design.read())))
+        plan = pack_designs(args, bboxes, designs, report=False)
+    else:
+        plan = plan_panel(args, bbox)
+    lines, _, _ = vscore_layout(
+        plan.array_center,
+        plan.panel_width,
+        plan.panel_height,
+        plan.board_width,
+        plan.board_height,
+        plan.num_x,
+        plan.num_y,
+        args.hrail,
+        args.vrail,
+        args.vscoreextends,
+    )
+    if plan.nested:
+        lines = []
+    elif plan.cuts is not None:
+        lines, _, _ = cut_vscore_layout(
+            plan.array_center,
+            plan.panel_width,
+            plan.panel_height,
+            plan.cuts,
+            args.vscoreextends,
+        )
+    bites = []
+    if args.tabs:
+        lines = []
+        _, bites = tab_layout(args, plan, root, report=False)
+
+    def mm(value):
+        return round(value / SCALE, 6)
+
+    print(
+        json.dumps(
+            {
+                "board": args.sourceBoardFile,
+                "num_x": plan.num_x,
+                "num_y": plan.num_y,
+                "board_width": mm(plan.board_width),
+                "board_height": mm(plan.board_height),
+                "panel_width": mm(plan.panel_width),
+                "panel_height": mm(plan.panel_height),
+                "vscores": [
+                    {"start": [mm(sx), mm(sy)], "end": [mm(ex), mm(ey)]}
+                    for sx, sy, ex, ey in lines
+                ],
+                "layouts": [
+                    dict(fit._asdict(), description=describe_fit(args, fit))
+                    for fit in fits
+                ],
+                "nested": plan.nested,
+                "copies": [
+                    {
+                        "x": copy.x,
+                        "y": copy.y,
+                        "dx": mm(copy.dx),
+                        "dy": mm(copy.dy),
+                        "angle": copy.angle,
+                        "flip": copy.flip,
+                    }
+                    for copy in plan.copies
+                ],
+                "designs": [
+                    {
+                        "board": design.path,
+                        "dx": mm(design.offset.x),
+                        "dy": mm(design.offset.y),
+                        "copies": [
+                            {"dx": mm(copy.dx), "dy": mm(copy.dy)}
+                            for copy in design.copies
+                        ],
+                    }
+                    for design in plan.designs
+                ],
+                "tabs": [
+                    {"at": [mm(x), mm(y)], "holes": len(holes)}
+                    for (x, y), holes in bites
+                ],
+            },
+            indent=2,
+        )
+    )
+
+
+def read_price_table(path):
+    """
+    Read a panel price table.
+
+    The CSV file has width and height columns with the panel size in mm and
+    a price column with the price of one panel; other columns are ignored.
+    Returns a list of (width, height, price).
+    """
+    try:
+        with open(path, encoding="utf-8", newline="") as table:
+            return [
+                (float(row["width"]), float(row["height"]), float(row["price"]))
+                for row in csv.DictReader(table)
+            ]
+    except (OSError, KeyError, TypeError, ValueError) as error:
+        print(f"Can't read the price table {path}: {error}. Quitting.")
+        sys.exit(1)
+
+
+def _number_list(text, option):
+    """Parse a comma separated list of whole millimetres."""
+    try:
+        return sorted({int(value) for value in text.split(",")})
+    except ValueError:
+        print(f"{option} takes a comma separated list of numbers. Quitting.")
+        sys.exit(1)
+
+
+def sweep_panels(args, bbox_width, bbox_height, prices):
+    """
+    Work out the boards per panel and cost per board of every configuration.
+
+    Every priced panel size is tried with every combination of --rails for
+    the left/right and top/bottom rails and every --paddings value, and with
+    --fit the board turned 90 degrees too. Configurations that fit no board,
+    make a panel under MIN_PANEL_SIZE_MM or leave a rail too narrow for its
+    text are left out.
+
+    Returns (results, excluded): SweepResult tuples sorted by cost per board,
+    and a Counter of the reasons configurations were left out.
+    """
+    rails = _number_list(args.rails, "--rails")
+    paddings = _number_list(args.paddings or str(args.padding), "--paddings")
+    h_text = args.hrailtext or args.htitle
+    v_text = args.vrailtext or args.vtitle
+    line_width = DEFAULT_LINE_WIDTH * SCALE
+    orientations = [(bbox_width, bbox_height, False)]
+    if args.fit and args.engine != "sexpr":
+        orientations.append((bbox_height, bbox_width, True))
+
+    results = []
+    excluded = Counter()
+    for width, height, price in prices:
+        for (bbox_x, bbox_y, rotated), h_rail_width, v_rail_width, padding in (
+            itertools.product(orientations, rails, rails, paddings)
+        ):
+            if (h_text and h_rail_width < MIN_RAIL_WIDTH_FOR_TEXT) or (
+                v_text and v_rail_width < MIN_RAIL_WIDTH_FOR_TEXT
+            ):
+                excluded["rail too narrow for its text"] += 1
+                continue
+            pitch_x = bbox_x + padding * SCALE
+            pitch_y = bbox_y + padding * SCALE
+            num_x = fit_count(width, h_rail_width, pitch_x)
+            num_y = fit_count(height, v_rail_width, pitch_y)
+            if not num_x or not num_y:
+                excluded["no board fits"] += 1
+                continue
+
+            # the same arithmetic as plan_panel()
+            array_width = bbox_x + (num_x - 1) * pitch_x
+            array_height = bbox_y + (num_y - 1) * pitch_y
+            panel_width = (
+                int(array_width + (2 * h_rail_width + padding) * SCALE) + line_width
+            )
+            panel_height = (
+                int(array_height + (2 * v_rail_width + padding) * SCALE) + line_width
+            )
+            if min(panel_width, panel_height) / SCALE < MIN_PANEL_SIZE_MM:
+                excluded[f"under {MIN_PANEL_SIZE_MM}x{MIN_PANEL_SIZE_MM}mm"] += 1
+                continue
+
+            boards = num_x * num_y
+            results.append(
+                SweepResult(
+                    price / boards,
+                    boards,
+                    num_x,
+                    num_y,
+                    width,
+                    height,
+                    price,
+                    h_rail_width,
+                    v_rail_width,
+                    padding,
+                    rotated,
+                    panel_width,
+                    panel_height,
+                )
+            )
+    results.sort(
+        key=lambda r: (
+            r.cost,
+            -r.boards,
+            r.width * r.height,
+            r.panel_width * r.panel_height,
+        )
+    )
+    return results, excluded
+
+
+def print_sweep(args, results, excluded):
+    """Print the cheapest configurations of a sweep and the options for the best."""
+    total = len(results) + sum(excluded.values())
+    print(f"Swept {total} configurations, {len(results)} make a panel")
+    for reason, count in sorted(excluded.items()):
+        print(f"  {count} left out: {reason}")
+    if not results:
+        return
+
+    print(
+        f"{'rank':>4} {'panel':>11} {'price':>9} {'boards':>6} {'grid':>7} "
+        f"{'hrail':>5} {'vrail':>5} {'pad':>3} {'rot':>3} {'size':>13} {'per board':>9}"
+    )
+    for rank, result in enumerate(results[: args.sweeptop], 1):
+        panel = f"{result.width:g}x{result.height:g}"
+        grid = f"{result.num_x}x{result.num_y}"
+        size = f"{result.panel_width / SCALE:g}x{result.panel_height / SCALE:g}"
+        print(
+            f"{rank:>4} {panel:>11} {result.price:>9.2f} {result.boards:>6} "
+            f"{grid:>7} {result.hrail:>5} {result.vrail:>5} {result.padding:>3} "
+            f"{'yes' if result.rotated else 'no':>3} {size:>13} {result.cost:>9.4f}"
+        )
+
+    best = results[0]
+    options = (
+        f"--panelx={best.width:g} --panely={best.height:g} --hrail={best.hrail} "
+        f"--vrail={best.vrail} --padding={best.padding}"
+    )
+    if best.rotated:
+        options += " --fit"
+    print(f"Best: {options}")
+
+
+def sweep(args):
+    """Sweep panel sizes, rails and padding, reading only the board outline."""
+    prices = read_price_table(args.sweep)
+    with open(args.sourceBoardFile, encoding="utf-8") as source:
+        root = scan_edge_cuts(source.read())
+    left, top, right, bottom = sexpr_edge_bbox(root)
+    start = time.perf_counter()
+    results, excluded = sweep_panels(args, right - left, bottom - top, prices)
+    print_sweep(args, results, excluded)
+    print(f"Evaluated in {time.perf_counter() - start:.3f}s")
+
+
+def print_report(
+    args, num_x, num_y, board_width, board_height, panel_width, panel_height
+):
+    """Print warnings and the panel report."""
+    if (
+        panel_width / SCALE < MIN_PANEL_SIZE_MM
+        or panel_height / SCALE < MIN_PANEL_SIZE_MM
+    ):
+        print(f"Warning: panel is under {MIN_PANEL_SIZE_MM}x{MIN_PANEL_SIZE_MM}mm")
+
+    if args.panelx or args.panely:
+        print(f"You can fit {num_x} x {num_y} boards on the panel")
+
+    print(f"Board dimensions: {board_width / SCALE}x{board_height / SCALE}mm")
+    print(f"Panel dimensions: {panel_width / SCALE}x{panel_height / SCALE}mm")
+
+
+def output_path(source_file):
+    """Return the panelized output file name for a source board."""
+    return os.path.splitext(source_file)[0] + "_panelized.kicad_pcb"
+
+
+def add_panel_frame(args, board, layertable, plan, title_text, output_file, tabs=None):
+    """
+    Add the panel outline, v-scores, rail text and report text to a board.
+
+    With tabs, the (lines, bites) from tab_layout() replace the outline and
+    v-scores. Returns the final (panel_width, panel_height) in internal units.
+    """
+    array_center = plan.array_center
+
+    # create panel outline, or the outlines and mouse-bites of a tabbed panel
+    if tabs is not None:
+        lines, bites = tabs
+        for start_x, start_y, end_x, end_y in lines:
+            create_edge_cut(
+                board, start_x, start_y, end_x, end_y, layertable["Edge.Cuts"]
+            )
+        for centre, holes in bites:
+            create_mouse_bites(board, centre, holes)
+    else:
+        create_panel_outline(
+            board,
+            array_center,
+            plan.array_width,
+            plan.array_height,
+            args.hrail,
+            args.vrail,
+            args.padding,
+            layertable["Edge.Cuts"],
+        )
+
+    # get final panel dimensions, a tabbed panel without rails is only as big
+    # as its boards, so it keeps the planned size like the sexpr engine
+    panel_bbox = board.GetBoardEdgesBoundingBox()
+    panel_width = panel_bbox.GetWidth()
+    panel_height = panel_bbox.GetHeight()
+    if tabs is not None:
+        panel_width, panel_height = plan.panel_width, plan.panel_height
+    panel_center = array_center
+
+    # add v-scores, nested and tabbed boards have no straight lines between
+    # them and packed designs only have them along their cuts
+    if plan.nested or tabs is not None:
+        vscore_bottom = int(panel_center.y + panel_height / 2)
+    elif plan.cuts is not None:
+        lines, labels, vscore_bottom = cut_vscore_layout(
+            panel_center, panel_width, panel_height, plan.cuts, args.vscoreextends
+        )
+        create_vscores(
+            board,
+            layertable,
+            lines,
+            labels,
+            args.vscorelayer,
+            args.vscoretextlayer,
+            args.vscoretext,
+        )
+    else:
+        vscore_bottom = add_vscores(
+            board,
+            layertable,
+            panel_center,
+            panel_width,
+            panel_height,
+            plan.board_width,
+            plan.board_height,
+            plan.num_x,
+            plan.num_y,
+            args.hrail,
+            args.vrail,
+            args.vscoreextends,
+            args.vscorelayer,
+            args.vscoretextlayer,
+            args.vscoretext,
+        )
+
+    # add rail and title text
+    for text, pos_x, pos_y, angle in rail_text_items(
+        args, panel_center, panel_width, panel_height, title_text
+    ):
+        add_rail_text(board, text, pos_x, pos_y, angle=angle)
+
+    # add report text
+    report = pcbnew.PCB_TEXT(board)
+    text = report_text(args, output_file, plan.num_x, plan.num_y)
+    report_y = vscore_bottom + 10 * SCALE
+    report_layer = layertable["User.Comments"]
+    report_id = frame_uuid(
+        "text", layer_uuid_name(report_layer), text, panel_center.x, report_y, 0
+    )
+    set_uuid(report, report_id)
+    report.SetText(text)
+    report.SetTextSize(pcbnew.VECTOR2I(SCALE, SCALE))
+    report.SetLayer(report_layer)
+    report.SetHorizJustify(pcbnew.GR_TEXT_H_ALIGN_CENTER)
+    report.SetPosition(pcbnew.VECTOR2I(panel_center.x, report_y))
+    board.Add(report)
+
+    return panel_width, panel_height
+
+
+def panelize_pcbnew(args):
+    """Panelize a board by loading it with pcbnew."""
+    source_file = args.sourceBoardFile
+    output_file = output_path(source_file)
+    profiler = args.profiler
+
+    with profiler.phase("import pcbnew"):
+        import_pcbnew()
+
+    # load source board
+    with profiler.phase("load board"):
+        board = pcbnew.LoadBoard(source_file)
+        layertable = get_layertable(board)
+    designs = design_list(args)
+    design_boards = {}
+    if args.designs:
+        with profiler.phase("load designs", len(designs) - 1):
+            for path, _ in designs[1:]:
+                design_boards[path] = pcbnew.LoadBoard(path)
+
+    # leave out what the panel doesn't need before anything is copied
+    if args.include_layers or args.exclude_layers or args.exclude_items:
+        with profiler.phase("filter items") as phase:
+            phase.items = filter_board(args, board)
+            for design_board in design_boards.values():
+                phase.items += filter_board(args, design_board)
+        print(f"Left out {phase.items} item(s) of the source board")
+
+    # get board dimensions, the array and panel follow arithmetically
+    bbox = board.GetBoardEdgesBoundingBox()
+    if args.fit:
+        args, fits = fit_board(
+            args, (bbox.GetLeft(), bbox.GetTop(), bbox.GetRight(), bbox.GetBottom())
+        )
+        if fits[0].rotated:
+            with profiler.phase("rotate board"):
+                rotate_board(board, bbox.GetCenter())
+            bbox = board.GetBoardEdgesBoundingBox()
+    bbox = (bbox.GetLeft(), bbox.GetTop(), bbox.GetRight(), bbox.GetBottom())
+    root = None
+    if args.nest or args.tabs:
+        # the outline polygon and keepouts come from the board text, read once
+        # and filtered like the board, so left out copper doesn't hold off tabs
+        with profiler.phase("parse board"):
+            with open(source_file, encoding="utf-8") as source:
+                root = parse_sexpr(source.read())
+            if args.include_layers or args.exclude_layers or args.exclude_items:
+                sexpr_filter_items(args, root, sexpr_layertable(root))
+    if args.nest:
+        with profiler.phase("nest boards"):
+            plan = nest_panel(args, bbox, root)
+    elif args.designs:
+        with profiler.phase("pack designs", sum(count for _, count in designs)):
+            bboxes = [bbox]
+            for path, _ in designs[1:]:
+                design_bbox = design_boards[path].GetBoardEdgesBoundingBox()
+                bboxes.append(
+                    (
+                        design_bbox.GetLeft(),
+                        design_bbox.GetTop(),
+                        design_bbox.GetRight(),
+                        design_bbox.GetBottom(),
+                    )
+                )
+            plan = pack_designs(args, bboxes, designs)
+    else:
+        plan = plan_panel(args, bbox)
+    num_x = plan.num_x
+    num_y = plan.num_y
+    board_width = plan.board_width
+    board_height = plan.board_height
+
+    # placements come from the source footprints, before they are duplicated
+    if args.cpl:
+        with profiler.phase("assembly files", len(board.GetFootprints())):
+            write_assembly_files(pcbnew_placements(board), plan, output_file, args.cpl)
+
+    # refill copy (0,0) only, and the other designs, while their outlines are
+    # there to clip the fills to; the copies then carry the fills
+    translate_fills = args.keepfills
+    if args.refill == "source":
+        with profiler.phase("refill source zones") as phase:
+            timings = []
+            for source in (board, *design_boards.values()):
+                zones = list(source.Zones())
+                timings += refill_zones(source, zones, args.refill_timing)
+                phase.items += len(zones)
+        print_fill_times(board, phase.items, timings)
+        translate_fills = True
+
+    # erase the source outline rather than duplicating it only to delete it,
+    # from a copy of the board's live list of drawings
+    drawings = []
+    with profiler.phase("delete edge cuts") as phase:
+        for drawing in list(board.GetDrawings()):
+            if drawing.IsOnLayer(layertable["Edge.Cuts"]):
+                drawing.DeleteStructure()
+                phase.items += 1
+            else:
+                drawings.append(drawing)
+
+    # the other designs are copied in where their first board goes, then they
+    # are duplicated like the source board; pcbnew's item lists are live, so
+    # the source board's are copied before anything is added
+    inserter = BoardInserter(board, args.bulkadd)
+    sources = [
+        DesignItems(
+            list(board.GetTracks()),
+            drawings,
+            list(board.GetFootprints()),
+            list(board.Zones()),
+            copy_offsets(plan),
+        )
+    ]
+    if plan.designs:
+        with profiler.phase("import designs", len(plan.designs)):
+            for number, design in enumerate(plan.designs, 1):
+                items = import_design(
+                    board,
+                    design_boards[design.path],
+                    design.path,
+                    number,
+                    design.offset,
+                    layertable["Edge.Cuts"],
+                    inserter,
+                )
+                offsets = copy_offsets(plan, design.copies)
+                sources.append(items._replace(offsets=offsets))
+
+    # plot the source once for step and repeat instead of duplicating it
+    if args.gerber:
+        panel_width, panel_height = write_gerbers(
+            args, board, layertable, plan, args.gerber, profiler
+        )
+        print_report(
+            args, num_x, num_y, board_width, board_height, panel_width, panel_height
+        )
+        print(f"Gerber and drill files written to {args.gerber}")
+        return {
+            "output": args.gerber,
+            "num_x": num_x,
+            "num_y": num_y,
+            "panel_width": panel_width / SCALE,
+            "panel_height": panel_height / SCALE,
+        }
+
+    # duplicate all board items
+    if args.groupcopy:
+        # zone fills travel with the group copies, so only report missing ones
+        source = sources[0]
+        items = list(
+            itertools.chain(
+                source.tracks, source.drawings, source.footprints, source.zones
+            )
+        )
+        unfilled = sum(not zone.IsFilled() for zone in source.zones)
+        with profiler.phase("duplicate groups", len(items)):
+            duplicate_as_groups(
+                board,
+                items,
+                source.offsets,
+                args.groupcopy == "keep",
+                inserter=inserter,
+            )
+    else:
+        unfilled = 0
+        with profiler.phase("duplicate tracks") as phase:
+            for source in sources:
+                phase.items += len(source.tracks)
+                duplicate_board_items(
+                    board, source.tracks, source.offsets, inserter=inserter
+                )
+        with profiler.phase("duplicate drawings") as phase:
+            for source in sources:
+                phase.items += len(source.drawings)
+                duplicate_board_items(
+                    board, source.drawings, source.offsets, inserter=inserter
+                )
+        with profiler.phase("duplicate footprints") as phase:
+            for source in sources:
+                phase.items += len(source.footprints)
+                duplicate_footprints(
+                    board,
+                    source.offsets,
+                    inserter=inserter,
+                    footprints=source.footprints,
+                )
+        with profiler.phase("duplicate zones") as phase:
+            for source in sources:
+                phase.items += len(source.zones)
+                unfilled += duplicate_zones(
+                    board,
+                    source.offsets,
+                    translate_fills,
+                    inserter=inserter,
+                    zones=source.zones,
+                )
+    with profiler.phase("build connectivity"):
+        inserter.finish()
+    profiler.counters["connectivity updates"] = inserter.connectivity_updates
+    if unfilled and args.refill != "panel":
+        print(
+            f"Warning: {unfilled} zone(s) are not filled in the source board, "
+            "refill them before panelizing to keep their fills"
+        )
+    if board.GetAreaCount() and args.refill != "panel":
+        if any(copy.flip for copy in plan.copies):
+            print(
+                "Warning: the zones of flipped boards are not filled, "
+                "use --refill=panel to fill them"
+            )
+
+    tabs = None
+    if args.tabs:
+        with profiler.phase("place tabs"):
+            tabs = tab_layout(args, plan, root)
+
+    with profiler.phase("outline and v-scores"):
+        panel_width, panel_height = add_panel_frame(
+            args, board, layertable, plan, get_title_text(board), output_file, tabs
+        )
+
+    # full refill, for when the panel adds copper or changes nets
+    if args.refill == "panel":
+        with profiler.phase("refill panel zones", board.GetAreaCount()) as phase:
+            timings = refill_zones(board, board.Zones(), args.refill_timing)
+        print_fill_times(board, phase.items, timings)
+
+    # save output
+    with profiler.phase("save board"):
+        board.Save(output_file)
+
+    # plot the panel from memory, named after the panel rather than the source
+    if args.plot:
+        board.SetFileName(output_file)
+        plot_panel(args, board, layertable, args.plot, profiler)
+
+    print_report(
+        args, num_x, num_y, board_width, board_height, panel_width, panel_height
+    )
+
+    return {
+        "output": output_file,
+        "num_x": num_x,
+        "num_y": num_y,
+        "panel_width": panel_width / SCALE,
+        "panel_height": panel_height / SCALE,
+    }
+
+
+def panelize_sexpr(args):
+    """
+    Panelize a board by rewriting its S-expression text, without pcbnew.
+
+    Every copy is a translation of the source items, so the outline, v-score
+    and rail text geometry is shared with the pcbnew engine.
+    """
+    source_file = args.sourceBoardFile
+    output_file = args.update or output_path(source_file)
+    profiler = args.profiler
+
+    # load source board
+    with profiler.phase("parse board"):
+        with open(source_file, encoding="utf-8") as source:
+            root = parse_sexpr(source.read())
+    layertable = sexpr_layertable(root)
+    id_node = _sexpr_id_node(root)
+    edge_cuts = layertable["Edge.Cuts"]
+
+    # leave out what the panel doesn't need before tabs are placed around it
+    if args.include_layers or args.exclude_layers or args.exclude_items:
+        with profiler.phase("filter items") as phase:
+            phase.items = sexpr_filter_items(args, root, layertable)
+        print(f"Left out {phase.items} item(s) of the source board")
+
+    # get board dimensions
+    bbox = sexpr_edge_bbox(root)
+    if args.fit:
+        args, _ = fit_board(args, bbox, rotate=False)
+    if args.nest:
+        with profiler.phase("nest boards"):
+            plan = nest_panel(args, bbox, root, rotate=False)
+    else:
+        plan = plan_panel(args, bbox)
+    h_rail_width = args.hrail
+    v_rail_width = args.vrail
+    num_x = plan.num_x
+    num_y = plan.num_y
+    board_width = plan.board_width
+    board_height = plan.board_height
+
+    if args.cpl:
+        placements = sexpr_placements(root)
+        with profiler.phase("assembly files", len(placements)):
+            write_assembly_files(placements, plan, output_file, args.cpl)
+
+    # tabs are placed from the source outline and items, before they change
+    tabs = None
+    if args.tabs:
+        with profiler.phase("place tabs"):
+            tabs = tab_layout(args, plan, root)
+
+    # drop the source outline, then duplicate all board items
+    items, kept, header = sexpr_board_items(root, edge_cuts)
+    root[1:] = kept
+
+    copy_ids = [[] for _ in items]
+    with profiler.phase("duplicate items", len(items)):
+        for index, copy in grid_copies(items, plan):
+            root.append(copy)
+            copy_ids[index].append(_item_id(copy))
+
+    # create panel outline, or the outlines and mouse-bites of a tabbed panel
+    if tabs is not None:
+        tab_lines, bites = tabs
+        for start_x, start_y, end_x, end_y in tab_lines:
+            root.append(sexpr_line(start_x, start_y, end_x, end_y, edge_cuts, id_node))
+        for centre, holes in bites:
+            root.append(sexpr_mouse_bites(centre, holes, id_node))
+    else:
+        for start_x, start_y, end_x, end_y in outline_edges(*plan.outline):
+            root.append(sexpr_line(start_x, start_y, end_x, end_y, edge_cuts, id_node))
+
+    # get final panel dimensions
+    panel_width = plan.panel_width
+    panel_height = plan.panel_height
+    panel_center = plan.array_center
+
+    # add v-scores
+    lines, labels, vscore_bottom = vscore_layout(
+        panel_center,
+        panel_width,
+        panel_height,
+        board_width,
+        board_height,
+        num_x,
+        num_y,
+        h_rail_width,
+        v_rail_width,
+        args.vscoreextends,
+    )
+    if plan.nested or tabs is not None:
+        lines = labels = []
+        vscore_bottom = int(panel_center.y + panel_height / 2)
+    for start_x, start_y, end_x, end_y in lines:
+        root.append(
+            sexpr_line(
+                start_x, start_y, end_x, end_y, layertable[args.vscorelayer], id_node
+            )
+        )
+    for pos_x, pos_y, angle, justify in labels:
+        root.append(
+            sexpr_text(
+                args.vscoretext,
+                pos_x,
+                pos_y,
+                layertable[args.vscoretextlayer],
+                angle=angle,
+                size=V_SCORE_TEXT_SIZE,
+                thickness=V_SCORE_TEXT_THICKNESS,
+                justify=justify,
+                id_node=id_node,
+            )
+        )
+
+    # add rail and title text
+    title_text = sexpr_title_text(root)
+    for text, pos_x, pos_y, angle in rail_text_items(
+        args, panel_center, panel_width, panel_height, title_text
+    ):
+        root.append(
+            sexpr_text(
+                text,
+                pos_x,
+                pos_y,
+                layertable["F.SilkS"],
+                angle=angle,
+                justify="left",
+                id_node=id_node,
+            )
+        )
+
+    # add report text
+    root.append(
+        sexpr_text(
+            report_text(args, output_file, num_x, num_y),
+            panel_center.x,
+            vscore_bottom + 10 * SCALE,
+            layertable["User.Comments"],
+            id_node=id_node,
+        )
+    )
+
+    # save output
+    with profiler.phase("save board"):
+        with open(output_file, "w", encoding="utf-8") as output:
+            output.write(format_sexpr(root))
+        write_snapshot(args, output_file, bbox, header, items, copy_ids)
+
+    print_report(
+        args, num_x, num_y, board_width, board_height, panel_width, panel_height
+    )
+
+    return {
+        "output": output_file,
+        "num_x": num_x,
+        "num_y": num_y,
+        "panel_width": panel_width / SCALE,
+        "panel_height": panel_height / SCALE,
+    }
+
+
+# Incremental update: patches a previous sexpr panel in place, using the
+# snapshot of the source items written next to it
+
+# the first uuid/tstamp of a top level item is its own, nested ones come later
+_CHUNK_ID = re.compile(r'\((?:uuid|tstamp)\s+"?([^\s")]+)')
+
+# top level nodes KiCad rewrites on every save
+_VOLATILE_NODES = {"generator", "generator_version"}
+
+
+def snapshot_path(panel_file):
+    """Return the snapshot file name for a panel."""
+    return os.path.splitext(panel_file)[0] + ".snapshot.json"
+
+
+def _nodes_hash(nodes):
+    """Hash the text of some parsed nodes."""
+    digest = hashlib.sha256()
+    for node in nodes:
+        if isinstance(node, list):
+            digest.update(format_sexpr(node).encode())
+    return digest.hexdigest()[:16]
+
+
+def snapshot_options(args):
+    """Hash the options that shape the panel, so an update can check them."""
+    options = {
+        key: value
+        for key, value in vars(args).items()
+        if key not in _UNCACHED_OPTIONS and key not in ("argv", "update")
+    }
+    text = json.dumps([__version__, options], sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+def source_snapshot(items):
+    """
+    Map the id of every source item to the hash of its text.
+
+    Returns None if an item has no id or shares it with another item, as such
+    items can't be found again in the panel.
+    """
+    hashes = {}
+    for item in items:
+        item_id = _item_id(item)
+        if item_id is None or item_id in hashes:
+            return None
+        hashes[item_id] = _nodes_hash([item])
+    return hashes
+
+
+def write_snapshot(args, panel_file, bbox, header, items, copy_ids):
+    """
+    Record the source items of a panel and the ids of their copies.
+
+    Args:
+        args: Parsed arguments the panel was built with
+        panel_file: Path of the panel
+        bbox: Source Edge.Cuts bounding box
+        header: Top level source nodes that aren't copied
+        items: Source items copied to every board
+        copy_ids: Ids of the copies of each item, in grid order
+    """
+    hashes = source_snapshot(items)
+    snapshot = {
+        "options": snapshot_options(args),
+        "bbox": list(bbox),
+        "header": _nodes_hash(n for n in header if n[0] not in _VOLATILE_NODES),
+        "items": None,
+    }
+    if hashes is not None:
+        snapshot["items"] = {
+            item_id: [item_hash, ids]
+            for (item_id, item_hash), ids in zip(hashes.items(), copy_ids)
+        }
+    with open(snapshot_path(panel_file), "w", encoding="utf-8") as output:
+        json.dump(snapshot, output)
+
+
+def _split_panel(text):
+    """
+    Split panel text into its head and the text of each top level node.
+
+    Top level nodes start on a line indented by one tab, in KiCad's files as
+    well as ours. The opening bracket of each node is left out.
+    """
+    body = text.rstrip()
+    if not body.endswith(")"):
+        return None, []
+    parts = body[:-1].rstrip().split("\n\t(")
+    return parts[0], parts[1:]
+
+
+def _format_chunk(node):
+    """Format a top level node as a chunk of _split_panel() output."""
+    out = []
+    _format_node(node, 1, out)
+    return "".join(out)[1:]
+
+
+def _join_panel(head, chunks):
+    """Join the output of _split_panel() back into panel text."""
+    return head + "".join("\n\t(" + chunk for chunk in chunks) + "\n)\n"
+
+
+def update_panel(args):
+    """
+    Patch a panel built by the sexpr engine after the source board changed.
+
+    The source items are compared with the snapshot of the previous run by
+    uuid, and only the copies of added, changed and removed items are
+    rewritten, leaving the rest of the panel text alone. The whole panel is
+    rebuilt if there is no usable snapshot, or the options, outline, nets or
+    board setup changed.
+    """
+    source_file = args.sourceBoardFile
+    panel_file = args.update
+    profiler = args.profiler
+
+    # load source board
+    with profiler.phase("parse board"):
+        with open(source_file, encoding="utf-8") as source:
+            root = parse_sexpr(source.read())
+    layertable = sexpr_layertable(root)
+    bbox = sexpr_edge_bbox(root)
+    source_args = args
+    if args.fit:
+        args, _ = fit_board(args, bbox, rotate=False, report=False)
+    if args.nest:
+        plan = nest_panel(args, bbox, root, rotate=False, report=False)
+    else:
+        plan = plan_panel(args, bbox)
+    if args.include_layers or args.exclude_layers or args.exclude_items:
+        sexpr_filter_items(args, root, layertable)
+    items, _, header = sexpr_board_items(root, layertable["Edge.Cuts"])
+    hashes = source_snapshot(items)
+
+    # check the previous panel can be patched
+    try:
+        with open(snapshot_path(panel_file), encoding="utf-8") as snapshot_file:
+            snapshot = json.load(snapshot_file)
+    except (OSError, ValueError):
+        snapshot = None
+    reason = None
+    if snapshot is None or not os.path.exists(panel_file):
+        reason = "no snapshot of the previous panel"
+    elif snapshot["options"] != snapshot_options(args):
+        reason = "the options changed"
+    elif snapshot["bbox"] != list(bbox):
+        reason = "the board outline changed"
+    elif snapshot["header"] != _nodes_hash(
+        n for n in header if n[0] not in _VOLATILE_NODES
+    ):
+        reason = "the nets or board setup changed"
+    elif hashes is None or snapshot["items"] is None:
+        reason = "some items have no uuid"
+    if reason:
+        print(f"Rebuilding the whole panel, {reason}")
+        return panelize_sexpr(source_args)
+
+    if args.cpl:
+        placements = sexpr_placements(root)
+        with profiler.phase("assembly files", len(placements)):
+            write_assembly_files(placements, plan, panel_file, args.cpl)
+
+    # diff the source against the snapshot
+    previous = snapshot["items"]
+    removed = [item_id for item_id in previous if item_id not in hashes]
+    changed = [
+        item_id
+        for item_id, item_hash in hashes.items()
+        if item_id in previous and previous[item_id][0] != item_hash
+    ]
+    added = [item_id for item_id in hashes if item_id not in previous]
+    stale = set()
+    for item_id in removed + changed:
+        stale.add(item_id)
+        stale.update(previous[item_id][1])
+    if args.tabs and (stale or added):
+        print("Rebuilding the whole panel, the tabs are placed round the items")
+        return panelize_sexpr(source_args)
+
+    if stale or added:
+        with profiler.phase("read panel"):
+            with open(panel_file, encoding="utf-8") as panel:
+                head, chunks = _split_panel(panel.read())
+
+        # drop the old copies of removed and changed items
+        with profiler.phase("remove items", len(stale)):
+            kept = []
+            for chunk in chunks:
+                match = _CHUNK_ID.search(chunk)
+                if match is None or match.group(1) not in stale:
+                    kept.append(chunk)
+        if head is None or len(chunks) - len(kept) != len(stale):
+            print("Rebuilding the whole panel, it was edited since it was built")
+            return panelize_sexpr(source_args)
+
+        # add the new copies of changed and added items
+        fresh_ids = set(changed + added)
+        fresh = [item for item in items if _item_id(item) in fresh_ids]
+        copy_ids = [[] for _ in fresh]
+        with profiler.phase("add items", len(fresh)):
+            for item in fresh:
+                kept.append(_format_chunk(item))
+            for index, copy in grid_copies(fresh, plan):
+                kept.append(_format_chunk(copy))
+                copy_ids[index].append(_item_id(copy))
+
+        with profiler.phase("save board"):
+            temp_file = panel_file + ".tmp"
+            with open(temp_file, "w", encoding="utf-8") as output:
+                output.write(_join_panel(head, kept))
+            os.replace(temp_file, panel_file)
+            for item, ids in zip(fresh, copy_ids):
+                item_id = _item_id(item)
+                previous[item_id] = [hashes[item_id], ids]
+            for item_id in removed:
+                del previous[item_id]
+            with open(snapshot_path(panel_file), "w", encoding="utf-8") as output:
+                json.dump(snapshot, output)
+
+    if stale or added:
+        print(
+            f"Updated {len(added)} added, {len(changed)} changed and "
+            f"{len(removed)} removed item(s) on {plan.num_x * plan.num_y} boards"
+        )
+    else:
+        print("The panel is already up to date")
+    print_report(
+        args,
+        plan.num_x,
+        plan.num_y,
+        plan.board_width,
+        plan.board_height,
+        plan.panel_width,
+        plan.panel_height,
+    )
+
+    return {
+        "output": panel_file,
+        "num_x": plan.num_x,
+        "num_y": plan.num_y,
+        "panel_width": plan.panel_width / SCALE,
+        "panel_height": plan.panel_height / SCALE,
+    }
+
+
+# Output cache: an unchanged board with unchanged options is copied from a
+# previous run instead of being panelized again
+
+# fields KiCad rewrites on every save without the design changing
+_VOLATILE_FIELDS = re.compile(rb"\((?:generator|generator_version|host)\s[^()]*\)")
+_QUOTED_BYTES = re.compile(rb'("(?:[^"\\]|\\.)*")')
+
+# options that don't change the panel
+_UNCACHED_OPTIONS = {
+    "sourceBoardFiles",
+    "batch",
+    "jobs",
+    "summary",
+    "profile",
+    "cprofile",
+    "profiler",
+    "cache",
+    "cachedir",
+    "cachesize",
+    "no_cache",
+    "argv",
+}
+
+
+class _Tee(io.StringIO):
+    """Records everything written while still passing it on to a stream."""
+
+    def __init__(self, stream):
+        super().__init__()
+        self.stream = stream
+
+    def write(self, text):
+        self.stream.write(text)
+        return super().write(text)
+
+
+def default_cache_dir():
+    """Return the per-user cache directory."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "kicad-panelizer")
+
+
+def kicad_version(cache_dir):
+    """
+    Return the version of the installed pcbnew, or None if there is none.
+
+    Importing pcbnew is what a cache hit saves, so the version is recorded in
+    the cache directory against the size and time of the pcbnew module files,
+    and pcbnew is only imported again when an upgrade replaces them.
+    """
+    if pcbnew is not None:
+        return pcbnew.Version()
+    try:
+        spec = importlib.util.find_spec("pcbnew")
+    except (ImportError, ValueError):
+        spec = None
+    if spec is None or not spec.origin:
+        return None
+    folder = os.path.dirname(spec.origin)
+    files = [spec.origin] + sorted(
+        os.path.join(folder, name)
+        for name in os.listdir(folder)
+        if name.startswith("_pcbnew")
+    )
+    signature = []
+    for path in files:
+        stat = os.stat(path)
+        signature.append([path, stat.st_size, stat.st_mtime_ns])
+
+    probe = os.path.join(cache_dir, "kicad-version.json")
+    try:
+        with open(probe, encoding="utf-8") as probe_file:
+            record = json.load(probe_file)
+        if record["files"] == signature:
+            return record["version"]
+    except (OSError, ValueError, KeyError):
+        pass
+    version = import_pcbnew().Version()
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(probe, "w", encoding="utf-8") as probe_file:
+            json.dump({"files": signature, "version": version}, probe_file)
+    except OSError:
+        pass
+    return version
+
+
+def cache_key(args):
+    """
+    Hash the source board, any other --designs, the panel options, this
+    script's own source and, for the pcbnew engine, the KiCad version.
+
+    The generator fields KiCad rewrites on every save and the whitespace
+    between tokens are left out, so re-saving an unchanged board still hits
+    the cache. Whitespace inside strings is kept, it is part of the text.
+    """
+    digest = hashlib.sha256()
+    for path, _ in design_list(args):
+        with open(path, "rb") as source:
+            text = _VOLATILE_FIELDS.sub(b"", source.read())
+        # the odd parts are the quoted strings
+        for i, part in enumerate(_QUOTED_BYTES.split(text)):
+            digest.update(part if i % 2 else b" ".join(part.split()))
+    with open(__file__, "rb") as script:
+        digest.update(script.read())
+    # the parsed options, so their order and the spelling of paths don't count
+    options = {
+        key: value
+        for key, value in vars(args).items()
+        if key not in _UNCACHED_OPTIONS
+    }
+    for key in _PATH_OPTIONS | {"sourceBoardFile"}:
+        if isinstance(options.get(key), str):
+            options[key] = os.path.realpath(options[key])
+    if args.designs:
+        options["designs"] = [
+            [os.path.realpath(path), count] for path, count in design_list(args)[1:]
+        ]
+    cache_dir = args.cachedir or default_cache_dir()
+    kicad = kicad_version(cache_dir) if args.engine == "pcbnew" else None
+    digest.update(json.dumps([kicad, options], sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def panel_outputs(args, result, since):
+    """List the files a run wrote: the panel, assembly files and plot files."""
+    paths = []
+    output = output_path(args.sourceBoardFile)
+    if not args.gerber:
+        paths.append(output)
+    if args.engine == "sexpr":
+        paths.append(snapshot_path(output))
+    if args.cpl:
+        base = os.path.splitext(output)[0]
+        paths.extend([base + "-pos.csv", base + "-bom.csv"])
+    for directory in (args.gerber, args.plot):
+        if directory:
+            paths.extend(
+                entry.path
+                for entry in os.scandir(directory)
+                if entry.is_file() and entry.stat().st_mtime >= since
+            )
+    return [path for path in paths if os.path.exists(path)]
+
+
+def restore_cached(args, key):
+    """Copy the outputs of a cached run into place, returning its result or None."""
+    entry = os.path.join(args.cachedir, key)
+    try:
+        with open(os.path.join(entry, "meta.json"), encoding="utf-8") as meta_file:
+            meta = json.load(meta_file)
+        for name, target in meta["files"]:
+            if os.path.dirname(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(os.path.join(entry, name), target)
+    except (OSError, ValueError, KeyError):
+        # a missing or broken entry, stored again after this run
+        shutil.rmtree(entry, ignore_errors=True)
+        return None
+
+    # the entry's meta file time is its last use, for eviction
+    os.utime(os.path.join(entry, "meta.json"))
+    print(meta["log"], end="")
+    print(f"Unchanged since the last run, restored from cache {key[:12]}")
+    return meta["result"]
+
+
+def store_cached(args, key, result, log, since):
+    """Save the outputs of a run in the cache, then trim it to size."""
+    os.makedirs(args.cachedir, exist_ok=True)
+    entry = os.path.join(args.cachedir, key)
+    staging = tempfile.mkdtemp(dir=args.cachedir)
+    files = []
+    for i, path in enumerate(panel_outputs(args, result, since)):
+        shutil.copyfile(path, os.path.join(staging, str(i)))
+        files.append([str(i), path])
+    with open(os.path.join(staging, "meta.json"), "w", encoding="utf-8") as meta:
+        json.dump({"result": result, "log": log, "files": files}, meta)
+    try:
+        os.replace(staging, entry)
+    except OSError:  # stored by a concurrent run in the meantime
+        shutil.rmtree(staging, ignore_errors=True)
+    evict_cache(args.cachedir, args.cachesize * 2**20)
+
+
+def evict_cache(cache_dir, max_bytes):
+    """Remove the least recently used cache entries until the cache fits."""
+    entries = []
+    for entry in os.scandir(cache_dir):
+        meta = os.path.join(entry.path, "meta.json")
+        if entry.is_dir() and os.path.exists(meta):
+            size = sum(f.stat().st_size for f in os.scandir(entry.path))
+            entries.append((os.stat(meta).st_mtime, size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries)[:-1]:
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+
+def panelize(args):
+    """Validate arguments and panelize with the requested engine."""
+    validate_args(args)
+
+    if args.plan:
+        print_plan(args)
+        return {"output": None}
+
+    if args.sweep:
+        sweep(args)
+        return {"output": None}
+
+    # an unchanged board doesn't need pcbnew at all, but a profiled run has
+    # to panelize to have anything to report
+    key = None
+    bypass = args.no_cache or args.update or args.profile or args.cprofile
+    if (args.cache or args.cachedir) and not bypass:
+        args.cachedir = args.cachedir or default_cache_dir()
+        key = cache_key(args)
+        result = restore_cached(args, key)
+        if result is not None:
+            return result
+    since = time.time()
+    log = _Tee(sys.stdout)
+
+    args.profiler = Profiler()
+    profile = None
+    if args.cprofile:
+        profile = cProfile.Profile()
+        profile.enable()
+    try:
+        with redirect_stdout(log):
+            if args.update:
+                result = update_panel(args)
+            elif args.engine == "sexpr":
+                result = panelize_sexpr(args)
+            else:
+                result = panelize_pcbnew(args)
+    finally:
+        if profile:
+            profile.disable()
+            profile.dump_stats(args.cprofile)
+
+    if args.profile:
+        args.profiler.report(args.profile)
+    if key:
+        store_cached(args, key, result, log.getvalue(), since)
+    return result
+
+
+# options that control the batch run itself rather than each job
+_BATCH_OPTIONS = {"sourceBoardFiles", "batch", "jobs", "summary", "argv"}
+
+# options naming a file or directory, "-" being stderr for --profile
+_PATH_OPTIONS = {"gerber", "plot", "update", "profile", "cprofile", "sweep", "cachedir"}
+
+
+def batch_jobs(args):
+    """
+    Build one argument namespace per batch job.
+
+    Jobs come from the positional boards, which all share the command line
+    options, and from the [[job]] tables of the --batch file, whose keys are
+    the long option names and override [defaults] and the command line.
+    """
+    parser = build_parser()
+    specs = [(board, {}) for board in args.sourceBoardFiles]
+
+    if args.batch:
+        if tomllib is None:
+            print("Batch files need Python 3.11 or newer. Quitting.")
+            sys.exit(1)
+        with open(args.batch, "rb") as batch_file:
+            config = tomllib.load(batch_file)
+        base_dir = os.path.dirname(args.batch)
+        for number, job in enumerate(config.get("job", []), 1):
+            options = dict(config.get("defaults", {}))
+            options.update(job)
+            try:
+                board = os.path.join(base_dir, job_board(parser, options))
+            except JobError as error:
+                print(f"Job {number} of {args.batch} has {error}. Quitting.")
+                sys.exit(1)
+            specs.append((board, options))
+
+    return [job_namespace(parser, args, board, options) for board, options in specs]
+
+
+def job_board(parser, options):
+    """
+    Pop the board off a job dict, raising JobError if there is none or if
+    another key isn't a per-board option.
+    """
+    if "board" not in options:
+        raise JobError("no board")
+    board = options.pop("board")
+    if not isinstance(board, str):
+        raise JobError("a board that isn't a path")
+    defaults = vars(parser.parse_args([]))
+    unknown = [
+        key
+        for key in options
+        if key.replace("-", "_") not in defaults or key in _BATCH_OPTIONS
+    ]
+    if unknown:
+        raise JobError(f"unknown option(s) {', '.join(unknown)}")
+    return board
+
+
+def _option_argv(options):
+    """Turn an option dict into long option arguments."""
+    return [
+        f"--{key.replace('_', '-')}"
+        if value is True
+        else f"--{key.replace('_', '-')}={value}"
+        for key, value in options.items()
+        if value is not False and value is not None
+    ]
+
+
+def changed_options(args, defaults):
+    """Return the per-board options of args that differ from their defaults."""
+    return {
+        key: value
+        for key, value in vars(args).items()
+        if key in defaults and key not in _BATCH_OPTIONS and value != defaults[key]
+    }
+
+
+def job_namespace(parser, base_args, board, options):
+    """Build the argument namespace for one job from base args and an option dict."""
+    job_args = copy.copy(base_args)
+    job_args.sourceBoardFile = board
+    parser.parse_args(_option_argv(options), namespace=job_args)
+    job_args.sourceBoardFiles = [board]
+    job_args.argv = [board] + _option_argv(
+        changed_options(job_args, vars(parser.parse_args([])))
+    )
+    return job_args
+
+
+def _init_batch_worker(engines):
+    """Import pcbnew once per worker process if any job needs it."""
+    if "pcbnew" in engines:
+        try:
+            import_pcbnew()
+        except SystemExit:
+            pass  # reported by each job instead
+
+
+def run_job(args):
+    """Run one batch job, returning its status, timing and captured output."""
+    start = time.perf_counter()
+    log = io.StringIO()
+    result = {"board": args.sourceBoardFile, "status": "ok", "output": None}
+    try:
+        with redirect_stdout(log):
+            result.update(panelize(args) or {})
+    except SystemExit:
+        result["status"] = "failed"
+    except Exception as error:  # pylint: disable=broad-exception-caught
+        result["status"] = "failed"
+        log.write(f"{type(error).__name__}: {error}\n")
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    result["log"] = log.getvalue()
+    return result
+
+
+def run_batch(args):
+    """Panelize many boards in a pool of worker processes and print a summary."""
+    jobs = batch_jobs(args)
+    engines = {job.engine for job in jobs}
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(
+        max_workers=max(1, min(args.jobs, len(jobs))),
+        initializer=_init_batch_worker,
+        initargs=(engines,),
+    ) as executor:
+        results = list(executor.map(run_job, jobs))
+
+    for result in results:
+        print(
+            f"{result['status']:<7}{result['seconds']:>8.2f}s  {result['board']}"
+            + (f" -> {result['output']}" if result["output"] else "")
+        )
+        if result["status"] != "ok":
+            for line in result["log"].splitlines():
+                print(f"    {line}")
+
+    failed = sum(result["status"] != "ok" for result in results)
+    total = time.perf_counter() - start
+    print(f"{len(results) - failed}/{len(results)} boards panelized in {total:.2f}s")
+
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as summary:
+            json.dump(results, summary, indent=2)
+
+    if failed:
+        sys.exit(1)
+
+
+class JobError(Exception):
+    """Raised instead of exiting when the options of a job are invalid."""
+
+
+class JobParser(ArgumentParser):
+    """Argument parser for server jobs, raising JobError on invalid options."""
+
+    def error(self, message):
+        raise JobError(message)
+
+
+class PanelServer(ThreadingHTTPServer):
+    """
+    Localhost HTTP server running panel jobs on warm worker processes.
+
+    pcbnew isn't thread-safe, so jobs run in a process pool whose workers
+    import it once at startup. At most queue_size jobs wait for a worker,
+    further submissions are turned away with 503. If a worker dies, its jobs
+    fail and the pool is started again.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, workers, queue_size):
+        super().__init__(address, PanelRequestHandler)
+        self.executor = self.new_executor(workers)
+        self.parser = build_parser(JobParser)
+        self.base_args = parse_args([])
+        self.workers = workers
+        self.queue_size = queue_size
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.latencies = deque(maxlen=100)
+
+    @staticmethod
+    def new_executor(workers):
+        """Start a pool of worker processes with pcbnew imported."""
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_batch_worker,
+            initargs=({"pcbnew"},),
+        )
+
+    def status(self):
+        """Return queue depth and latency statistics."""
+        with self.lock:
+            running = min(self.pending, self.workers)
+            latencies = list(self.latencies)
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "running": running,
+                "queued": self.pending - running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "mean_latency": round(sum(latencies) / len(latencies), 3)
+                if latencies
+                else None,
+                "max_latency": max(latencies, default=None),
+            }
+
+    def run(self, options):
+        """Run a job dict to completion, returning its result or None if full."""
+        with self.lock:
+            if self.pending >= self.workers + self.queue_size:
+                return None
+            self.pending += 1
+
+        start = time.perf_counter()
+        result = {"status": "failed", "log": "The job was interrupted\n"}
+        try:
+            try:
+                board = job_board(self.parser, options)
+                job_args = job_namespace(self.parser, self.base_args, board, options)
+            except (TypeError, JobError, SystemExit) as error:
+                result = {"status": "failed", "log": f"Invalid job: {error}\n"}
+            else:
+                result = self.execute(job_args)
+        finally:
+            latency = round(time.perf_counter() - start, 3)
+            with self.lock:
+                self.pending -= 1
+                self.completed += 1
+                self.failed += result["status"] != "ok"
+                self.latencies.append(latency)
+        result["latency"] = latency
+        return result
+
+    def execute(self, job_args):
+        """Run parsed job arguments on a worker, restarting the pool if it broke."""
+        executor = self.executor
+        try:
+            return executor.submit(run_job, job_args).result()
+        except BrokenProcessPool as error:
+            with self.lock:
+                if self.executor is executor:
+                    self.executor = self.new_executor(self.workers)
+                    executor.shutdown(wait=False)
+            return {"status": "failed", "log": f"A worker process died: {error}\n"}
+
+
+class PanelRequestHandler(BaseHTTPRequestHandler):
+    """Handles POST /jobs and GET /status for the panel server."""
+
+    def _reply(self, code, body):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Report the queue status."""
+        if self.path == "/status":
+            self._reply(200, self.server.status())
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Run a JSON job and reply with its result once it has finished."""
+        if self.path != "/jobs":
+            self._reply(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            options = json.loads(self.rfile.read(length))
+        except ValueError:
+            options = None
+        if not isinstance(options, dict):
+            self._reply(400, {"error": "job must be a JSON object"})
+            return
+        result = self.server.run(options)
+        if result is None:
+            self._reply(503, {"error": "queue is full"})
+        else:
+            self._reply(200, result)
+
+
+def serve(argv):
+    """Run the panel server until interrupted."""
+    parser = ArgumentParser(
+        prog="panelizer.py serve", description="Serve panel jobs over HTTP."
+    )
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="Port to use")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count(), help="Worker processes"
+    )
+    parser.add_argument(
+        "--queue", type=int, default=16, help="Jobs allowed to wait for a worker"
+    )
+    args = parser.parse_args(argv)
+
+    server = PanelServer(("127.0.0.1", args.port), args.workers, args.queue)
+    print(f"Serving panel jobs on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.executor.shutdown()
+
+
+def absolute_paths(options):
+    """
+    Return a copy of a job's option dict with every path in it made absolute.
+
+    The server resolves relative paths against its own working directory, so
+    the client resolves them first.
+    """
+    options = dict(options)
+    for key in _PATH_OPTIONS & options.keys():
+        if key != "profile" or options[key] != "-":
+            options[key] = os.path.abspath(options[key])
+    if options.get("designs"):
+        entries = []
+        for entry in options["designs"].split(","):
+            path, colon, count = entry.strip().rpartition(":")
+            if not count.isdigit():
+                path, colon, count = entry.strip(), "", ""
+            entries.append(os.path.abspath(path) + colon + count if path else "")
+        options["designs"] = ",".join(entries)
+    return options
+
+
+def submit(argv):
+    """Send the job described by argv to a panel server and wait for the result."""
+    client = ArgumentParser(add_help=False)
+    client.add_argument("--port", type=int, default=SERVER_PORT)
+    client_args, argv = client.parse_known_args(argv)
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if len(args.sourceBoardFiles) != 1:
+        print("Specify one *.kicad_pcb file to submit. Quitting.")
+        sys.exit(1)
+
+    options = absolute_paths(changed_options(args, vars(parser.parse_args([]))))
+    options["board"] = os.path.abspath(args.sourceBoardFiles[0])
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{client_args.port}/jobs",
+        data=json.dumps(options).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            result = json.load(response)
+    except urllib.error.HTTPError as error:
+        print(f"Server refused the job: {json.load(error).get('error')}. Quitting.")
+        sys.exit(1)
+    except urllib.error.URLError as error:
+        print(f"Can't reach the panel server: {error.reason}. Quitting.")
+        sys.exit(1)
+
+    print(result["log"], end="")
+    if result["status"] != "ok":
+        sys.exit(1)
+
+
+def main():
+    """Main entry point for the panelizer script."""
+    if sys.argv[1:2] == ["serve"]:
+        serve(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ["submit"]:
+        submit(sys.argv[2:])
+        return
+
+    args = parse_args()
+
+    if args.batch or len(args.sourceBoardFiles) > 1:
+        run_batch(args)
+        return
+
+    if not args.sourceBoardFiles:
+        print("Specify a *.kicad_pcb file or a --batch file. Quitting.")
+        sys.exit(1)
+
+    args.sourceBoardFile = args.sourceBoardFiles[0]
+    panelize(args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,76 @@
+"""
+Shared fixtures for the panelizer tests.
+
+The tests run against the fake pcbnew module of the benchmarks, so they don't
+need KiCad, and build their boards with the benchmarks' synthetic board
+generator. Tests of the pcbnew engine are marked fake_pcbnew, as they only
+show the panelizer works with the fake; test_kicad.py runs the script with
+KiCad's own pcbnew where it is installed.
+"""
+
+import contextlib
+import io
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+sys.path.insert(0, ROOT)
+
+import fake_pcbnew  # pylint: disable=wrong-import-position
+
+sys.modules.setdefault("pcbnew", fake_pcbnew)
+
+import synth  # pylint: disable=wrong-import-position
+import panelizer  # pylint: disable=wrong-import-position
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "fake_pcbnew: runs the pcbnew engine against the fake pcbnew only"
+    )
+
+
+@pytest.fixture
+def pcbnew():
+    """Import the fake pcbnew into panelizer, as a pcbnew engine run does."""
+    panelizer.import_pcbnew()
+    return fake_pcbnew
+
+
+@pytest.fixture
+def make_board(tmp_path):
+    """Return a function writing a synthetic board to the test's directory."""
+
+    def make(name="board", **params):
+        return synth.write(str(tmp_path / f"{name}.kicad_pcb"), **params)
+
+    return make
+
+
+@pytest.fixture
+def run_panel():
+    """
+    Return a function panelizing a board and returning (panel text, output).
+
+    The cache is off unless a run passes --cache or --cachedir, and tests
+    give --cachedir a directory of their own so the user's cache is never
+    touched.
+    """
+
+    def run(path, *options):
+        args = panelizer.parse_args([path, *options])
+        args.sourceBoardFile = path
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            panelizer.panelize(args)
+        panel = panelizer.output_path(path)
+        text = None
+        if os.path.exists(panel):
+            with open(panel, encoding="utf-8") as panel_file:
+                text = panel_file.read()
+        return text, out.getvalue()
+
+    return run
@@ -0,0 +1,62 @@
+"""Tests for the --cpl placement and BOM files."""
+
+import csv
+
+import pytest
+
+import panelizer
+
+
+def read_csv(path):
+    with open(path, encoding="utf-8", newline="") as csv_file:
+        return list(csv.reader(csv_file))
+
+
+@pytest.mark.fake_pcbnew
+def test_engines_write_the_same_files(make_board, run_panel, tmp_path):
+    path = make_board(tracks=20, footprints=5)
+    base = str(tmp_path / "board_panelized")
+    files = {}
+    for engine in ("pcbnew", "sexpr"):
+        run_panel(
+            path, "--numx=3", "--numy=2", "--no-cache", "--cpl", f"--engine={engine}"
+        )
+        files[engine] = [
+            read_csv(base + "-pos.csv"),
+            read_csv(base + "-bom.csv"),
+        ]
+    assert files["pcbnew"] == files["sexpr"]
+    pos, bom = files["sexpr"]
+    assert pos[0] == ["Ref", "Val", "Package", "PosX", "PosY", "Rot", "Side"]
+    assert len(pos) == 1 + 6 * 5
+    assert [row[0] for row in pos[1:7]] == [
+        "R1_1_1",
+        "R1_1_2",
+        "R1_2_1",
+        "R1_2_2",
+        "R1_3_1",
+        "R1_3_2",
+    ]
+    assert sum(int(row[3]) for row in bom[1:]) == 6 * 5
+
+
+@pytest.mark.fake_pcbnew
+def test_jlc_format(make_board, run_panel, tmp_path):
+    path = make_board(tracks=20, footprints=2)
+    run_panel(path, "--numx=2", "--numy=1", "--no-cache", "--cpl=jlc")
+    pos = read_csv(tmp_path / "board_panelized-pos.csv")
+    bom = read_csv(tmp_path / "board_panelized-bom.csv")
+    assert pos[0] == ["Designator", "Mid X", "Mid Y", "Layer", "Rotation"]
+    assert all(row[1].endswith("mm") and row[3] == "Top" for row in pos[1:])
+    assert bom[0] == ["Comment", "Designator", "Footprint"]
+
+
+def test_positions_of_turned_and_flipped_boards():
+    pivot = panelizer.Point(0, 0)
+    part = ("R1", "10k", "R_0603", 2000000, 1000000, 90.0, "top")
+    cells = [("_1_1", 0, 0, 0, False), ("_2_1", 0, 0, 180, False)]
+    cells.append(("_3_1", 0, 0, 0, True))
+    rows = list(panelizer.panel_positions([part], cells, pivot))
+    assert rows[0] == ("R1_1_1", "10k", "R_0603", 2000000, 1000000, 90.0, "top")
+    assert rows[1] == ("R1_2_1", "10k", "R_0603", -2000000, -1000000, 270.0, "top")
+    assert rows[2] == ("R1_3_1", "10k", "R_0603", -2000000, 1000000, 90.0, "bottom")
@@ -0,0 +1,72 @@
+"""Tests for batch runs."""
+
+import json
+import os
+
+import pytest
+
+import panelizer
+
+
+def run_batch(tmp_path, *argv):
+    args = panelizer.parse_args(
+        [*argv, "--engine=sexpr", "--jobs=2", f"--cachedir={tmp_path / 'cache'}"]
+    )
+    panelizer.run_batch(args)
+
+
+def test_batch_file_jobs_override_defaults(make_board, tmp_path, capsys):
+    first = make_board("first", tracks=20, footprints=2)
+    second = make_board("second", tracks=20, footprints=2)
+    batch = tmp_path / "jobs.toml"
+    batch.write_text(
+        "[defaults]\nnumx = 2\nnumy = 2\n\n"
+        '[[job]]\nboard = "first.kicad_pcb"\n\n'
+        '[[job]]\nboard = "second.kicad_pcb"\nnumx = 3\n',
+        encoding="utf-8",
+    )
+    summary = tmp_path / "summary.json"
+    run_batch(tmp_path, f"--batch={batch}", f"--summary={summary}")
+
+    results = json.loads(summary.read_text(encoding="utf-8"))
+    assert [result["status"] for result in results] == ["ok", "ok"]
+    assert [result["board"] for result in results] == [first, second]
+    for result in results:
+        assert os.path.exists(result["output"])
+    assert "2/2 boards panelized" in capsys.readouterr().out
+    with open(results[1]["output"], encoding="utf-8") as panel:
+        root = panelizer.parse_sexpr(panel.read())
+    footprints = [node for node in root[1:] if node[0] == "footprint"]
+    assert len(footprints) == 3 * 2 * 2
+
+
+def test_batch_reports_failed_jobs(make_board, tmp_path, capsys):
+    board = make_board(tracks=20, footprints=2)
+    missing = str(tmp_path / "missing.kicad_pcb")
+    with pytest.raises(SystemExit) as exit_info:
+        run_batch(tmp_path, board, missing, "--numx=2", "--numy=2")
+    out = capsys.readouterr().out
+    assert exit_info.value.code == 1
+    assert "failed" in out and missing in out
+    assert "1/2 boards panelized" in out
+
+
+@pytest.mark.parametrize(
+    "job, message",
+    [
+        ("numx = 3\n", "Job 2 of {batch} has no board. Quitting."),
+        (
+            'board = "first.kicad_pcb"\nnumz = 3\n',
+            "Job 2 of {batch} has unknown option(s) numz. Quitting.",
+        ),
+    ],
+)
+def test_bad_batch_jobs_quit(make_board, tmp_path, capsys, job, message):
+    make_board("first", tracks=20, footprints=2)
+    batch = tmp_path / "jobs.toml"
+    batch.write_text(
+        f'[[job]]\nboard = "first.kicad_pcb"\n\n[[job]]\n{job}', encoding="utf-8"
+    )
+    with pytest.raises(SystemExit):
+        run_batch(tmp_path, f"--batch={batch}", "--numx=2", "--numy=2")
+    assert message.format(batch=batch) in capsys.readouterr().out
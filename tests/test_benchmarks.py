@@ -0,0 +1,56 @@
+"""Tests for the benchmark helpers: the synthetic boards and the fake pcbnew."""
+
+import bench_scaling
+import fake_pcbnew
+import pytest
+import synth
+
+
+def test_synthetic_boards_are_reproducible(tmp_path):
+    first = synth.write(str(tmp_path / "a.kicad_pcb"), tracks=50, footprints=5)
+    second = synth.write(str(tmp_path / "b.kicad_pcb"), tracks=50, footprints=5)
+    other = synth.write(str(tmp_path / "c.kicad_pcb"), tracks=50, footprints=5, seed=2)
+    with open(first, encoding="utf-8") as a, open(second, encoding="utf-8") as b:
+        assert a.read() == b.read()
+    with open(first, encoding="utf-8") as a, open(other, encoding="utf-8") as c:
+        assert a.read() != c.read()
+
+
+@pytest.mark.fake_pcbnew
+def test_load_board_builds_registered_board(make_board):
+    path = make_board(tracks=50, footprints=5, pads=3, zones=2)
+    board = fake_pcbnew.LoadBoard(path)
+    assert board.GetFileName() == path
+    assert len(board.GetTracks()) == 50
+    assert len(board.GetFootprints()) == 5
+    assert all(len(footprint.Pads()) == 3 for footprint in board.GetFootprints())
+    assert board.GetAreaCount() == 2
+    assert board.GetBoardEdgesBoundingBox().GetWidth() > 0
+
+
+@pytest.mark.fake_pcbnew
+def test_item_lists_are_live_views(make_board):
+    board = fake_pcbnew.LoadBoard(make_board(tracks=10, footprints=1))
+    tracks = board.GetTracks()
+    board.Add(tracks[0].Duplicate())
+    assert len(tracks) == 11
+    board.Remove(tracks[0])
+    assert len(tracks) == 10
+    with pytest.raises(TypeError):
+        list(board.GetDrawings()) + tracks  # pylint: disable=expression-not-assigned
+
+
+def test_growth_exponent():
+    quadratic = [(n, 0.5 * n * n) for n in (4, 25, 100)]
+    assert bench_scaling.growth_exponent(quadratic) == pytest.approx(2)
+    assert bench_scaling.growth_exponent([(4, 1.0)]) is None
+
+
+@pytest.mark.fake_pcbnew
+def test_run_once_reports_phases(make_board):
+    path = make_board(**bench_scaling.board_params(10))
+    seconds, peak, phases = bench_scaling.run_once(
+        path, 2, "pcbnew", ["--no-cache"], True
+    )
+    assert seconds > 0 and peak > 0
+    assert phases[-1]["phase"] == "save board"
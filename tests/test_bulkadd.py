@@ -0,0 +1,45 @@
+"""Tests for --bulkadd."""
+
+import pytest
+
+import fake_pcbnew
+import panelizer
+
+pytestmark = pytest.mark.fake_pcbnew
+
+
+def without_report(text):
+    """Drop the report text, which holds the command line."""
+    return [line for line in text.splitlines() if "generated with" not in line]
+
+
+def test_bulkadd_rebuilds_connectivity_once(make_board, run_panel, tmp_path):
+    path = make_board(tracks=40, footprints=4, zones=1)
+    fake_pcbnew.CALLS.clear()
+    target = tmp_path / "profile.json"
+    plain, _ = run_panel(path, "--numx=3", "--numy=3", f"--profile={target}")
+    plain_calls = dict(fake_pcbnew.CALLS)
+    plain_counters = panelizer.json.loads(target.read_text(encoding="utf-8"))
+    fake_pcbnew.CALLS.clear()
+    bulk, _ = run_panel(
+        path, "--numx=3", "--numy=3", "--no-cache", "--bulkadd", f"--profile={target}"
+    )
+    assert without_report(bulk) == without_report(plain)
+    assert fake_pcbnew.CALLS["BuildConnectivity"] == 1
+    # only the fake LoadBoard() building the source board updates it
+    assert fake_pcbnew.CALLS["connectivity update"] == 40 + 4 + 1
+    assert plain_calls["connectivity update"] == 9 * (40 + 4 + 1)
+    counters = panelizer.json.loads(target.read_text(encoding="utf-8"))["counters"]
+    assert counters["connectivity updates"] == 1
+    assert plain_counters["counters"]["connectivity updates"] == 8 * (40 + 4 + 1)
+    assert plain_calls["BOARD.Add"] == fake_pcbnew.CALLS["BOARD.Add"]
+
+
+def test_inserter_without_items_skips_rebuild():
+    board = fake_pcbnew.BOARD()
+    fake_pcbnew.CALLS.clear()
+    inserter = panelizer.BoardInserter(board, bulk=True)
+    inserter.add([])
+    inserter.finish()
+    assert inserter.connectivity_updates == 0
+    assert "BuildConnectivity" not in fake_pcbnew.CALLS
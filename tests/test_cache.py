@@ -0,0 +1,108 @@
+"""Tests for the panel cache."""
+
+import shutil
+
+import pytest
+
+import bench_scaling
+import fake_pcbnew
+import panelizer
+
+
+def key_of(path, tmp_path, *options):
+    args = panelizer.parse_args(
+        [path, "--numx=2", "--numy=2", f"--cachedir={tmp_path / 'cache'}", *options]
+    )
+    args.sourceBoardFile = path
+    return panelizer.cache_key(args)
+
+
+@pytest.mark.fake_pcbnew
+def test_unchanged_board_is_restored(make_board, run_panel, tmp_path):
+    path = make_board(tracks=30, footprints=3, zones=1)
+    cache = f"--cachedir={tmp_path / 'cache'}"
+    first, first_out = run_panel(path, "--numx=2", "--numy=2", "--cpl", cache)
+    second, second_out = run_panel(path, "--numx=2", "--numy=2", "--cpl", cache)
+    assert "restored from cache" not in first_out
+    assert "restored from cache" in second_out
+    assert second == first
+    third, third_out = run_panel(path, "--numx=3", "--numy=2", "--cpl", cache)
+    assert "restored from cache" not in third_out
+    assert third != first
+
+
+def test_key_ignores_layout_but_not_strings(make_board, tmp_path):
+    path = make_board(tracks=10, footprints=1)
+    with open(path, encoding="utf-8") as board:
+        text = board.read()
+    key = key_of(path, tmp_path, "--engine=sexpr")
+
+    def key_with(new_text):
+        with open(path, "w", encoding="utf-8") as board:
+            board.write(new_text)
+        return key_of(path, tmp_path, "--engine=sexpr")
+
+    assert key_with(text.replace("\t(", "  (").replace(") (", ")\n(")) == key
+    assert key_with(text.replace('"fake_pcbnew"', '"pcbnew"')) == key
+    spaced = key_with(text.replace('(title "Synthetic")', '(title "Syn thetic")'))
+    double = key_with(text.replace('(title "Synthetic")', '(title "Syn  thetic")'))
+    assert len({key, spaced, double}) == 3
+
+
+@pytest.mark.fake_pcbnew
+def test_key_covers_the_script_and_kicad(make_board, tmp_path, monkeypatch):
+    path = make_board(tracks=10, footprints=1)
+    key = key_of(path, tmp_path)
+    script = tmp_path / "panelizer.py"
+    shutil.copyfile(panelizer.__file__, script)
+    with open(script, "a", encoding="utf-8") as changed:
+        changed.write("\n# changed\n")
+    monkeypatch.setattr(panelizer, "__file__", str(script))
+    assert key_of(path, tmp_path) != key
+    monkeypatch.undo()
+    assert key_of(path, tmp_path) == key
+    monkeypatch.setattr(fake_pcbnew, "Version", lambda: "9.0.0")
+    assert key_of(path, tmp_path) != key
+
+
+@pytest.mark.fake_pcbnew
+def test_benchmark_leaves_the_cache_alone(make_board, tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "user-cache"))
+    path = make_board(**bench_scaling.board_params(10))
+    for _ in range(2):
+        phases = bench_scaling.run_once(path, 2, "pcbnew", [], False)[2]
+        assert phases[-1]["phase"] == "save board"
+    assert not (tmp_path / "user-cache").exists()
+
+
+@pytest.mark.fake_pcbnew
+def test_cache_is_opt_in(make_board, run_panel, tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "user-cache"))
+    path = make_board(tracks=10, footprints=1)
+    for _ in range(2):
+        _, out = run_panel(path, "--numx=2", "--numy=2")
+        assert "restored from cache" not in out
+    assert not (tmp_path / "user-cache").exists()
+    run_panel(path, "--numx=2", "--numy=2", "--cache")
+    _, out = run_panel(path, "--numx=2", "--numy=2", "--cache")
+    assert "restored from cache" in out
+    assert (tmp_path / "user-cache" / "kicad-panelizer").exists()
+
+
+def test_key_ignores_option_order_and_path_spelling(make_board, tmp_path):
+    path = make_board(tracks=10, footprints=1)
+    key = key_of(path, tmp_path, "--cpl", "--engine=sexpr")
+    assert key_of(path, tmp_path, "--engine", "sexpr", "--cpl") == key
+    spelled = str(tmp_path / "." / ".." / tmp_path.name / "board.kicad_pcb")
+    assert key_of(spelled, tmp_path, "--cpl", "--engine=sexpr") == key
+    assert key_of(path, tmp_path, "--engine=sexpr") != key
+
+
+@pytest.mark.fake_pcbnew
+def test_key_without_a_cache_dir(make_board, tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "user-cache"))
+    monkeypatch.setattr(panelizer, "pcbnew", None)
+    path = make_board(tracks=10, footprints=1)
+    args = panelizer.parse_args([path, "--numx=2", "--numy=2", "--cache"])
+    args.sourceBoardFile = path
+    assert panelizer.cache_key(args) == key_of(path, tmp_path / "user-cache", "--cache")
@@ -0,0 +1,149 @@
+"""Tests for packing several designs on a panel with --designs."""
+
+import itertools
+import re
+
+import pytest
+
+import panelizer
+
+MM = panelizer.SCALE
+
+
+def board_rects(plan, bboxes):
+    """Return the (left, top, right, bottom) of every board of a packed plan."""
+    left, top, right, bottom = bboxes[0]
+    rects = [bboxes[0]]
+    rects += [
+        (left + copy.dx, top + copy.dy, right + copy.dx, bottom + copy.dy)
+        for copy in plan.copies
+    ]
+    for design, (left, top, right, bottom) in zip(plan.designs, bboxes[1:]):
+        for dx, dy in [(0, 0)] + [(copy.dx, copy.dy) for copy in design.copies]:
+            x, y = design.offset.x + dx, design.offset.y + dy
+            rects.append((left + x, top + y, right + x, bottom + y))
+    return rects
+
+
+def test_design_list():
+    args = panelizer.parse_args(
+        ["--designs=a.kicad_pcb:3, b.kicad_pcb", "--quantity=2"]
+    )
+    args.sourceBoardFile = "main.kicad_pcb"
+    assert panelizer.design_list(args) == [
+        ("main.kicad_pcb", 2),
+        ("a.kicad_pcb", 3),
+        ("b.kicad_pcb", 1),
+    ]
+    args.designs = "a.kicad_pcb:0"
+    assert panelizer.design_list(args) is None
+    args.designs = "a.txt:2"
+    assert panelizer.design_list(args) is None
+
+
+@pytest.mark.parametrize(
+    "fit, split", list(itertools.product(panelizer.PACK_FITS, panelizer.PACK_SPLITS))
+)
+def test_guillotine_pack_keeps_boards_apart(fit, split):
+    sizes = [(40, 30), (20, 20), (20, 20), (35, 10), (10, 45), (20, 20), (60, 5)]
+    positions, cuts = panelizer.guillotine_pack(sizes, 100, 60, fit, split)
+    rects = [
+        (x, y, x + w, y + h)
+        for (w, h), position in zip(sizes, positions)
+        if position
+        for x, y in [position]
+    ]
+    assert len(rects) > 4
+    for left, top, right, bottom in rects:
+        assert 0 <= left and right <= 100 and 0 <= top and bottom <= 60
+    for a, b in itertools.combinations(rects, 2):
+        assert a[2] <= b[0] or b[2] <= a[0] or a[3] <= b[1] or b[3] <= a[1]
+    # no cut runs through a board
+    for vertical, position, start, end in cuts:
+        for left, top, right, bottom in rects:
+            if vertical:
+                assert not (left < position < right and top < end and start < bottom)
+            else:
+                assert not (top < position < bottom and left < end and start < right)
+
+
+def test_packed_boards_and_vscores(make_board):
+    main = make_board(tracks=20, footprints=2, zones=0, width=40, height=30)
+    sensor = make_board(
+        "sensor", tracks=10, footprints=1, zones=0, width=20, height=20, seed=2
+    )
+    args = panelizer.parse_args(
+        ["--panelx=150", "--panely=100", "--designs", f"{sensor}:4", "--quantity=2"]
+    )
+    args.sourceBoardFile = main
+    bboxes = [(0, 0, 40 * MM, 30 * MM), (0, 0, 20 * MM, 20 * MM)]
+    designs = panelizer.design_list(args)
+    plan = panelizer.pack_designs(args, bboxes, designs, report=False)
+    rects = board_rects(plan, bboxes)
+    assert len(rects) == 6
+    for a, b in itertools.combinations(rects, 2):
+        assert a[2] < b[0] or b[2] < a[0] or a[3] < b[1] or b[3] < a[1]
+    assert plan.cuts
+    # no v-score runs through a board, open ends run to the panel edge
+    for vertical, position, low, high in plan.cuts:
+        low = float("-inf") if low is None else low
+        high = float("inf") if high is None else high
+        for left, top, right, bottom in rects:
+            if vertical:
+                assert not (left < position < right and top < high and low < bottom)
+            else:
+                assert not (top < position < bottom and left < high and low < right)
+
+
+@pytest.mark.fake_pcbnew
+def test_designs_panel_renames_nets(make_board, run_panel):
+    main = make_board(tracks=20, footprints=2, zones=0, width=40, height=30)
+    sensor = make_board(
+        "sensor", tracks=10, footprints=1, zones=0, width=20, height=20, seed=2
+    )
+    text, out = run_panel(
+        main,
+        "--panelx=150",
+        "--panely=100",
+        f"--designs={sensor}:4",
+        "--quantity=2",
+        "--no-cache",
+    )
+    assert "Packed 2 x board.kicad_pcb, 4 x sensor.kicad_pcb" in out
+    assert text.count('(property "Reference" "R1"') == 2 + 4
+    assert text.count('(property "Reference" "R2"') == 2
+    nets = set(re.findall(r'\(net \d+ "([^"]*)"\)', text))
+    assert {"N0", "N1", "sensor-N0"} <= nets
+
+
+@pytest.mark.fake_pcbnew
+def test_cache_key_covers_every_design(make_board):
+    main = make_board(tracks=20, footprints=2, zones=0)
+    sensor = make_board("sensor", tracks=10, footprints=1, zones=0, seed=2)
+    args = panelizer.parse_args(
+        [main, "--panelx=150", "--panely=100", f"--designs={sensor}:2"]
+    )
+    args.sourceBoardFile = main
+    key = panelizer.cache_key(args)
+    make_board("sensor", tracks=11, footprints=1, zones=0, seed=2)
+    assert panelizer.cache_key(args) != key
+
+
+@pytest.mark.parametrize(
+    "options, message",
+    [
+        (["--designs=other.kicad_pcb:x"], "--designs takes"),
+        (["--designs=board.kicad_pcb"], "Give each board once"),
+        (["--designs=other.kicad_pcb", "--engine=sexpr"], "needs the pcbnew engine"),
+        (["--designs=other.kicad_pcb", "--groupcopy"], "can't be used with"),
+        (["--quantity=2"], "--quantity needs --designs"),
+    ],
+)
+def test_bad_designs_quit(make_board, capsys, options, message):
+    path = make_board(tracks=10, footprints=1)
+    options = [option.replace("board.kicad_pcb", path) for option in options]
+    args = panelizer.parse_args([path, "--panelx=150", "--panely=100", *options])
+    args.sourceBoardFile = path
+    with pytest.raises(SystemExit):
+        panelizer.validate_args(args)
+    assert message in capsys.readouterr().out
@@ -0,0 +1,38 @@
+"""Tests for leaving the source Edge.Cuts out of the copies."""
+
+import pytest
+
+import panelizer
+
+
+def layer_lines(root, layer):
+    return [
+        node
+        for node in root[1:]
+        if node[0] == "gr_line" and panelizer._is_on_layer(node, layer)
+    ]
+
+
+def test_source_outline_is_not_copied(make_board, run_panel):
+    path = make_board(tracks=20, footprints=2, outline_segments=5, drawings=9)
+    text, _ = run_panel(path, "--numx=3", "--numy=2", "--no-cache")
+    root = panelizer.parse_sexpr(text)
+    # the panel outline and the 2 + 1 v-scores, none of the 20 source lines
+    assert len(layer_lines(root, "Edge.Cuts")) == 4 + 3
+    drawings = sum(
+        len(layer_lines(root, layer))
+        for layer in ("Dwgs.User", "Cmts.User", "F.Fab")
+    )
+    assert drawings == 6 * 9
+
+
+@pytest.mark.fake_pcbnew
+def test_edge_cuts_deletion_is_profiled(make_board, run_panel, tmp_path):
+    path = make_board(tracks=20, footprints=2, outline_segments=5)
+    target = tmp_path / "profile.json"
+    run_panel(path, "--numx=3", "--numy=2", "--no-cache", f"--profile={target}")
+    phases = {
+        phase["phase"]: phase["items"]
+        for phase in panelizer.json.loads(target.read_text(encoding="utf-8"))["phases"]
+    }
+    assert phases["delete edge cuts"] == 4 * 5
@@ -0,0 +1,88 @@
+"""Tests for the layer and item filters."""
+
+import pytest
+
+import panelizer
+
+LAYERS = {
+    "F.Cu": 0,
+    "B.Cu": 31,
+    "F.SilkS": 37,
+    "Dwgs.User": 40,
+    "User.Drawings": 40,
+    "Cmts.User": 41,
+    "Edge.Cuts": 44,
+    "B.Fab": 48,
+    "F.Fab": 49,
+}
+DOCUMENTATION = ("--exclude-layers=User.*,*.Fab", "--exclude-items=models")
+
+
+def items_on(text, layer):
+    """Count the drawings and tracks of a board on a layer, footprints' too."""
+
+    def count(node):
+        if not isinstance(node, list) or node[0] in ("property", "fp_text"):
+            return 0
+        found = panelizer.find_child(node, "layer")
+        here = found is not None and panelizer.unquote(found[1]) == layer
+        return here + sum(count(child) for child in node[1:])
+
+    return count(panelizer.parse_sexpr(text))
+
+
+def test_filter_kinds():
+    args = panelizer.parse_args(["--exclude-items=models, text"])
+    assert panelizer.filter_kinds(args) == {"models", "text"}
+    args = panelizer.parse_args(["--exclude-items=models,pictures"])
+    assert panelizer.filter_kinds(args) is None
+    assert panelizer.filter_kinds(panelizer.parse_args([])) == set()
+
+
+def test_kept_layers():
+    args = panelizer.parse_args([])
+    assert panelizer.kept_layers(args, LAYERS) is None
+    args = panelizer.parse_args(["--exclude-layers=User.*,*.Fab"])
+    assert panelizer.kept_layers(args, LAYERS) == {0, 31, 37, 41, 44}
+    args = panelizer.parse_args(["--include-layers=*.Cu", "--exclude-layers=B.*"])
+    assert panelizer.kept_layers(args, LAYERS) == {0, 44}
+
+
+def test_unknown_layer_quits(capsys):
+    args = panelizer.parse_args(["--exclude-layers=F.Fab,User.9"])
+    with pytest.raises(SystemExit):
+        panelizer.kept_layers(args, LAYERS)
+    assert "--exclude-layers layer User.9 isn't on the board" in capsys.readouterr().out
+
+
+@pytest.mark.fake_pcbnew
+@pytest.mark.parametrize("engine", ["pcbnew", "sexpr"])
+def test_documentation_is_left_out(make_board, run_panel, engine):
+    path = make_board(tracks=20, footprints=3, zones=1, drawings=9, fab=True)
+    options = ("--numx=2", "--numy=2", "--no-cache", f"--engine={engine}")
+    plain, _ = run_panel(path, *options)
+    filtered, out = run_panel(path, *options, *DOCUMENTATION)
+    # 3 lines on each documentation layer and a fab outline per footprint
+    assert "Left out 15 item(s) of the source board" in out
+    assert items_on(plain, "Dwgs.User") == 4 * 3
+    for layer in ("Dwgs.User", "F.Fab"):
+        assert items_on(filtered, layer) == 0
+    assert "(model " in plain and "(model " not in filtered
+    assert items_on(filtered, "F.Cu") == items_on(plain, "F.Cu")
+    assert filtered.count('(property "Reference"') == 4 * 3
+    assert len(filtered) < len(plain)
+
+
+def test_footprint_fields_are_kept(make_board, run_panel):
+    path = make_board(tracks=10, footprints=3, zones=0, fab=True)
+    text, _ = run_panel(
+        path,
+        "--numx=2",
+        "--numy=1",
+        "--engine=sexpr",
+        "--no-cache",
+        "--exclude-items=fptext",
+        "--exclude-layers=*.Fab",
+    )
+    assert text.count('(property "Reference"') == 2 * 3
+    assert text.count('(property "Value"') == 2 * 3
@@ -0,0 +1,81 @@
+"""Tests for --fit."""
+
+import json
+
+import pytest
+
+import panelizer
+
+MM = panelizer.SCALE
+
+
+def test_rank_fits_prefers_the_turned_board():
+    args = panelizer.parse_args(["--panelx=100", "--panely=250", "--padding=0"])
+    fits = panelizer.rank_fits(args, 80 * MM, 30 * MM)
+    assert fits[0] == panelizer.Fit(9, 3, 3, True, False)
+    assert fits[1] == panelizer.Fit(8, 1, 8, False, False)
+
+
+def test_rank_fits_keeps_the_given_layout_on_a_tie():
+    args = panelizer.parse_args(["--panelx=100", "--panely=100", "--padding=0"])
+    fits = panelizer.rank_fits(args, 40 * MM, 40 * MM)
+    assert [(fit.boards, fit.rotated) for fit in fits] == [(4, False), (4, True)]
+
+
+def test_swapped_rails_take_their_text():
+    args = panelizer.parse_args(
+        ["--panelx=100", "--panely=140", "--padding=0", "--hrail=15"]
+        + ["--hrailtext=left", "--htitle"]
+    )
+    fits = panelizer.rank_fits(args, 40 * MM, 40 * MM, rotate=False)
+    assert fits[0] == panelizer.Fit(4, 2, 2, False, True)
+    best = panelizer.apply_fit(args, fits[0])
+    assert (best.hrail, best.vrail) == (0, 15)
+    assert (best.hrailtext, best.vrailtext) == (None, "left")
+    assert (best.htitle, best.vtitle) == (False, True)
+    assert args.hrail == 15
+
+
+@pytest.mark.fake_pcbnew
+def test_fit_turns_the_pcbnew_board(make_board, run_panel):
+    path = make_board(tracks=10, footprints=1, zones=0, width=80, height=30)
+    options = ("--panelx=100", "--panely=250", "--padding=0", "--no-cache")
+    text, out = run_panel(path, *options, "--fit")
+    assert "* 1. 9 boards (3 x 3), turned 90 degrees" in out
+    assert text.count("(footprint ") == 9
+    plain, _ = run_panel(path, *options)
+    assert plain.count("(footprint ") == 8
+
+
+def test_fit_only_moves_the_rails_for_sexpr(make_board, run_panel):
+    path = make_board(tracks=10, footprints=1, zones=0, width=40, height=40)
+    text, out = run_panel(
+        path,
+        "--panelx=100",
+        "--panely=140",
+        "--padding=0",
+        "--hrail=15",
+        "--fit",
+        "--engine=sexpr",
+        "--no-cache",
+    )
+    assert "turned" not in out
+    assert "* 1. 4 boards (2 x 2), as drawn, 15mm rails top and bottom" in out
+    assert text.count("(footprint ") == 4
+
+
+def test_plan_lists_the_layouts(make_board, run_panel):
+    path = make_board(tracks=10, footprints=1, width=80, height=30)
+    _, out = run_panel(
+        path, "--plan", "--panelx=100", "--panely=250", "--padding=0", "--fit"
+    )
+    plan = json.loads(out)
+    assert (plan["num_x"], plan["num_y"]) == (3, 3)
+    assert plan["layouts"][0]["rotated"]
+    assert plan["layouts"][0]["description"] == "turned 90 degrees"
+
+
+def test_fit_needs_a_panel_size(make_board, run_panel):
+    path = make_board(tracks=10, footprints=1)
+    with pytest.raises(SystemExit):
+        run_panel(path, "--panelx=100", "--fit")
@@ -0,0 +1,49 @@
+"""Tests for duplicating footprints from prototypes."""
+
+import pytest
+
+import panelizer
+
+pytestmark = pytest.mark.fake_pcbnew
+
+MM = panelizer.SCALE
+
+
+def footprint_board(pcbnew, make_board):
+    return pcbnew.LoadBoard(make_board(tracks=10, footprints=3, pads=2))
+
+
+def test_copies_keep_fields_and_pad_offsets(pcbnew, make_board):
+    board = footprint_board(pcbnew, make_board)
+    sources = list(board.GetFootprints())
+    offsets = [(1, 0, pcbnew.VECTOR2I(60 * MM, 0), None)]
+    panelizer.duplicate_footprints(board, offsets, footprints=sources)
+    copies = list(board.GetFootprints())[3:]
+    assert len(copies) == 3
+    for source, copy in zip(sources, copies):
+        assert copy.GetReference() == source.GetReference()
+        assert copy.GetValue() == source.GetValue()
+        assert copy.GetPosition() == source.GetPosition() + offsets[0][2]
+        for source_pad, pad in zip(source.Pads(), copy.Pads()):
+            assert pad.GetPosition() == source_pad.GetPosition() + offsets[0][2]
+        assert copy.m_Uuid.AsString() == panelizer.copy_uuid(
+            source.m_Uuid.AsString(), 1, 0
+        )
+
+
+def test_turned_copies_share_one_prototype(pcbnew, make_board, monkeypatch):
+    board = footprint_board(pcbnew, make_board)
+    plan = panelizer.plan_panel(
+        panelizer.parse_args(["--numx=4", "--numy=1", "--orient=0,180"]),
+        (0, 0, 50 * MM, 40 * MM),
+    )
+    rotations = []
+    monkeypatch.setattr(
+        pcbnew.FOOTPRINT,
+        "Rotate",
+        lambda self, center, angle: rotations.append(self),
+    )
+    panelizer.duplicate_footprints(board, panelizer.copy_offsets(plan))
+    # 3 copies each, one of them turned like the fourth: one rotation per source
+    assert len(board.GetFootprints()) == 3 * 4
+    assert len(rotations) == 3
@@ -0,0 +1,109 @@
+"""Tests for --gerber step and repeat output."""
+
+import os
+
+import pytest
+
+import panelizer
+
+GERBER = """%TF.FileFunction,Copper,L1,Top*%
+%FSLAX46Y46*%
+%MOMM*%
+%LPD*%
+G01*
+G04 APERTURE LIST*
+%ADD10C,0.250000*%
+G04 APERTURE END LIST*
+D10*
+X0Y0D02*
+X1000000Y0D01*
+M02*
+"""
+
+DRILL = """M48
+METRIC
+T1C0.300
+%
+G90
+G05
+T1
+X1.5Y-2.0
+M30
+"""
+
+
+def test_step_repeat_wraps_the_graphics():
+    lines = panelizer.gerber_step_repeat(GERBER, 3, 2, 51100000, 41100000).splitlines()
+    start = lines.index("%SRX3Y2I51.1J41.1*%")
+    assert lines[start - 1] == panelizer.GERBER_APERTURE_END
+    assert lines[start + 1 : start + 4] == ["D10*", "X0Y0D02*", "X1000000Y0D01*"]
+    assert lines[-2:] == ["%SR*%", "M02*"]
+
+
+def test_merge_renumbers_apertures():
+    merged = panelizer.merge_gerber(GERBER, GERBER).splitlines()
+    end = merged.index(panelizer.GERBER_APERTURE_END)
+    assert merged[end - 2 : end] == ["%ADD10C,0.250000*%", "%ADD11C,0.250000*%"]
+    assert merged[-7:] == [
+        "%TD*%",
+        "%LPD*%",
+        "G01*",
+        "D11*",
+        "X0Y0D02*",
+        "X1000000Y0D01*",
+        "M02*",
+    ]
+
+
+def test_excellon_repeat_shifts_hits():
+    lines = panelizer.excellon_repeat(DRILL, [(0, 0), (10000000, 0), (0, 5000000)])
+    hits = lines.splitlines()[lines.splitlines().index("T1") + 1 : -1]
+    assert hits == ["X1.5Y-2", "X11.5Y-2", "X1.5Y3"]
+
+
+@pytest.mark.fake_pcbnew
+def test_gerber_panel(pcbnew, make_board, run_panel, tmp_path):
+    path = make_board(tracks=30, footprints=3)
+    board = pcbnew.LoadBoard(path)
+    vias = sum(isinstance(track, pcbnew.PCB_VIA) for track in board.GetTracks())
+    output_dir = tmp_path / "gerbers"
+    text, out = run_panel(
+        path, "--numx=3", "--numy=2", "--no-cache", f"--gerber={output_dir}"
+    )
+    assert text is None
+    assert f"Gerber and drill files written to {output_dir}" in out
+    files = os.listdir(output_dir)
+    copper = (output_dir / "board-F_Cu.gbr").read_text(encoding="utf-8")
+    assert "%SRX3Y2I51.1J41.1*%" in copper
+    edges = (output_dir / "board-Edge_Cuts.gbr").read_text(encoding="utf-8")
+    assert edges.count("%SR") == 2 and "%TD*%" in edges
+    drill = (output_dir / "board-PTH.drl").read_text(encoding="utf-8")
+    assert sum(line.startswith("X") for line in drill.splitlines()) == 6 * vias
+    assert "board-NPTH.drl" in files
+
+
+@pytest.mark.fake_pcbnew
+def test_frame_text_names_the_panel(make_board, run_panel, tmp_path, monkeypatch):
+    path = make_board(tracks=10, footprints=1)
+    named = []
+    report_text = panelizer.report_text
+
+    def spy(args, output_file, num_x, num_y):
+        named.append(output_file)
+        return report_text(args, output_file, num_x, num_y)
+
+    monkeypatch.setattr(panelizer, "report_text", spy)
+    run_panel(path, "--numx=2", "--numy=2", f"--gerber={tmp_path / 'gerbers'}")
+    assert named == [panelizer.output_path(path)]
+
+
+@pytest.mark.parametrize(
+    "option", ["--refill=panel", "--groupcopy", "--bulkadd", "--keepfills"]
+)
+def test_options_gerber_ignores_quit(make_board, capsys, option):
+    path = make_board(tracks=10, footprints=1)
+    args = panelizer.parse_args([path, "--numx=2", "--numy=2", "--gerber=out", option])
+    args.sourceBoardFile = path
+    with pytest.raises(SystemExit):
+        panelizer.validate_args(args)
+    assert "--gerber can't be used with" in capsys.readouterr().out
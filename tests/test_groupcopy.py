@@ -0,0 +1,138 @@
+"""Tests for --groupcopy."""
+
+import pytest
+
+import panelizer
+import synth
+
+pytestmark = pytest.mark.fake_pcbnew
+
+
+def panel_lines(text):
+    """Return the sorted item lines of a panel, without the report text."""
+    return sorted(line for line in text.splitlines() if "generated with" not in line)
+
+
+def test_groupcopy_matches_plain_panel(make_board, run_panel):
+    path = make_board(tracks=40, footprints=4, zones=1, drawings=6)
+    plain, _ = run_panel(path, "--numx=3", "--numy=2", "--no-cache")
+    grouped, _ = run_panel(path, "--numx=3", "--numy=2", "--no-cache", "--groupcopy")
+    assert panel_lines(grouped) == panel_lines(plain)
+
+
+def test_keep_groups_names_each_board(pcbnew, make_board):
+    board = pcbnew.LoadBoard(make_board(tracks=20, footprints=2))
+    items = [*board.GetTracks(), *board.GetFootprints()]
+    plan = panelizer.plan_panel(
+        panelizer.parse_args(["--numx=2", "--numy=2"]),
+        (0, 0, 50 * panelizer.SCALE, 40 * panelizer.SCALE),
+    )
+    pcbnew.CALLS.clear()
+    count = panelizer.duplicate_as_groups(
+        board, items, panelizer.copy_offsets(plan), keep_groups=True
+    )
+    assert count == 3
+    assert pcbnew.CALLS["DeepClone"] == 3
+    assert sorted(group.GetName() for group in board.Groups()) == [
+        "Board 1,1",
+        "Board 1,2",
+        "Board 2,1",
+        "Board 2,2",
+    ]
+    assert len(board.GetTracks()) == 4 * 20
+    assert all(len(group.GetItems()) == 20 + 2 for group in board.Groups())
+
+
+def test_tied_members_keep_their_uuids(pcbnew, make_board):
+    """Tracks branching from one point are told apart by their other end."""
+    mm = panelizer.SCALE
+    board = pcbnew.LoadBoard(make_board(tracks=0, footprints=0, zones=0))
+    net = next(iter(board.nets.values()))
+    for i in range(6):
+        track = pcbnew.PCB_TRACK(board)
+        track.SetStart(pcbnew.VECTOR2I(10 * mm, 10 * mm))
+        track.SetEnd(pcbnew.VECTOR2I((20 + i % 3) * mm, (10 + i) * mm))
+        track.SetWidth((1 + i // 3) * mm // 4)
+        track.SetNet(net)
+        board.Add(track)
+    sources = list(board.GetTracks())
+    by_shape = {
+        (track.GetEnd().x, track.GetEnd().y, track.GetWidth()): track.m_Uuid.AsString()
+        for track in sources
+    }
+    plan = panelizer.plan_panel(
+        panelizer.parse_args(["--numx=4", "--numy=2"]),
+        (0, 0, 50 * mm, 40 * mm),
+    )
+    offsets = panelizer.copy_offsets(plan)
+    panelizer.duplicate_as_groups(board, sources, offsets)
+
+    copies = list(board.GetTracks())[len(sources) :]
+    assert len(copies) == 6 * len(offsets)
+    start = sources[0].GetStart()
+    cells = {(offset.x, offset.y): (x, y) for x, y, offset, _ in offsets}
+    for track in copies:
+        offset = track.GetStart() - start
+        x, y = cells[offset.x, offset.y]
+        end = track.GetEnd() - offset
+        source_id = by_shape[end.x, end.y, track.GetWidth()]
+        assert track.m_Uuid.AsString() == panelizer.copy_uuid(source_id, x, y)
+
+
+def test_identical_members_get_their_own_uuids(pcbnew, make_board):
+    board = pcbnew.LoadBoard(make_board(tracks=10, footprints=0, zones=0))
+    board.Add(board.GetTracks()[0].Duplicate())
+    sources = list(board.GetTracks())
+    plan = panelizer.plan_panel(
+        panelizer.parse_args(["--numx=2", "--numy=1"]),
+        (0, 0, 50 * panelizer.SCALE, 40 * panelizer.SCALE),
+    )
+    panelizer.duplicate_as_groups(board, sources, panelizer.copy_offsets(plan))
+    copies = list(board.GetTracks())[len(sources) :]
+    assert [track.m_Uuid.AsString() for track in copies] == [
+        panelizer.copy_uuid(track.m_Uuid.AsString(), 1, 0) for track in sources
+    ]
+
+
+def test_copies_are_not_queried_per_item(pcbnew, make_board):
+    board = pcbnew.LoadBoard(make_board(tracks=60, footprints=6, pads=4))
+    items = [*board.GetTracks(), *board.GetFootprints()]
+    plan = panelizer.plan_panel(
+        panelizer.parse_args(["--numx=4", "--numy=4"]),
+        (0, 0, 50 * panelizer.SCALE, 40 * panelizer.SCALE),
+    )
+    pcbnew.CALLS.clear()
+    panelizer.duplicate_as_groups(board, items, panelizer.copy_offsets(plan))
+    for query in ("GetClass", "GetLayer", "GetPosition", "GetNetname"):
+        assert query not in pcbnew.CALLS
+    # gathering the source reads each uuid twice and ordering it once, then
+    # every copied item's uuid is read to order and to rename it, the uuids
+    # of footprint pads and drawings and the group's once to rename them
+    children = sum(
+        len(footprint.Pads()) + len(footprint.GraphicalItems())
+        for footprint in board.GetFootprints()[:6]
+    )
+    per_copy = 2 * len(items) + children + 1
+    assert pcbnew.CALLS["KIID.AsString"] == 3 * len(items) + 15 * per_copy
+
+
+def test_turned_panel_is_reproducible(pcbnew, tmp_path, run_panel):
+    mm = panelizer.SCALE
+
+    def branching_board():
+        board = synth.make_board(tracks=20, footprints=2, zones=0)
+        for i in range(4):
+            track = pcbnew.PCB_TRACK(board)
+            track.SetStart(pcbnew.VECTOR2I(10 * mm, 10 * mm))
+            track.SetEnd(pcbnew.VECTOR2I(20 * mm, (12 + 3 * i) * mm))
+            track.m_Uuid = pcbnew.KIID(f"00000000-0000-4000-8000-00000000000{i}")
+            board.Add(track)
+        return board
+
+    path = str(tmp_path / "branching.kicad_pcb")
+    pcbnew.register_board(path, branching_board)
+    options = ("--numx=2", "--numy=2", "--orient=0,180", "--no-cache")
+    plain, _ = run_panel(path, *options)
+    panels = [run_panel(path, *options, "--groupcopy")[0] for _ in range(3)]
+    assert panels[0] == panels[1] == panels[2]
+    assert panel_lines(panels[0]) == panel_lines(plain)
@@ -0,0 +1,40 @@
+"""
+Smoke tests of the pcbnew engine with KiCad's own pcbnew module.
+
+conftest.py puts the fake pcbnew in its place for every other test, so
+these run the script in a fresh interpreter, and are skipped unless that
+interpreter can import pcbnew.
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import panelizer
+
+
+def run_python(*argv):
+    return subprocess.run(
+        [sys.executable, *argv], capture_output=True, text=True, check=False
+    )
+
+
+pytestmark = pytest.mark.skipif(
+    run_python("-c", "import pcbnew").returncode != 0,
+    reason="KiCad's pcbnew module isn't installed",
+)
+
+
+def test_pcbnew_panel_and_plot(make_board, tmp_path):
+    path = make_board(tracks=20, footprints=2, zones=1)
+    plots = tmp_path / "plots"
+    result = run_python(
+        panelizer.__file__, path, "--numx=2", "--numy=2", f"--plot={plots}", "--jobs=2"
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+    with open(panelizer.output_path(path), encoding="utf-8") as panel:
+        text = panel.read()
+    assert text.count('"Reference" "R1"') == 4
+    assert "board_panelized-F_Cu.gbr" in os.listdir(plots)
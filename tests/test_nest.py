@@ -0,0 +1,70 @@
+"""Tests for --nest."""
+
+import json
+
+import pytest
+
+import panelizer
+
+L_SHAPE = [(0, 0), (40, 0), (40, 15), (15, 15), (15, 40), (0, 40)]
+PANEL = ("--panelx=200", "--panely=200", "--padding=2", "--no-cache")
+
+
+def edge_cuts_lines(text):
+    """Return the Edge.Cuts lines of a board."""
+    root = panelizer.parse_sexpr(text)
+    return [
+        node
+        for node in root[1:]
+        if node[0] == "gr_line"
+        and panelizer.unquote(panelizer.find_child(node, "layer")[1]) == "Edge.Cuts"
+    ]
+
+
+def test_nest_needs_tabs(make_board, capsys):
+    path = make_board(tracks=10, footprints=1, zones=0, outline=L_SHAPE)
+    args = panelizer.parse_args([path, *PANEL, "--nest"])
+    args.sourceBoardFile = path
+    with pytest.raises(SystemExit):
+        panelizer.validate_args(args)
+    assert "--nest needs --tabs" in capsys.readouterr().out
+
+
+def test_nest_beats_the_grid(make_board):
+    path = make_board(tracks=10, footprints=1, zones=0, outline=L_SHAPE)
+    args = panelizer.parse_args([path, *PANEL, "--nest", "--tabs=5"])
+    with open(path, encoding="utf-8") as source:
+        root = panelizer.parse_sexpr(source.read())
+    bbox = panelizer.sexpr_edge_bbox(root)
+    grid = panelizer.plan_panel(args, bbox)
+    plan = panelizer.nest_panel(args, bbox, root, report=False)
+    assert plan.nested
+    assert len(plan.copies) + 1 > grid.num_x * grid.num_y
+
+
+@pytest.mark.fake_pcbnew
+def test_nested_copies_are_cut_out(make_board, run_panel):
+    path = make_board(tracks=10, footprints=1, zones=0, outline=L_SHAPE)
+    text, out = run_panel(path, *PANEL, "--nest", "--tabs=5")
+    boards = text.count('(property "Reference" "R1"')
+    assert f"Nested {boards} boards" in out
+    assert boards > 16
+    # every board keeps its six sided outline, split where the tabs are
+    assert len(edge_cuts_lines(text)) >= 4 + 6 * boards
+    assert "fewer than two tabs" not in out
+
+
+def test_sexpr_keeps_the_grid(make_board, run_panel):
+    path = make_board(tracks=10, footprints=1, zones=0, outline=L_SHAPE)
+    text, out = run_panel(path, *PANEL, "--nest", "--tabs=5", "--engine=sexpr")
+    assert "keeping the grid" in out
+    assert text.count('(property "Reference" "R1"') == 16
+    assert len(edge_cuts_lines(text)) >= 6 * 16
+
+
+def test_plan_of_a_nested_panel(make_board, run_panel):
+    path = make_board(tracks=10, footprints=1, zones=0, outline=L_SHAPE)
+    _, out = run_panel(path, *PANEL, "--nest", "--tabs=5", "--plan")
+    plan = json.loads(out)
+    assert plan["nested"]
+    assert plan["vscores"] == []
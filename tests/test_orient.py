@@ -0,0 +1,81 @@
+"""Tests for --orient."""
+
+import pytest
+
+import panelizer
+
+
+def test_orientation_pattern():
+    assert panelizer.orientation_pattern("0,180/f0, F90") == [
+        [(0, False), (180, False)],
+        [(0, True), (90, True)],
+    ]
+    assert panelizer.orientation_pattern("0,45") is None
+    assert panelizer.orientation_pattern("0,,180") is None
+
+
+@pytest.mark.parametrize(
+    "options, message",
+    [
+        (["--orient=0,x"], "--orient takes boards of"),
+        (["--orient=180,0"], "The first board of --orient must be 0"),
+        (["--orient=0,180", "--engine=sexpr"], "--orient needs the pcbnew engine"),
+        (["--orient=0,180", "--nest", "--tabs=5"], "--orient can't be used"),
+    ],
+)
+def test_bad_orientations_quit(make_board, capsys, options, message):
+    path = make_board(tracks=10, footprints=1)
+    args = panelizer.parse_args([path, "--numx=2", "--numy=2", *options])
+    args.sourceBoardFile = path
+    with pytest.raises(SystemExit):
+        panelizer.validate_args(args)
+    assert message in capsys.readouterr().out
+
+
+def test_quarter_turns_get_square_cells():
+    mm = panelizer.SCALE
+    args = panelizer.parse_args(["--numx=2", "--numy=2", "--orient=0,90"])
+    plan = panelizer.plan_panel(args, (0, 0, 50 * mm, 30 * mm))
+    assert (plan.board_width, plan.board_height) == (51 * mm, 51 * mm)
+    assert [(copy.angle, copy.flip) for copy in plan.copies] == [
+        (0, False),
+        (90, False),
+        (90, False),
+    ]
+
+
+@pytest.mark.fake_pcbnew
+def test_items_are_turned_once_per_orientation(pcbnew, make_board):
+    board = pcbnew.LoadBoard(make_board(tracks=20, footprints=0, zones=0))
+    tracks = list(board.GetTracks())
+    args = panelizer.parse_args(["--numx=4", "--numy=2", "--orient=0,90/f0,f180"])
+    bbox = board.GetBoardEdgesBoundingBox()
+    plan = panelizer.plan_panel(
+        args, (bbox.GetLeft(), bbox.GetTop(), bbox.GetRight(), bbox.GetBottom())
+    )
+    offsets = panelizer.copy_offsets(plan)
+    turns = {id(turn) for _, _, _, turn in offsets if turn}
+    assert len(turns) == 3
+    pcbnew.CALLS.clear()
+    panelizer.duplicate_board_items(board, tracks, offsets)
+
+    # 90, f0 and f180: two rotations and two flips per item, not one per copy
+    assert pcbnew.CALLS["Rotate"] == 2 * len(tracks)
+    assert pcbnew.CALLS["Flip"] == 2 * len(tracks)
+    copies = list(board.GetTracks())[len(tracks) :]
+    assert len(copies) == len(tracks) * len(plan.copies)
+    for index, copy in enumerate(plan.copies):
+        for source, track in zip(tracks, copies[index :: len(plan.copies)]):
+            start = source.GetStart()
+            expected = panelizer.copy_point(copy, plan.pivot, start.x, start.y)
+            assert (track.GetStart().x, track.GetStart().y) == pytest.approx(expected)
+
+
+@pytest.mark.fake_pcbnew
+def test_flipped_zones_are_reported(make_board, run_panel):
+    path = make_board(tracks=10, footprints=1, zones=1)
+    text, out = run_panel(path, "--numx=2", "--numy=2", "--orient=0,f0", "--no-cache")
+    assert "the zones of flipped boards are not filled" in out
+    assert text.count('(property "Reference" "R1"') == 4
+    _, out = run_panel(path, "--numx=2", "--numy=2", "--orient=0,180", "--no-cache")
+    assert "flipped" not in out
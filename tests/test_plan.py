@@ -0,0 +1,56 @@
+"""Tests for the --plan dry run."""
+
+import json
+import sys
+
+import panelizer
+
+KICAD5_TEXT = """(kicad_pcb (version 20171130) (host pcbnew 5.1.9)
+  (layers
+    (44 Edge.Cuts user)
+  )
+  (gr_text "not (Edge.Cuts" (at 0 0) (layer F.SilkS))
+  (gr_line (start 0 0) (end 20 0) (layer Edge.Cuts) (width 0.1))
+  (module R_0603 (layer F.Cu) (at 10 5 90)
+    (fp_line (start 0 0) (end 0 10) (layer Edge.Cuts) (width 0.2))
+  )
+  (segment (start 1 1) (end 2 2) (width 0.25) (layer F.Cu) (net 1))
+)
+"""
+
+
+def test_scan_edge_cuts_matches_full_parse(make_board):
+    with open(make_board(tracks=200, footprints=10, zones=1), encoding="utf-8") as f:
+        text = f.read()
+    root = panelizer.scan_edge_cuts(text)
+    assert not any(node[0] in ("segment", "zone") for node in root[1:])
+    assert panelizer.sexpr_edge_bbox(root) == panelizer.sexpr_edge_bbox(
+        panelizer.parse_sexpr(text)
+    )
+
+
+def test_scan_edge_cuts_kicad5_layout():
+    root = panelizer.scan_edge_cuts(KICAD5_TEXT)
+    assert [node[0] for node in root[1:]] == [
+        "version",
+        "host",
+        "layers",
+        "gr_text",
+        "gr_line",
+        "module",
+    ]
+    assert panelizer.sexpr_edge_bbox(root) == panelizer.sexpr_edge_bbox(
+        panelizer.parse_sexpr(KICAD5_TEXT)
+    )
+
+
+def test_plan_does_not_load_pcbnew(make_board, run_panel, monkeypatch):
+    path = make_board(tracks=40, footprints=4)
+    monkeypatch.delitem(sys.modules, "pcbnew")
+    monkeypatch.setattr(sys, "path", [p for p in sys.path if "benchmarks" not in p])
+    text, out = run_panel(path, "--plan", "--numx=3", "--numy=2")
+    plan = json.loads(out)
+    assert text is None
+    assert (plan["num_x"], plan["num_y"]) == (3, 2)
+    assert len(plan["vscores"]) == 2 + 1
+    assert "pcbnew" not in sys.modules
@@ -0,0 +1,74 @@
+"""Tests for --plot."""
+
+import os
+
+import pytest
+
+import fake_pcbnew
+import panelizer
+
+pytestmark = pytest.mark.fake_pcbnew
+
+
+class InlinePool:
+    """Stands in for the spawned plot workers, running them in this process."""
+
+    def __init__(self, max_workers, mp_context, initializer, initargs):
+        assert max_workers == 4
+        assert mp_context.get_start_method() == "spawn"
+        initializer(*initargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def map(self, function, tasks):
+        return map(function, tasks)
+
+
+def check_plots(output_dir, out, jobs):
+    files = sorted(os.listdir(output_dir))
+    # named after the panel, with the panel's outline and copies
+    assert "board_panelized-F_Cu.gbr" in files
+    assert "board_panelized-Edge_Cuts.gbr" in files
+    assert "board_panelized-PTH.drl" in files
+    assert f"with {jobs} process(es)" in out
+    edges = (output_dir / "board_panelized-Edge_Cuts.gbr").read_text(encoding="utf-8")
+    assert edges.count("D01*") == 4 + 2
+
+
+def test_plot_writes_every_layer(make_board, run_panel, tmp_path):
+    path = make_board(tracks=30, footprints=3)
+    output_dir = tmp_path / "plots"
+    text, out = run_panel(
+        path, "--numx=2", "--numy=2", "--no-cache", f"--plot={output_dir}", "--jobs=1"
+    )
+    assert text is not None
+    check_plots(output_dir, out, 1)
+
+
+def test_plot_workers_load_the_saved_panel(
+    make_board, run_panel, tmp_path, monkeypatch
+):
+    path = make_board(tracks=30, footprints=3)
+    output_dir = tmp_path / "plots"
+    panels = {}
+    plot_panel = panelizer.plot_panel
+    load_board = fake_pcbnew.LoadBoard
+
+    def remember_panel(args, board, *rest):
+        panels[board.GetFileName()] = board
+        return plot_panel(args, board, *rest)
+
+    monkeypatch.setattr(panelizer, "plot_panel", remember_panel)
+    monkeypatch.setattr(panelizer, "ProcessPoolExecutor", InlinePool)
+    monkeypatch.setattr(panelizer, "_PLOT_BOARD", None)
+    monkeypatch.setattr(
+        fake_pcbnew, "LoadBoard", lambda path: panels.get(path) or load_board(path)
+    )
+    _, out = run_panel(path, "--numx=2", "--numy=2", f"--plot={output_dir}", "--jobs=4")
+    assert list(panels) == [panelizer.output_path(path)]
+    assert panelizer._PLOT_BOARD is panels[panelizer.output_path(path)]
+    check_plots(output_dir, out, 4)
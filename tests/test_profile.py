@@ -0,0 +1,59 @@
+"""Tests for --profile and --cprofile."""
+
+import json
+import pstats
+
+import pytest
+
+import panelizer
+
+pytestmark = pytest.mark.fake_pcbnew
+
+
+def test_profile_json_lists_phases(make_board, run_panel, tmp_path):
+    path = make_board(tracks=30, footprints=3)
+    target = tmp_path / "profile.json"
+    run_panel(path, "--numx=2", "--numy=2", "--no-cache", f"--profile={target}")
+    profile = json.loads(target.read_text(encoding="utf-8"))
+    phases = [phase["phase"] for phase in profile["phases"]]
+    assert phases[:2] == ["import pcbnew", "load board"]
+    assert phases[-1] == "save board"
+    assert all(phase["seconds"] >= 0 for phase in profile["phases"])
+    assert profile["total_seconds"] >= sum(
+        phase["seconds"] for phase in profile["phases"]
+    )
+
+
+def test_profile_table_goes_to_stderr(make_board, run_panel, capsys):
+    path = make_board(tracks=30, footprints=3)
+    run_panel(path, "--numx=2", "--numy=2", "--no-cache", "--profile")
+    err = capsys.readouterr().err
+    assert err.startswith("phase")
+    assert "save board" in err and "total" in err
+
+
+def test_cprofile_writes_statistics(make_board, run_panel, tmp_path):
+    path = make_board(tracks=30, footprints=3)
+    target = tmp_path / "run.prof"
+    run_panel(path, "--numx=2", "--numy=2", "--no-cache", f"--cprofile={target}")
+    stats = pstats.Stats(str(target))
+    assert any(name == "panelize_pcbnew" for _, _, name in stats.stats)
+
+
+def test_profiled_runs_bypass_the_cache(make_board, run_panel, tmp_path):
+    path = make_board(tracks=30, footprints=3)
+    cache = f"--cachedir={tmp_path / 'cache'}"
+    for run in range(2):
+        report = tmp_path / f"profile{run}.json"
+        stats = tmp_path / f"run{run}.prof"
+        _, out = run_panel(
+            path,
+            "--numx=2",
+            "--numy=2",
+            cache,
+            f"--profile={report}",
+            f"--cprofile={stats}",
+        )
+        assert "restored from cache" not in out
+        assert json.loads(report.read_text(encoding="utf-8"))["phases"]
+        assert pstats.Stats(str(stats)).stats
@@ -0,0 +1,67 @@
+"""Tests for the --refill stage of the pcbnew engine."""
+
+import pytest
+
+import panelizer
+
+pytestmark = pytest.mark.fake_pcbnew
+
+
+def zone_fill_boxes(text):
+    """Return the (outline box, fill box) of every zone of a panel, in mm."""
+
+    def box(points):
+        xs = [float(xy[1]) for xy in points[1:]]
+        ys = [float(xy[2]) for xy in points[1:]]
+        return min(xs), min(ys), max(xs), max(ys)
+
+    boxes = []
+    for node in panelizer.parse_sexpr(text)[1:]:
+        if node[0] == "zone":
+            outline = panelizer.find_child(panelizer.find_child(node, "polygon"), "pts")
+            fill = panelizer.find_child(
+                panelizer.find_child(node, "filled_polygon"), "pts"
+            )
+            boxes.append((box(outline), box(fill)))
+    return boxes
+
+
+def test_source_refill_clips_to_the_board_edge(make_board, run_panel):
+    path = make_board(tracks=20, footprints=2, zones=1, width=50, height=40)
+    text, out = run_panel(path, "--numx=2", "--numy=2", "--no-cache", "--refill=source")
+    boxes = zone_fill_boxes(text)
+    assert len(boxes) == 4
+    # the zone covers the board, the fill keeps 1mm from the 0.1mm wide edge
+    for (left, top, right, bottom), fill in boxes:
+        assert fill == pytest.approx(
+            (left + 0.95, top + 0.95, right - 0.95, bottom - 0.95)
+        )
+    assert "Filled 1 zone(s)" in out
+
+
+def test_panel_refill(make_board, run_panel, tmp_path):
+    path = make_board(tracks=20, footprints=2, zones=1)
+    target = tmp_path / "profile.json"
+    text, out = run_panel(
+        path,
+        "--numx=2",
+        "--numy=2",
+        "--no-cache",
+        "--refill=panel",
+        f"--profile={target}",
+    )
+    assert "Filled 4 zone(s)" in out
+    assert len(zone_fill_boxes(text)) == 4
+    profile = panelizer.json.loads(target.read_text(encoding="utf-8"))
+    phases = [phase["phase"] for phase in profile["phases"]]
+    assert phases.index("refill panel zones") > phases.index("outline and v-scores")
+
+
+@pytest.mark.parametrize("timing, fills", [((), 1), (("--refill-timing",), 4)])
+def test_panel_zones_fill_together(make_board, run_panel, pcbnew, timing, fills):
+    path = make_board(tracks=20, footprints=2, zones=1)
+    pcbnew.CALLS.clear()
+    _, out = run_panel(path, "--numx=2", "--numy=2", "--refill=panel", *timing)
+    assert pcbnew.CALLS["ZONE_FILLER.Fill"] == fills
+    assert "Filled 4 zone(s)" in out
+    assert out.count(" on F.Cu") == (4 if timing else 0)
@@ -0,0 +1,84 @@
+"""Tests for the panel server and its submit client."""
+
+import contextlib
+import os
+import threading
+
+import pytest
+
+import panelizer
+
+
+@contextlib.contextmanager
+def panel_server():
+    server = panelizer.PanelServer(("127.0.0.1", 0), 1, 1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        server.executor.shutdown()
+
+
+def test_absolute_paths(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    options = panelizer.absolute_paths(
+        {
+            "gerber": "out",
+            "profile": "-",
+            "cprofile": "run.prof",
+            "designs": "a.kicad_pcb:2, b.kicad_pcb",
+            "numx": 2,
+        }
+    )
+    assert options == {
+        "gerber": str(tmp_path / "out"),
+        "profile": "-",
+        "cprofile": str(tmp_path / "run.prof"),
+        "designs": f"{tmp_path / 'a.kicad_pcb'}:2,{tmp_path / 'b.kicad_pcb'}",
+        "numx": 2,
+    }
+
+
+def test_invalid_job_reports_parser_message():
+    with panel_server() as server:
+        unknown = server.run({"board": "board.kicad_pcb", "bogus": 1})
+        bad_value = server.run({"board": "board.kicad_pcb", "numx": "two"})
+        boardless = server.run({"numx": 2})
+        status = server.status()
+    assert unknown["status"] == "failed"
+    assert "Invalid job: unknown option(s) bogus" in unknown["log"]
+    assert "invalid int value: 'two'" in bad_value["log"]
+    assert "Invalid job: no board" in boardless["log"]
+    assert (status["completed"], status["failed"]) == (3, 3)
+
+
+def test_submit_sends_absolute_paths(make_board, tmp_path, monkeypatch, capsys):
+    board = make_board(tracks=20, footprints=2)
+    server_dir = tmp_path / "server"
+    client_dir = tmp_path / "client"
+    server_dir.mkdir()
+    client_dir.mkdir()
+    monkeypatch.chdir(server_dir)
+    with panel_server() as server:
+        # start the worker in the server's directory
+        server.executor.submit(os.getcwd).result()
+        monkeypatch.chdir(client_dir)
+        port = server.server_address[1]
+        panelizer.submit(
+            [f"--port={port}", board, "--engine=sexpr", "--numx=2", "--numy=2"]
+            + [f"--cachedir={tmp_path / 'cache'}", "--profile=phases.txt"]
+        )
+    assert (client_dir / "phases.txt").exists()
+    assert not (server_dir / "phases.txt").exists()
+    assert "panel" in capsys.readouterr().out.lower()
+
+
+def test_submit_reports_failed_jobs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with panel_server() as server:
+        port = server.server_address[1]
+        with pytest.raises(SystemExit):
+            panelizer.submit([f"--port={port}", "missing.kicad_pcb", "--numx=2"])
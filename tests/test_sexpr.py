@@ -0,0 +1,104 @@
+"""Tests for the S-expression engine."""
+
+import pytest
+
+import panelizer
+
+KICAD_TEXT = """(kicad_pcb
+	(version 20240108)
+	(generator "pcbnew")
+	(gr_line
+		(start 10 20)
+		(end 30.5 20)
+		(stroke
+			(width 0.1)
+			(type default)
+		)
+		(layer "Edge.Cuts")
+		(uuid "8d8f2a5e-5b0c-4a52-9e0e-1b6f7d4bd9a1")
+	)
+)
+"""
+
+FOOTPRINT = """(footprint "R_0603"
+	(layer "F.Cu")
+	(uuid "1f0c5d36-9d1e-4c4c-a0a8-43e7c6d0b0c2")
+	(at 12 15 90)
+	(pad "1" smd rect
+		(at -0.8 0)
+		(size 0.8 0.9)
+		(layers "F.Cu")
+		(uuid "4a3a0f26-8d3b-4a47-9f12-0e8f3c9a1d77")
+	)
+)
+"""
+
+
+def count_nodes(root, head):
+    return sum(1 for node in root[1:] if isinstance(node, list) and node[0] == head)
+
+
+def test_format_keeps_kicad_layout():
+    assert panelizer.format_sexpr(panelizer.parse_sexpr(KICAD_TEXT)) == KICAD_TEXT
+
+
+def test_parse_keeps_raw_atoms():
+    root = panelizer.parse_sexpr(KICAD_TEXT)
+    line = panelizer.find_child(root, "gr_line")
+    assert panelizer.find_child(line, "end") == ["end", "30.5", "20"]
+    assert panelizer.find_child(line, "layer") == ["layer", '"Edge.Cuts"']
+
+
+def test_round_trip_board(make_board):
+    with open(make_board(tracks=40, footprints=4, zones=1), encoding="utf-8") as f:
+        root = panelizer.parse_sexpr(f.read())
+    text = panelizer.format_sexpr(root)
+    assert panelizer.parse_sexpr(text) == root
+    assert panelizer.format_sexpr(panelizer.parse_sexpr(text)) == text
+
+
+def test_quote_round_trip():
+    value = 'a "quoted"\\path\nline'
+    assert panelizer.unquote(panelizer.quote(value)) == value
+    assert panelizer.unquote("F.Cu") == "F.Cu"
+
+
+def test_millimetre_atoms():
+    assert panelizer.mm_to_iu("30.5") == 30500000
+    assert panelizer.iu_to_mm(30500000) == "30.5"
+    assert panelizer.iu_to_mm(-1) == "-0.000001"
+    assert panelizer.iu_to_mm(-0.0) == "0"
+
+
+def test_translate_copy_moves_coordinates():
+    line = panelizer.find_child(panelizer.parse_sexpr(KICAD_TEXT), "gr_line")
+    copy = panelizer.translate_copy(line, 5000000, -2500000, (1, 0))
+    assert panelizer.find_child(copy, "start") == ["start", "15", "17.5"]
+    assert panelizer.find_child(copy, "end") == ["end", "35.5", "17.5"]
+    assert panelizer.find_child(copy, "stroke") == panelizer.find_child(line, "stroke")
+    assert panelizer.find_child(line, "start") == ["start", "10", "20"]
+
+
+def test_translate_copy_keeps_footprint_children_relative():
+    footprint = panelizer.parse_sexpr(FOOTPRINT)
+    copy = panelizer.translate_copy(footprint, 10000000, 0, (0, 1))
+    assert panelizer.find_child(copy, "at") == ["at", "22", "15", "90"]
+    pad = panelizer.find_child(copy, "pad")
+    assert panelizer.find_child(pad, "at") == ["at", "-0.8", "0"]
+
+
+@pytest.mark.fake_pcbnew
+def test_sexpr_panel_matches_pcbnew(make_board, run_panel):
+    path = make_board(tracks=30, footprints=3, zones=1)
+    with open(path, encoding="utf-8") as f:
+        source = panelizer.parse_sexpr(f.read())
+    counts = {}
+    for engine in ("pcbnew", "sexpr"):
+        text, _ = run_panel(path, "--numx=3", "--numy=2", f"--engine={engine}")
+        root = panelizer.parse_sexpr(text)
+        counts[engine] = [
+            count_nodes(root, head) for head in ("footprint", "segment", "zone")
+        ]
+    assert counts["sexpr"] == counts["pcbnew"]
+    assert counts["sexpr"][0] == 6 * count_nodes(source, "footprint")
+    assert counts["sexpr"][1] == 6 * count_nodes(source, "segment")
@@ -0,0 +1,99 @@
+"""Tests for the --sweep of panel sizes, rails and padding."""
+
+import os
+
+import pytest
+
+import panelizer
+
+MM = panelizer.SCALE
+
+PRICES = """width,height,price,note
+60,60,4,too small
+100,100,10,
+160,100,14,
+200,200,30,
+"""
+
+
+@pytest.fixture
+def prices(tmp_path):
+    path = tmp_path / "prices.csv"
+    path.write_text(PRICES, encoding="utf-8")
+    return str(path)
+
+
+def test_read_price_table(prices):
+    assert panelizer.read_price_table(prices) == [
+        (60, 60, 4),
+        (100, 100, 10),
+        (160, 100, 14),
+        (200, 200, 30),
+    ]
+
+
+def test_bad_price_table_quits(tmp_path, capsys):
+    path = tmp_path / "prices.csv"
+    path.write_text("width,height\n100,100\n", encoding="utf-8")
+    with pytest.raises(SystemExit):
+        panelizer.read_price_table(str(path))
+    assert "Can't read the price table" in capsys.readouterr().out
+
+
+def test_sweep_matches_plan_panel(prices):
+    args = panelizer.parse_args(["--sweep", prices, "--paddings=0,2"])
+    results, excluded = panelizer.sweep_panels(
+        args, 40 * MM, 30 * MM, panelizer.read_price_table(prices)
+    )
+    assert len(results) + sum(excluded.values()) == 4 * 2 * 2 * 2
+    assert excluded == {"under 70x70mm": 2 * 2 * 2}
+    assert [r.cost for r in results] == sorted(r.cost for r in results)
+    for result in results:
+        args = panelizer.parse_args(
+            [
+                f"--panelx={result.width:g}",
+                f"--panely={result.height:g}",
+                f"--hrail={result.hrail}",
+                f"--vrail={result.vrail}",
+                f"--padding={result.padding}",
+            ]
+        )
+        plan = panelizer.plan_panel(args, (0, 0, 40 * MM, 30 * MM))
+        assert (plan.num_x, plan.num_y) == (result.num_x, result.num_y)
+        assert (plan.panel_width, plan.panel_height) == (
+            result.panel_width,
+            result.panel_height,
+        )
+
+
+def test_rails_too_narrow_for_text_are_left_out(prices):
+    args = panelizer.parse_args(["--sweep", prices, "--rails=0,1,5", "--htitle"])
+    results, excluded = panelizer.sweep_panels(
+        args, 40 * MM, 30 * MM, panelizer.read_price_table(prices)
+    )
+    assert excluded["rail too narrow for its text"] == 4 * 2 * 3
+    assert {r.hrail for r in results} == {5}
+
+
+def test_fit_adds_the_turned_board(prices):
+    args = panelizer.parse_args(["--sweep", prices, "--fit", "--padding=0"])
+    results, _ = panelizer.sweep_panels(
+        args, 80 * MM, 30 * MM, panelizer.read_price_table(prices)
+    )
+    assert any(r.rotated for r in results)
+    sexpr = panelizer.parse_args(
+        ["--sweep", prices, "--fit", "--padding=0", "--engine=sexpr"]
+    )
+    results, _ = panelizer.sweep_panels(
+        sexpr, 80 * MM, 30 * MM, panelizer.read_price_table(prices)
+    )
+    assert not any(r.rotated for r in results)
+
+
+def test_sweep_builds_no_panel(make_board, run_panel, prices):
+    path = make_board(tracks=20, footprints=2, width=40, height=30)
+    text, out = run_panel(path, f"--sweep={prices}")
+    assert text is None
+    assert not os.path.exists(panelizer.output_path(path))
+    assert "Swept 16 configurations, 12 make a panel" in out
+    assert "Best: --panelx=200 --panely=200 " in out
@@ -0,0 +1,103 @@
+"""Tests for holding boards in with --tabs."""
+
+import json
+import math
+import os
+
+import pytest
+
+import panelizer
+
+MM = panelizer.SCALE
+
+
+def round_outline(corners, radius=20):
+    """Return the corners of a round board drawn as a polygon, in mm."""
+    return [
+        (
+            radius + radius * math.cos(2 * math.pi * i / corners),
+            radius + radius * math.sin(2 * math.pi * i / corners),
+        )
+        for i in range(corners)
+    ]
+
+
+def test_box_index_query():
+    boxes = [(0, 0, 10, 10), (20, 0, 30, 10), (0, 20, 100, 30)]
+    index = panelizer.BoxIndex(boxes, cell=8)
+    assert sorted(index.query(5, 5, 25, 6)) == [0, 1]
+    assert sorted(index.query(50, 25, 60, 26)) == [2]
+    assert list(index.query(40, 0, 50, 10)) == []
+    assert index.clear(15, 5, 4)
+    assert not index.clear(15, 5, 5)
+
+
+def test_tab_slots_keep_clear_of_keepouts():
+    square = [(0, 0), (40 * MM, 0), (40 * MM, 40 * MM), (0, 40 * MM)]
+    # copper along the middle of the top side
+    keepouts = panelizer.BoxIndex([(10 * MM, 0, 30 * MM, 1 * MM)])
+    radius = (panelizer.TAB_DRILL / 2 + panelizer.TAB_CLEARANCE) * MM
+    slots, outline = panelizer.tab_slots(square, keepouts, 5 * MM, 3 * MM)
+    assert outline.points[0] in square
+    assert len(slots) > 20
+    for slot in slots:
+        for tab in slot:
+            assert tab.high - tab.low == 3 * MM
+            assert all(keepouts.clear(x, y, radius) for x, y in tab.holes)
+    top = [tab for slot in slots for tab in slot if tab.start[1] == tab.end[1] == 0]
+    assert top
+    for tab in top:
+        left, right = sorted((tab.start[0], tab.end[0]))
+        assert right < 10 * MM or left > 30 * MM
+
+
+def test_round_boards_get_two_tabs_each(make_board, run_panel):
+    path = make_board(tracks=0, footprints=0, zones=0, outline=round_outline(12))
+    text, out = run_panel(
+        path, "--numx=7", "--numy=7", "--tabs=5", "--engine=sexpr", "--no-cache"
+    )
+    assert "Placed" in out
+    assert text.count("np_thru_hole") > 2 * 49
+
+
+@pytest.mark.parametrize("corners", [12, 64])
+def test_plan_tabs_every_round_board(make_board, run_panel, corners):
+    path = make_board(tracks=0, footprints=0, zones=0, outline=round_outline(corners))
+    _, out = run_panel(path, "--plan", "--numx=7", "--numy=7", "--tabs=5")
+    plan = json.loads(out)
+    assert plan["vscores"] == []
+    pitch = plan["board_width"]
+    held = [0] * 49
+    for tab in plan["tabs"]:
+        # every row of holes sits on the edge of the board it breaks off from
+        x, y = tab["at"]
+        column, row = round((x - 20) / pitch), round((y - 20) / pitch)
+        centre = (20 + column * pitch, 20 + row * pitch)
+        assert math.dist((x, y), centre) == pytest.approx(20, abs=0.5)
+        held[column * 7 + row] += 1
+    assert min(held) >= 2
+
+
+@pytest.mark.fake_pcbnew
+def test_loose_boards_quit(make_board, run_panel):
+    # copper all round the edge leaves nowhere for the tabs
+    path = make_board(tracks=100, footprints=25, zones=0, outline=round_outline(64))
+    with pytest.raises(SystemExit):
+        run_panel(path, "--numx=3", "--numy=3", "--tabs=5", "--no-cache")
+    assert not os.path.exists(panelizer.output_path(path))
+
+
+@pytest.mark.fake_pcbnew
+@pytest.mark.parametrize("engine", ["pcbnew", "sexpr"])
+def test_left_out_copper_leaves_room_for_tabs(make_board, run_panel, engine):
+    # the copper round the edge that held off the tabs above isn't panelized
+    path = make_board(tracks=100, footprints=0, zones=0, outline=round_outline(64))
+    options = ("--numx=3", "--numy=3", "--tabs=5", f"--engine={engine}")
+    with pytest.raises(SystemExit):
+        run_panel(path, *options)
+    text, out = run_panel(path, *options, "--exclude-layers=F.Cu,B.Cu")
+    # the vias are kept, but they don't come between every pair of boards
+    assert "Left out 90 item(s)" in out and "Placed 18 tabs" in out
+    assert text.count("np_thru_hole") > 2 * 9
+    _, out = run_panel(path, "--plan", *options, "--exclude-layers=F.Cu,B.Cu")
+    assert len(json.loads(out)["tabs"]) >= 2 * 9
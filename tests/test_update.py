@@ -0,0 +1,55 @@
+"""Tests for --update."""
+
+import panelizer
+
+
+def panel_nodes(text):
+    """Return the sorted top level nodes of a panel, without the report text."""
+    return sorted(
+        panelizer.format_sexpr(node)
+        for node in panelizer.parse_sexpr(text)[1:]
+        if "generated with" not in str(node)
+    )
+
+
+def edit_board(path, old, new):
+    with open(path, encoding="utf-8") as board:
+        text = board.read()
+    assert old in text
+    with open(path, "w", encoding="utf-8") as board:
+        board.write(text.replace(old, new, 1))
+
+
+def first_segment_end(path):
+    with open(path, encoding="utf-8") as board:
+        root = panelizer.parse_sexpr(board.read())
+    segment = panelizer.find_child(root, "segment")
+    return "(end " + " ".join(panelizer.find_child(segment, "end")[1:]) + ")"
+
+
+def test_update_matches_a_rebuild(make_board, run_panel):
+    path = make_board(tracks=30, footprints=3)
+    options = ("--numx=3", "--numy=2", "--engine=sexpr", "--no-cache")
+    _, out = run_panel(path, *options)
+    panel = panelizer.output_path(path)
+    edit_board(path, first_segment_end(path), "(end 25 20)")
+
+    updated, out = run_panel(path, *options, f"--update={panel}")
+    assert "Updated 0 added, 1 changed and 0 removed item(s) on 6 boards" in out
+    rebuilt, _ = run_panel(path, *options)
+    assert panel_nodes(updated) == panel_nodes(rebuilt)
+
+    _, out = run_panel(path, *options, f"--update={panel}")
+    assert "The panel is already up to date" in out
+
+
+def test_update_rebuilds_when_options_change(make_board, run_panel):
+    path = make_board(tracks=30, footprints=3)
+    run_panel(path, "--numx=3", "--numy=2", "--engine=sexpr", "--no-cache")
+    panel = panelizer.output_path(path)
+    text, out = run_panel(
+        path, "--numx=2", "--numy=2", "--engine=sexpr", f"--update={panel}"
+    )
+    assert "Rebuilding the whole panel, the options changed" in out
+    footprints = [n for n in panelizer.parse_sexpr(text)[1:] if n[0] == "footprint"]
+    assert len(footprints) == 4 * 3
@@ -0,0 +1,55 @@
+"""Tests for the uuids of panel copies and frame items."""
+
+import pytest
+
+import panelizer
+from test_sexpr import FOOTPRINT, KICAD_TEXT
+
+
+def panel_ids(text):
+    """Return the uuids of the top level items of a panel, in order.
+
+    The report text is left out, as it quotes the command line.
+    """
+    ids = []
+    for node in panelizer.parse_sexpr(text)[1:]:
+        uuid = panelizer.find_child(node, "uuid")
+        if uuid is not None and "generated with" not in node[1]:
+            ids.append(panelizer.unquote(uuid[1]))
+    return ids
+
+
+def test_translate_copy_derives_uuids():
+    line = panelizer.find_child(panelizer.parse_sexpr(KICAD_TEXT), "gr_line")
+    first = panelizer.translate_copy(line, 1000000, 0, (1, 0))
+    again = panelizer.translate_copy(line, 1000000, 0, (1, 0))
+    other = panelizer.translate_copy(line, 1000000, 0, (2, 0))
+    uuid = panelizer.find_child(first, "uuid")[1]
+    assert uuid == panelizer.quote(
+        panelizer.copy_uuid("8d8f2a5e-5b0c-4a52-9e0e-1b6f7d4bd9a1", 1, 0)
+    )
+    assert panelizer.find_child(again, "uuid")[1] == uuid
+    assert panelizer.find_child(other, "uuid")[1] != uuid
+
+
+def test_footprint_children_get_derived_uuids():
+    footprint = panelizer.parse_sexpr(FOOTPRINT)
+    copy = panelizer.translate_copy(footprint, 10000000, 0, (0, 1))
+    pad = panelizer.find_child(copy, "pad")
+    assert panelizer.find_child(pad, "uuid")[1] == panelizer.quote(
+        panelizer.copy_uuid("4a3a0f26-8d3b-4a47-9f12-0e8f3c9a1d77", 0, 1)
+    )
+
+
+@pytest.mark.fake_pcbnew
+def test_engines_give_the_same_uuids(make_board, run_panel):
+    path = make_board(tracks=30, footprints=3, zones=1)
+    panels = {}
+    for engine in ("pcbnew", "sexpr"):
+        options = ("--numx=3", "--numy=2", "--hrail=5", "--no-cache")
+        text, _ = run_panel(path, *options, f"--engine={engine}")
+        again, _ = run_panel(path, *options, f"--engine={engine}")
+        assert again == text
+        panels[engine] = panel_ids(text)
+    assert len(set(panels["pcbnew"])) == len(panels["pcbnew"])
+    assert sorted(panels["pcbnew"]) == sorted(panels["sexpr"])
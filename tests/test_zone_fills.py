@@ -0,0 +1,60 @@
+"""Tests for keeping the source zone fills on the panel copies."""
+
+import pytest
+
+import panelizer
+
+pytestmark = pytest.mark.fake_pcbnew
+
+MM = panelizer.SCALE
+
+
+def zone_fills(text):
+    """Return the (outline points, fill points) of every zone of a panel."""
+    zones = []
+    for node in panelizer.parse_sexpr(text)[1:]:
+        if node[0] == "zone":
+            outline = panelizer.find_child(panelizer.find_child(node, "polygon"), "pts")
+            fill = panelizer.find_child(
+                panelizer.find_child(node, "filled_polygon"), "pts"
+            )
+            zones.append((outline[1:], fill[1:] if fill else None))
+    return zones
+
+
+def test_copies_carry_the_source_fills(make_board, run_panel):
+    path = make_board(tracks=20, footprints=2, zones=1)
+    text, _ = run_panel(path, "--numx=3", "--numy=2", "--no-cache", "--keepfills")
+    zones = zone_fills(text)
+    assert len(zones) == 6
+
+    def fill_offset(outline, fill):
+        ox, oy = (panelizer.mm_to_iu(v) for v in outline[0][1:])
+        fx, fy = (panelizer.mm_to_iu(v) for v in fill[0][1:])
+        return fx - ox, fy - oy
+
+    # every fill moved with its zone
+    assert len({fill_offset(outline, fill) for outline, fill in zones}) == 1
+    plain, _ = run_panel(path, "--numx=3", "--numy=2", "--no-cache")
+    assert zone_fills(plain) == zones
+
+
+def test_keepfills_marks_copies_filled(pcbnew):
+    board = pcbnew.BOARD()
+    zone = pcbnew.ZONE(board)
+    zone.outline = [(0, 0), (10 * MM, 0), (10 * MM, 10 * MM), (0, 10 * MM)]
+    pcbnew.ZONE_FILLER(board).Fill([zone])
+    zone.SetNeedRefill(True)
+    unfilled_zone = pcbnew.ZONE(board)
+    unfilled_zone.outline = list(zone.outline)
+    board.Add(zone)
+    board.Add(unfilled_zone)
+    offsets = [(1, 0, pcbnew.VECTOR2I(20 * MM, 0), None)]
+    pcbnew.CALLS.clear()
+
+    assert panelizer.duplicate_zones(board, offsets, translate_fills=True) == 1
+    copy, unfilled_copy = board.zones[2:]
+    assert copy.IsFilled() and not copy.need_refill
+    assert copy.fills[pcbnew.F_Cu][0] == (20 * MM + 500000, 500000)
+    assert not unfilled_copy.IsFilled()
+    assert "SetFilledPolysList" not in pcbnew.CALLS